@@ -1,6 +1,8 @@
+from django import forms
 from django.contrib import admin
 
-from .models import Release
+from .models import PackageDefinition, Release
+from .packages import registry
 
 # Inlines
 
@@ -8,8 +10,24 @@ from .models import Release
 
 
 class ReleaseAdmin(admin.ModelAdmin):
-    list_display = ("package", "name", "release_date", "active")
+    list_display = ("package", "name", "release_date", "active", "rollout_percentage")
     search_fields = ("package__name", "name")
 
+    def formfield_for_dbfield(self, db_field, request, **kwargs):
+        # a choice of the registered packages, as of when the form is built
+        if db_field.name == "package":
+            return forms.ChoiceField(
+                choices=registry.choices,
+                label=db_field.verbose_name.capitalize(),
+                help_text=db_field.help_text,
+            )
+        return super().formfield_for_dbfield(db_field, request, **kwargs)
+
+
+class PackageDefinitionAdmin(admin.ModelAdmin):
+    list_display = ("key", "name", "active")
+    search_fields = ("key", "name")
+
 
 admin.site.register(Release, ReleaseAdmin)
+admin.site.register(PackageDefinition, PackageDefinitionAdmin)
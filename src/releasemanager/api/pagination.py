@@ -0,0 +1,113 @@
+import base64
+from datetime import datetime
+
+from django.db import connection
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from releasemanager import settings as rm_settings
+
+
+class ReleaseCursorPagination(BasePagination):
+    """
+    Keyset pagination over (release_date, id), newest first.
+
+    Each page continues from the last row of the previous one with an indexed range condition instead of an OFFSET,
+    so every page costs the same however many releases there are.  Undated releases sort wherever the database puts
+    NULLs for a descending order.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    ordering = ("-release_date", "-id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.get_page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() for async views."""
+        return self.set_page(
+            [release async for release in self.get_page_queryset(queryset, request)]
+        )
+
+    def get_page_queryset(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        position = self.decode_cursor(request.query_params.get(self.cursor_query_param))
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(*position))
+
+        # one extra row tells us if there is a next page
+        return queryset[: self.page_size + 1]
+
+    def set_page(self, releases):
+        self.has_next = len(releases) > self.page_size
+        self.page = releases[: self.page_size]
+        return self.page
+
+    def get_paginated_data(self, data):
+        return {"next": self.get_next_link(), "results": data}
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return rm_settings.RM_API_PAGE_SIZE
+        return max(1, min(page_size, rm_settings.RM_API_MAX_PAGE_SIZE))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        cursor = self.encode_cursor(last.release_date, last.pk)
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, cursor
+        )
+
+    @staticmethod
+    def after(release_date, pk):
+        """The rows that come after (release_date, pk) in the ordering."""
+        nulls_first = (
+            connection.features.nulls_order_largest
+        )  # NULLs lead a descending order
+
+        if release_date is None:
+            after = Q(release_date__isnull=True, id__lt=pk)
+            if nulls_first:
+                after |= Q(release_date__isnull=False)
+            return after
+
+        after = Q(release_date__lt=release_date) | Q(
+            release_date=release_date, id__lt=pk
+        )
+        if not nulls_first:
+            after |= Q(release_date__isnull=True)
+        return after
+
+    @staticmethod
+    def encode_cursor(release_date, pk):
+        position = f"{release_date.isoformat() if release_date else ''}|{pk}"
+        return base64.urlsafe_b64encode(position.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor):
+        if not cursor:
+            return None
+        try:
+            release_date, pk = (
+                base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+            )
+            return (
+                datetime.fromisoformat(release_date) if release_date else None,
+                int(pk),
+            )
+        except (ValueError, UnicodeDecodeError):
+            raise NotFound("Invalid cursor")
@@ -4,37 +4,149 @@
 # @Date:   2023-09-06 12:26:10
 # --------------------------------------------
 
+from django.contrib.auth.models import Group
+from django.contrib.sites.models import Site
 from rest_framework import serializers
 from releasemanager.models import Release
+from releasemanager.packages import registry
 
 
 class ReleaseSerializer(serializers.ModelSerializer):
     class Meta:
         model = Release
-        fields = ["name", "release_notes", "release_date", "status"]
+        fields = [
+            "name",
+            "release_notes",
+            "release_date",
+            "status",
+            "rollout_percentage",
+            "rollout_salt",
+        ]
+
+
+class ReleaseListSerializer(serializers.ModelSerializer):
+    """A lightweight listing, the notes and files are left to the detail endpoints."""
+
+    class Meta:
+        model = Release
+        fields = ["id", "package", "name", "status", "release_date"]
+
+
+class LatestReleaseSerializer(serializers.ModelSerializer):
+    """The compact payload clients need to update themselves to a release."""
+
+    files = serializers.DictField(read_only=True)
+
+    class Meta:
+        model = Release
+        fields = ["package", "name", "status", "files", "signature"]
+
+
+class ReleaseBulkListSerializer(serializers.ListSerializer):
+    def validate(self, attrs):
+        # one query per relation for the whole batch, rather than one per id
+        for field, model in (("sites", Site), ("groups", Group)):
+            ids = {pk for entry in attrs for pk in entry.get(field, [])}
+            unknown = ids - set(
+                model.objects.filter(pk__in=ids).values_list("pk", flat=True)
+            )
+            if unknown:
+                raise serializers.ValidationError(
+                    f"Unknown {field}: {', '.join(str(pk) for pk in sorted(unknown))}"
+                )
+        return attrs
+
+
+class ReleaseBulkSerializer(serializers.ModelSerializer):
+    sites = serializers.ListField(child=serializers.IntegerField(), required=False)
+    groups = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+    class Meta:
+        model = Release
+        list_serializer_class = ReleaseBulkListSerializer
+        fields = [
+            "id",
+            "package",
+            "name",
+            "release_notes",
+            "release_date",
+            "status",
+            "signature",
+            "rollout_percentage",
+            "rollout_salt",
+            "sites",
+            "groups",
+        ]
+        read_only_fields = ["id"]
+        validators = []  # releases that already exist are skipped, not rejected
+
+    def validate_package(self, value):
+        if value not in registry:
+            raise serializers.ValidationError(f'Package "{value}" does not exist.')
+        return value
+
+
+class ReleaseFileEntrySerializer(serializers.Serializer):
+    """A file sent to update_files, as stored on ReleaseFile."""
+
+    path = serializers.CharField(max_length=512)
+    file_group = serializers.CharField(max_length=50, required=False)
+    options = serializers.DictField(required=False)
+    size = serializers.IntegerField(min_value=0, required=False, allow_null=True)
+    hash = serializers.CharField(max_length=128, required=False, allow_blank=True)
 
 
 class ReleaseFileSerializer(serializers.ModelSerializer):
+    # Either the {file_group: [path or {"path": ..., "options": {...}}]} manifest, or a batch of
+    # [{"path": ..., "file_group": ..., "options": {...}}] entries; both are stored as ReleaseFile rows
+    files = serializers.JSONField()
+
     class Meta:
         model = Release
         fields = ["files"]
 
-    def update(self, instance, validated_data):
-        files_data = validated_data.get("files", {})
-
-        # Assuming `files` is already a dict if it exists
-        if instance.files:
-            # Update existing dictionary with new paths
-            for key, value in files_data.items():
-                if key in instance.files:
-                    instance.files[key].extend(
-                        value if isinstance(value, list) else [value]
+    def validate_files(self, value):
+        # both shapes are checked as one list of entries
+        if isinstance(value, dict):
+            entries = []
+            for file_group, items in value.items():
+                if not isinstance(items, list):
+                    raise serializers.ValidationError(
+                        f'The files of "{file_group}" must be a list.'
+                    )
+                entries += [
+                    (
+                        dict(item, file_group=file_group)
+                        if isinstance(item, dict)
+                        else {"path": item, "file_group": file_group}
                     )
-                else:
-                    instance.files[key] = value if isinstance(value, list) else [value]
+                    for item in items
+                ]
+        elif isinstance(value, list):
+            entries = [
+                {"path": item} if isinstance(item, str) else item for item in value
+            ]
         else:
-            # Set new dictionary if none exists
-            instance.files = files_data
+            raise serializers.ValidationError(
+                "Expected a {file_group: [file, ...]} manifest or a list of files."
+            )
+
+        serializer = ReleaseFileEntrySerializer(data=entries, many=True)
+        if not serializer.is_valid():
+            raise serializers.ValidationError(serializer.errors)
+
+        manifest = {}
+        for entry in serializer.validated_data:
+            entry = dict(entry)
+            # as with rmaddfile, the file extension is the default file group
+            file_group = entry.pop("file_group", None) or entry["path"].split(".")[-1]
+            manifest.setdefault(file_group, []).append(entry)
+
+        return manifest
+
+    def update(self, instance, validated_data):
+        files_data = validated_data.get("files", {})
 
-        instance.save()
+        # Appends new paths and updates the options of paths the release already has
+        instance.add_files(files_data)
         return instance
@@ -1,13 +1,44 @@
 from django.urls import path
 
-from .views import ReleaseListView, ReleaseCreateView, ReleaseFileUpdateView
+from releasemanager import settings as rm_settings
+from .views import (
+    AsyncLatestReleaseView,
+    AsyncReleaseListView,
+    LatestReleaseView,
+    ReleaseBulkCreateView,
+    ReleaseListView,
+    ReleaseCreateView,
+    ReleaseDeltaView,
+    ReleaseFileUpdateView,
+)
+
+# the read paths clients poll, served without tying up a worker thread under ASGI
+if rm_settings.RM_ASYNC_API:
+    list_view, latest_view = AsyncReleaseListView, AsyncLatestReleaseView
+else:
+    list_view, latest_view = ReleaseListView, LatestReleaseView
 
 urlpatterns = [
-    path("releases/", ReleaseListView.as_view(), name="api_releases"),
+    path("releases/", list_view.as_view(), name="api_releases"),
     path("releases/create/", ReleaseCreateView.as_view(), name="api_create_release"),
+    path(
+        "releases/bulk_create/",
+        ReleaseBulkCreateView.as_view(),
+        name="api_bulk_create_releases",
+    ),
     path(
         "releases/<int:pk>/update_files/",
         ReleaseFileUpdateView.as_view(),
         name="api_update_files",
     ),
+    path(
+        "packages/<str:package>/latest/",
+        latest_view.as_view(),
+        name="api_latest_release",
+    ),
+    path(
+        "packages/<str:package>/delta/",
+        ReleaseDeltaView.as_view(),
+        name="api_release_delta",
+    ),
 ]
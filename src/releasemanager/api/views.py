@@ -1,17 +1,108 @@
-from rest_framework.generics import ListAPIView, CreateAPIView, UpdateAPIView
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sites.models import SITE_CACHE
+from django.contrib.sites.shortcuts import get_current_site
+from django.http import JsonResponse
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.views import View
+from rest_framework import status
+from rest_framework.generics import (
+    GenericAPIView,
+    ListAPIView,
+    CreateAPIView,
+    RetrieveAPIView,
+    UpdateAPIView,
+)
+from rest_framework.exceptions import (
+    APIException,
+    AuthenticationFailed,
+    NotAuthenticated,
+    NotFound,
+    PermissionDenied,
+    Throttled,
+    ValidationError,
+)
 from rest_framework.permissions import IsAuthenticated, DjangoModelPermissions
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
 
+from releasemanager import settings as rm_settings
+from releasemanager.audience import aget_audience, get_audience
+from releasemanager.cache import (
+    MISSING,
+    acall,
+    get_timeout,
+    release_cache,
+)
+from releasemanager.conditional import (
+    ConditionalReleaseMixin,
+    add_validators,
+    get_release_state,
+    make_etag,
+)
+from releasemanager.delta import get_delta, get_sources
 from releasemanager.models import Release
-from .serializers import ReleaseSerializer, ReleaseFileSerializer
+from releasemanager.packages import registry
+from releasemanager.rollout import is_rolled_out
+from .pagination import ReleaseCursorPagination
+from .serializers import (
+    LatestReleaseSerializer,
+    ReleaseBulkSerializer,
+    ReleaseSerializer,
+    ReleaseListSerializer,
+    ReleaseFileSerializer,
+)
 
 
-class ReleaseListView(ListAPIView):
-    queryset = Release.objects.all()
-    serializer_class = ReleaseSerializer
+def filter_releases(params):
+    """The releases listed for the package, status and site query parameters."""
+    # only load the listed columns, never the notes
+    releases = Release.objects.only(*ReleaseListSerializer.Meta.fields)
+
+    if params.get("package"):
+        releases = releases.filter(package=params["package"])
+
+    try:
+        if params.get("status"):
+            releases = releases.filter(status=int(params["status"]))
+        if params.get("site"):
+            releases = releases.filter(
+                Release.objects.on_site_filter(int(params["site"]))
+            )
+    except ValueError:
+        raise ValidationError("status and site must be integers")
+
+    return releases
+
+
+def get_payload_key(release):
+    return release_cache.make_key("latest-payload", release.pk)
+
+
+def get_latest_payload(release):
+    """The serialized release.  Everyone it is picked for gets the same payload, so it's only serialized once per
+    release generation.
+    """
+    return release_cache.get_or_set(
+        get_payload_key(release), lambda: dict(LatestReleaseSerializer(release).data)
+    )
+
+
+class ReleaseListView(ConditionalReleaseMixin, ListAPIView):
+    serializer_class = ReleaseListSerializer
+    pagination_class = ReleaseCursorPagination
     permission_classes = [
         IsAuthenticated  # Only authenticated users can access this endpoint
     ]
 
+    def get_queryset(self):
+        return filter_releases(self.request.query_params)
+
 
 class ReleaseCreateView(CreateAPIView):
     queryset = Release.objects.all()
@@ -25,6 +116,36 @@ class ReleaseCreateView(CreateAPIView):
         serializer.save(released_by=self.request.user)
 
 
+class ReleaseBulkCreateView(GenericAPIView):
+    """Create a list of releases in one request, skipping those that already exist."""
+
+    queryset = Release.objects.all()
+    serializer_class = ReleaseBulkSerializer
+    permission_classes = [DjangoModelPermissions]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        created, skipped = Release.objects.bulk_create_releases(
+            serializer.validated_data, released_by=request.user
+        )
+
+        return Response(
+            {
+                "created": [
+                    {"id": release.pk, "package": release.package, "name": release.name}
+                    for release in created
+                ],
+                "skipped": [
+                    {"package": entry["package"], "name": entry["name"]}
+                    for entry in skipped
+                ],
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+
 class ReleaseFileUpdateView(UpdateAPIView):
     queryset = Release.objects.all()
     serializer_class = ReleaseFileSerializer
@@ -33,3 +154,239 @@ class ReleaseFileUpdateView(UpdateAPIView):
 
     def patch(self, request, *args, **kwargs):
         return self.partial_update(request, *args, **kwargs)
+
+
+class LatestReleaseView(ConditionalReleaseMixin, RetrieveAPIView):
+    """The release of a package the requesting user should be running on the current site."""
+
+    serializer_class = LatestReleaseSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_etag_parts(self, request):
+        # releases being rolled out make the answer depend on the user, not just their audience
+        return super().get_etag_parts(request) + [request.user.pk]
+
+    def retrieve(self, request, *args, **kwargs):
+        package = kwargs["package"]
+        if package not in registry:
+            raise NotFound(f'Package "{package}" does not exist.')
+
+        release = Release.objects.get_latest_release_for_package_site_and_user(
+            request.user, get_current_site(request), package
+        )
+        if release is None:
+            raise NotFound(f'No release of "{package}" is available.')
+
+        response = Response(get_latest_payload(release))
+        # no longer than until the next scheduled release or deprecation, when the answer may change
+        patch_cache_control(
+            response, private=True, max_age=get_timeout(rm_settings.RM_LATEST_MAX_AGE)
+        )
+        return response
+
+
+class ReleaseDeltaView(ConditionalReleaseMixin, RetrieveAPIView):
+    """The files that were added, removed or changed between two releases of a package, so that clients only fetch
+    what changed.  The release to go to defaults to the one the requesting user should be running.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get_etag_parts(self, request):
+        return super().get_etag_parts(request) + [request.user.pk]
+
+    def get_target(self, request, package, name):
+        """The release to go to, which has to be one the user could be offered."""
+        user = request.user
+        site = get_current_site(request)
+
+        # usually the user's latest release, which is resolved from the cache
+        latest = Release.objects.get_latest_release_for_package_site_and_user(
+            user, site, package
+        )
+        if latest is not None and name in (None, latest.name):
+            return latest
+        if name is None:
+            raise NotFound(f'No release of "{package}" is available.')
+
+        release = (
+            Release.objects.get_accessible_releases(user, site, package)
+            .filter(name=name)
+            .first()
+        )
+        if release is None or not (
+            user.is_superuser or is_rolled_out(release, user.pk)
+        ):
+            raise NotFound(f'Release "{name}" of "{package}" does not exist.')
+        return release
+
+    def retrieve(self, request, *args, **kwargs):
+        package = kwargs["package"]
+        if package not in registry:
+            raise NotFound(f'Package "{package}" does not exist.')
+
+        source_name = request.query_params.get("from")
+        if not source_name:
+            raise ValidationError({"from": "The release to go from is required."})
+
+        target = self.get_target(request, package, request.query_params.get("to"))
+
+        # any release the client may be running, deprecated or not, can be gone from
+        sources = get_sources(
+            get_audience(request.user), get_current_site(request), package
+        )
+        if source_name not in sources:
+            raise NotFound(f'Release "{source_name}" of "{package}" does not exist.')
+        delta = get_delta(sources[source_name], target)
+
+        response = Response(
+            {"package": package, "from": source_name, "to": target.name, **delta}
+        )
+        patch_cache_control(
+            response, private=True, max_age=get_timeout(rm_settings.RM_LATEST_MAX_AGE)
+        )
+        return response
+
+
+# Async views, for ASGI deployments (see RM_ASYNC_API).  DRF's views are synchronous, so these are plain Django async
+# views that authenticate with the same classes, reuse the serializers and answer with the same payloads and headers.
+
+
+async def aget_current_site(request):
+    """get_current_site() for async code, answered from Django's site cache once it is warm."""
+    site_id = getattr(settings, "SITE_ID", None)
+    if site_id is not None and site_id in SITE_CACHE:
+        return SITE_CACHE[site_id]
+    return await sync_to_async(get_current_site)(request)
+
+
+class AsyncReleaseAPIView(View):
+    """Authenticates the request, checks its permissions and throttles and answers conditional GETs.  Views define
+    the response with `async def respond(self, request, site, audience, **url_kwargs)`.
+
+    The authentication, permission and throttle classes are the same as the sync views', but there is no content
+    negotiation: responses are always JSON.
+    """
+
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    permission_classes = [IsAuthenticated]
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+    vary_headers = ConditionalReleaseMixin.vary_headers
+
+    async def get(self, request, *args, **kwargs):
+        request = Request(
+            request, authenticators=[auth() for auth in self.authentication_classes]
+        )
+        try:
+            await sync_to_async(self.initial)(request)
+            site = await aget_current_site(request)
+            audience = await aget_audience(request.user)
+
+            # the same validators as ConditionalReleaseMixin
+            release_state = await acall(get_release_state)
+            if release_state is None:  # nothing to validate against
+                response = await self.respond(request, site, audience, *args, **kwargs)
+                patch_vary_headers(response, self.vary_headers)
+                return response
+
+            etag = make_etag(
+                release_state.etag_parts + self.get_etag_parts(request, site, audience)
+            )
+            last_modified = release_state.last_modified
+
+            response = get_conditional_response(
+                request._request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = await self.respond(request, site, audience, *args, **kwargs)
+        except APIException as e:
+            return self.handle_exception(request, e)
+
+        return add_validators(response, etag, last_modified, self.vary_headers)
+
+    def get_etag_parts(self, request, site, audience):
+        return [audience.key, site.pk, request.get_full_path()]
+
+    def initial(self, request):
+        """Authenticate the request and check its permissions and throttles, as DRF's APIView.initial() does.  Called
+        from a thread, as authenticators and permissions query and throttles use the cache.
+        """
+        request.user  # authenticate up front, so nothing does on the event loop later
+        for permission in [permission() for permission in self.permission_classes]:
+            if not permission.has_permission(request, self):
+                if request.authenticators and not request.successful_authenticator:
+                    raise NotAuthenticated()
+                raise PermissionDenied(
+                    getattr(permission, "message", None),
+                    getattr(permission, "code", None),
+                )
+
+        waits = [
+            throttle.wait()
+            for throttle in [throttle() for throttle in self.throttle_classes]
+            if not throttle.allow_request(request, self)
+        ]
+        if waits:
+            waits = [wait for wait in waits if wait is not None]
+            raise Throttled(max(waits) if waits else None)
+
+    def handle_exception(self, request, exc):
+        """Answer an APIException the way DRF's views do."""
+        response = JsonResponse({"detail": exc.detail}, status=exc.status_code)
+        if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+            header = (
+                request.authenticators[0].authenticate_header(request)
+                if request.authenticators
+                else None
+            )
+            if header:
+                response["WWW-Authenticate"] = header
+            else:
+                response.status_code = status.HTTP_403_FORBIDDEN
+        if getattr(exc, "wait", None):
+            response["Retry-After"] = "%d" % exc.wait
+        return response
+
+
+class AsyncReleaseListView(AsyncReleaseAPIView):
+    """ReleaseListView as an async view."""
+
+    pagination_class = ReleaseCursorPagination
+
+    async def respond(self, request, site, audience):
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(
+            filter_releases(request.query_params), request
+        )
+        return JsonResponse(
+            paginator.get_paginated_data(ReleaseListSerializer(page, many=True).data)
+        )
+
+
+class AsyncLatestReleaseView(AsyncReleaseAPIView):
+    """LatestReleaseView as an async view.  A cached payload is answered without leaving the event loop."""
+
+    def get_etag_parts(self, request, site, audience):
+        return super().get_etag_parts(request, site, audience) + [request.user.pk]
+
+    async def respond(self, request, site, audience, package):
+        if not await registry.acontains(package):
+            raise NotFound(f'Package "{package}" does not exist.')
+
+        release = await Release.objects.aget_latest_release_for_audience(
+            audience, site, package, request.user.pk
+        )
+        if release is None:
+            raise NotFound(f'No release of "{package}" is available.')
+
+        payload = await acall(lambda: release_cache.get(get_payload_key(release)))
+        if payload is MISSING:
+            payload = await sync_to_async(get_latest_payload)(release)
+
+        response = JsonResponse(payload)
+        patch_cache_control(
+            response,
+            private=True,
+            max_age=await acall(get_timeout, rm_settings.RM_LATEST_MAX_AGE),
+        )
+        return response
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class ReleaseManagerConfig(AppConfig):
     name = 'releasemanager'
+
+    def ready(self):
+        from releasemanager import signals  # noqa: F401 - connects the cache invalidation receivers
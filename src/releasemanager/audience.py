@@ -0,0 +1,100 @@
+"""
+A user's "release audience" is everything about them that decides which releases they can see: whether
+they are a superuser and which of their groups hold the can_test_releases permission.  Users that share an
+audience always resolve to the same releases, so it is what resolution results are cached by.
+"""
+
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+
+from releasemanager.cache import (
+    AUDIENCE_GENERATION,
+    MISSING,
+    acall,
+    audience_cache,
+    bump_generation,
+)
+
+TEST_PERMISSION = "can_test_releases"
+
+
+class ReleaseAudience(namedtuple("ReleaseAudience", ["is_superuser", "group_ids"])):
+    __slots__ = ()
+
+    @property
+    def is_tester(self):
+        return bool(self.group_ids)
+
+    @property
+    def key(self):
+        """A compact, stable string identifying the audience in cache keys."""
+        if self.is_superuser:
+            return "superuser"
+        if self.group_ids:
+            return "groups-" + "-".join(str(pk) for pk in self.group_ids)
+        return "public"
+
+
+PUBLIC_AUDIENCE = ReleaseAudience(False, ())
+SUPERUSER_AUDIENCE = ReleaseAudience(True, ())
+
+
+def get_audience(user):
+    """Work out the release audience for a user (or AnonymousUser).
+
+    The tester group ids are cached per user (see audience_cache), so once warm this costs no queries.
+    """
+    if user.is_superuser:
+        return SUPERUSER_AUDIENCE
+
+    if user.pk is None:  # anonymous users are never in a group
+        return PUBLIC_AUDIENCE
+
+    group_ids = audience_cache.get_or_set(
+        get_audience_key(user.pk), lambda: get_tester_group_ids(user)
+    )
+    return ReleaseAudience(False, group_ids)
+
+
+async def aget_audience(user):
+    """get_audience() for async code.  The user has to be loaded already, not a lazy request.user.
+
+    A cached audience is answered without leaving the event loop; otherwise the groups are queried from a thread.
+    """
+    if user.is_superuser:
+        return SUPERUSER_AUDIENCE
+
+    if user.pk is None:
+        return PUBLIC_AUDIENCE
+
+    group_ids = await acall(lambda: audience_cache.get(get_audience_key(user.pk)))
+    if group_ids is MISSING:
+        return await sync_to_async(get_audience)(user)
+    return ReleaseAudience(False, group_ids)
+
+
+def get_audience_key(user_pk):
+    return audience_cache.make_key("user", user_pk)
+
+
+def get_tester_group_ids(user):
+    """Query the ids of the user's groups that can test releases."""
+    # Instead of using user.has_perm("releasemanager.can_test_releases") a query to check if a release is
+    # exclusive, a query for a group can handle double duty.
+    return tuple(
+        user.groups.filter(permissions__codename=TEST_PERMISSION)
+        .values_list("pk", flat=True)
+        .distinct()
+        .order_by("pk")
+    )
+
+
+def forget_audiences(user_pks=None):
+    """Drop the cached audience of the given users, or of everyone."""
+    if user_pks is None:
+        bump_generation(AUDIENCE_GENERATION)
+        return
+
+    for user_pk in user_pks:
+        audience_cache.delete(get_audience_key(user_pk))
@@ -0,0 +1,193 @@
+"""
+Benchmarks for release resolution, run by the rmbenchmark command against whatever data is in the database (see
+rmgendata for a synthetic dataset).
+
+Each scenario is called repeatedly, recording its latency and number of queries, and summarized as percentiles so
+that runs on different commits can be compared.
+"""
+
+import random
+import statistics
+import time
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.contrib.sites.models import Site
+from django.core.management import call_command
+from django.db import connection
+from django.template import Context, Template
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from releasemanager.api.views import ReleaseListView
+from releasemanager.audience import (
+    PUBLIC_AUDIENCE,
+    SUPERUSER_AUDIENCE,
+    TEST_PERMISSION,
+    ReleaseAudience,
+)
+from releasemanager.cache import invalidate_all
+from releasemanager.models import Release
+from releasemanager.packages import registry
+
+# django settings
+from django.conf import settings
+
+User = get_user_model()
+
+
+def percentile(values, percent):
+    """The value below which the given percentage of the (sorted) values fall, by nearest rank."""
+    index = max(0, min(len(values) - 1, round(percent / 100 * len(values)) - 1))
+    return values[index]
+
+
+def summarize(timings, queries):
+    timings = sorted(timing * 1000 for timing in timings)  # in ms
+    return {
+        "iterations": len(timings),
+        "mean_ms": round(statistics.mean(timings), 3),
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p90_ms": round(percentile(timings, 90), 3),
+        "p99_ms": round(percentile(timings, 99), 3),
+        "max_ms": round(timings[-1], 3),
+        "queries_mean": round(statistics.mean(queries), 2),
+        "queries_max": max(queries),
+    }
+
+
+COLD = "cold"
+WARM = "warm"
+
+
+def measure(scenario, iterations, cache=None):
+    """Call a scenario (given the iteration number) repeatedly, returning its summary.
+
+    With COLD, every release and audience cache is invalidated before each call.  With WARM, the scenario is first
+    run untimed with the same inputs so that every timed call is served from the caches.
+    """
+    if cache == WARM:
+        for iteration in range(iterations):
+            scenario(iteration)
+
+    timings, queries = [], []
+    for iteration in range(iterations):
+        if cache == COLD:
+            invalidate_all()
+
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            scenario(iteration)
+            timings.append(time.perf_counter() - start)
+        queries.append(len(captured))
+
+    return summarize(timings, queries)
+
+
+class Benchmark:
+    """The scenarios, drawing audiences, sites and releases at random (with a fixed seed) from the database."""
+
+    def __init__(self, seed=0):
+        rng = random.Random(seed)
+        self.packages = list(registry)
+
+        group_ids = list(
+            Group.objects.filter(permissions__codename=TEST_PERMISSION)
+            .values_list("pk", flat=True)
+            .distinct()
+        )
+        self.audiences = [PUBLIC_AUDIENCE, SUPERUSER_AUDIENCE] + [
+            ReleaseAudience(
+                False,
+                tuple(sorted(rng.sample(group_ids, min(len(group_ids), 3)))),
+            )
+            for _ in range(10)
+            if group_ids
+        ]
+        self.sites = list(Site.objects.all())
+        release_ids = list(Release.objects.values_list("pk", flat=True))
+        self.release_ids = rng.sample(release_ids, min(len(release_ids), 100))
+        self.user = User.objects.filter(is_superuser=True).first() or User(
+            username="rmbenchmark", is_superuser=True
+        )
+
+        # a host the settings allow, for the API's absolute links
+        host = next(
+            (
+                host
+                for host in settings.ALLOWED_HOSTS
+                if host != "*" and not host.startswith(".")
+            ),
+            "localhost",
+        )
+        self.factory = APIRequestFactory(SERVER_NAME=host)
+        self.template = Template(
+            '{% load release_template_tags %}{% release_assets release "css" "js" %}'
+        )
+
+    def pick(self, iteration, values):
+        return values[iteration % len(values)]
+
+    def scenarios(self):
+        """Return {name: (scenario, COLD, WARM or None for scenarios that aren't cached)}."""
+        return {
+            "accessible_releases": (self.accessible_releases, None),
+            "latest_releases_cold": (self.latest_releases, COLD),
+            "latest_releases_warm": (self.latest_releases, WARM),
+            "api_list": (self.api_list, None),
+            "template_tag_cold": (self.template_tag, COLD),
+            "template_tag_warm": (self.template_tag, WARM),
+            "rmpackages": (self.rmpackages, None),
+        }
+
+    def run(self, iterations, only=None):
+        results = {}
+        for name, (scenario, cache) in self.scenarios().items():
+            if only and name not in only:
+                continue
+            results[name] = measure(scenario, iterations, cache)
+        return results
+
+    def accessible_releases(self, iteration):
+        releases = Release.objects.get_accessible_releases_for_audience(
+            self.pick(iteration, self.audiences),
+            self.pick(iteration, self.sites),
+            self.pick(iteration, self.packages),
+        )
+        list(releases.order_by("-release_date")[:50])
+
+    def latest_releases(self, iteration):
+        Release.objects.get_latest_releases_for_audience(
+            self.pick(iteration, self.audiences),
+            self.pick(iteration, self.sites),
+            self.packages,
+        )
+
+    def api_list(self, iteration):
+        request = self.factory.get("/api/releases/", {"page_size": 50})
+        force_authenticate(request, user=self.user)
+        ReleaseListView.as_view()(request).render()
+
+    def template_tag(self, iteration):
+        if not self.release_ids:
+            return
+        release = Release.objects.get(pk=self.pick(iteration, self.release_ids))
+        self.template.render(Context({"release": release}))
+
+    def rmpackages(self, iteration):
+        call_command("rmpackages", "--format", "ndjson", stdout=StringIO())
+
+
+def compare(results, baseline):
+    """Return {scenario: {metric: relative change}} of the latency percentiles against a baseline run's results."""
+    changes = {}
+    for name, summary in results.items():
+        if name not in baseline:
+            continue
+        changes[name] = {
+            metric: round(summary[metric] / baseline[name][metric] - 1, 3)
+            for metric in ("p50_ms", "p90_ms", "p99_ms")
+            if baseline[name].get(metric)
+        }
+    return changes
@@ -0,0 +1,317 @@
+"""
+Caching for release resolution.
+
+Results live in a bounded in-process LRU and, when RM_CACHE_BACKEND names one of the
+CACHES aliases, in a Django cache backend shared by every node.  Every key embeds a
+generation counter: the "release" generation is bumped whenever a Release, its groups or
+its sites change and the "audience" generation when tester groups change.  Once bumped,
+old entries are never read again and simply age out.  Release entries also expire at the
+next scheduled release or deprecation date, as published by the rmscheduler command.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+
+from releasemanager import settings as rm_settings
+from releasemanager.metrics import cache_requests
+
+MISSING = object()  # sentinel so that a cached "no release" (None) is still a hit
+
+
+class LRUCache:
+    """A small thread safe LRU with per entry expiry."""
+
+    def __init__(self, maxsize, timeout=None):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            try:
+                expires, value = self._data[key]
+            except KeyError:
+                return default
+
+            if expires is not None and expires <= time.monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=MISSING):
+        if self.maxsize <= 0:
+            return
+
+        timeout = self.timeout if timeout is MISSING else timeout
+        expires = None if timeout is None else time.monotonic() + timeout
+
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def get_backend():
+    """Return the shared Django cache backend, or None if only the local LRU is used."""
+    if not rm_settings.RM_CACHE_BACKEND:
+        return None
+    return caches[rm_settings.RM_CACHE_BACKEND]
+
+
+async def acall(func, *args, **kwargs):
+    """Call a function that only touches the caches from async code.
+
+    With just the in-process tier nothing in it can block, so it runs right on the event loop; a shared backend is
+    reached from a thread instead.
+    """
+    if get_backend() is None:
+        return func(*args, **kwargs)
+    return await sync_to_async(func)(*args, **kwargs)
+
+
+# Generations
+
+RELEASE_GENERATION = "release"  # bumped when a release, its groups or its sites change
+AUDIENCE_GENERATION = (
+    "audience"  # bumped when tester group membership or permissions change
+)
+PACKAGE_GENERATION = "packages"  # bumped when a PackageDefinition changes
+
+_generation_lock = threading.Lock()
+_local_generations = {}
+_local_timestamps = {}
+_caches = []
+
+
+def _generation_key(name):
+    return f"{rm_settings.RM_CACHE_PREFIX}:generation:{name}"
+
+
+def get_generation(name=RELEASE_GENERATION):
+    """Return the current value of a generation counter."""
+    backend = get_backend()
+    if backend is None:
+        return _local_generations.get(name, 1)
+
+    generation = backend.get(_generation_key(name))
+    if generation is None:
+        backend.add(_generation_key(name), 1, timeout=None)
+        generation = backend.get(_generation_key(name), 1)
+    return generation
+
+
+def get_local_generation(name=RELEASE_GENERATION):
+    """Return this process's own count of a generation, which changes as soon as it bumps it, without asking the
+    backend.
+    """
+    return _local_generations.get(name, 1)
+
+
+def bump_generation(name=RELEASE_GENERATION):
+    """Invalidate every cache keyed by a generation, on this node and (through the backend) all others."""
+    now = time.time()
+    with _generation_lock:
+        _local_generations[name] = _local_generations.get(name, 1) + 1
+        _local_timestamps[name] = now
+
+    backend = get_backend()
+    if backend is not None:
+        try:
+            backend.incr(_generation_key(name))
+        except ValueError:  # the key was evicted or never set
+            backend.add(_generation_key(name), _local_generations[name], timeout=None)
+        backend.set(_generation_key(name) + ":at", now, timeout=None)
+
+    # the old keys can never be hit again, so free the memory now rather than waiting for eviction
+    for cache in _caches:
+        if cache.generation == name:
+            cache.local.clear()
+
+
+def get_generation_timestamp(name=RELEASE_GENERATION):
+    """Return when a generation was last bumped (as a unix timestamp), or None if that isn't known."""
+    backend = get_backend()
+    if backend is None:
+        return _local_timestamps.get(name)
+    return backend.get(_generation_key(name) + ":at")
+
+
+def invalidate_all():
+    """Bump every generation, e.g. after releases or group memberships were changed without sending signals."""
+    for name in (RELEASE_GENERATION, AUDIENCE_GENERATION, PACKAGE_GENERATION):
+        bump_generation(name)
+
+
+# Scheduled transitions
+
+_local_transition = {}
+
+
+def _transition_key():
+    return f"{rm_settings.RM_CACHE_PREFIX}:next-transition"
+
+
+def set_next_transition(timestamp, checked_at):
+    """Publish when the visible releases next change (a unix timestamp, None if nothing is scheduled), as worked out
+    at checked_at.  The rmscheduler command keeps it up to date; caches keyed by the release generation never outlive
+    it.
+    """
+    _local_transition["state"] = (checked_at, timestamp)
+
+    backend = get_backend()
+    if backend is not None:
+        backend.set(_transition_key(), (checked_at, timestamp), timeout=None)
+
+
+def get_transition_state():
+    """Return the (checked_at, next transition) published last, or None if the scheduler never ran."""
+    backend = get_backend()
+    if backend is None:
+        return _local_transition.get("state")
+    return backend.get(_transition_key())
+
+
+def get_next_transition():
+    """Return the published time of the next scheduled transition, or None if there isn't one (or no scheduler)."""
+    state = get_transition_state()
+    return state[1] if state else None
+
+
+def get_timeout(default):
+    """Cap a timeout (in seconds, None for forever) so that it ends at the next scheduled transition."""
+    next_transition = get_next_transition()
+    if next_transition is None:
+        return default
+
+    remaining = math.ceil(next_transition - time.time())
+    if (
+        remaining <= 0
+    ):  # the scheduler hasn't caught up yet, so there's nothing better to go by
+        return default
+    return remaining if default is None else min(default, remaining)
+
+
+class ResolutionCache:
+    """Two tier cache: the process LRU in front of the optional shared backend."""
+
+    def __init__(self, name, generation=RELEASE_GENERATION):
+        self.name = name
+        self.generation = generation
+        self.local = LRUCache(rm_settings.RM_CACHE_SIZE, rm_settings.RM_CACHE_TIMEOUT)
+        _caches.append(self)
+
+    def make_key(self, *parts, generation=None):
+        """Build a key that is only valid for the current generation.  Pass the generation when making several keys,
+        so that it is only read (from the shared backend) once.
+        """
+        parts = ":".join(str(part) for part in parts)
+        if generation is None:
+            generation = get_generation(self.generation)
+        return f"{rm_settings.RM_CACHE_PREFIX}:{self.name}:{generation}:{parts}"
+
+    def get(self, key, default=MISSING):
+        value = self.local.get(key)
+        if value is not MISSING:
+            cache_requests.inc(cache=self.name, result="local_hit")
+            return value
+
+        backend = get_backend()
+        if backend is None:
+            cache_requests.inc(cache=self.name, result="miss")
+            return default
+
+        value = backend.get(key, MISSING)
+        if value is MISSING:
+            cache_requests.inc(cache=self.name, result="miss")
+            return default
+
+        cache_requests.inc(cache=self.name, result="shared_hit")
+        self.local.set(key, value)
+        return value
+
+    def get_many(self, keys):
+        """Return {key: value} for the keys that are cached, asking the shared backend for the rest in one go."""
+        found, remote = {}, []
+        for key in keys:
+            value = self.local.get(key)
+            if value is MISSING:
+                remote.append(key)
+            else:
+                cache_requests.inc(cache=self.name, result="local_hit")
+                found[key] = value
+
+        backend = get_backend()
+        shared = backend.get_many(remote) if remote and backend is not None else {}
+        for key in remote:
+            if key in shared:
+                cache_requests.inc(cache=self.name, result="shared_hit")
+                self.local.set(key, shared[key])
+                found[key] = shared[key]
+            else:
+                cache_requests.inc(cache=self.name, result="miss")
+        return found
+
+    def _get_timeout(self, timeout):
+        timeout = rm_settings.RM_CACHE_TIMEOUT if timeout is MISSING else timeout
+        if self.generation == RELEASE_GENERATION:
+            # what is visible changes at the next release or deprecation date, whatever the generation
+            timeout = get_timeout(timeout)
+        return timeout
+
+    def set(self, key, value, timeout=MISSING):
+        timeout = self._get_timeout(timeout)
+        self.local.set(key, value, timeout)
+
+        backend = get_backend()
+        if backend is not None:
+            backend.set(key, value, timeout)
+
+    def set_many(self, values, timeout=MISSING):
+        """Cache a {key: value} dict, with one round trip to the shared backend."""
+        if not values:
+            return
+        timeout = self._get_timeout(timeout)
+        for key, value in values.items():
+            self.local.set(key, value, timeout)
+
+        backend = get_backend()
+        if backend is not None:
+            backend.set_many(values, timeout)
+
+    def delete(self, key):
+        self.local.delete(key)
+
+        backend = get_backend()
+        if backend is not None:
+            backend.delete(key)
+
+    def get_or_set(self, key, default_func, timeout=MISSING):
+        value = self.get(key)
+        if value is MISSING:
+            value = default_func()
+            self.set(key, value, timeout)
+        return value
+
+
+release_cache = ResolutionCache("release")
+audience_cache = ResolutionCache("audience", generation=AUDIENCE_GENERATION)
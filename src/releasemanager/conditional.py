@@ -0,0 +1,120 @@
+"""
+Conditional GET support for release views.
+
+Release data only changes when the release generation is bumped or a release or deprecation date passes, so a
+view's ETag can be worked out from those, the user's release audience and the URL without running its queries.
+Clients that already have the current representation get a 304 before the view touches the Release table or a
+serializer.
+
+Only a shared RM_CACHE_BACKEND makes the generation the same in every process.  Without one it is a per-process count
+that other workers, management commands and restarts don't see, so no validators are given at all.  Last-Modified
+also needs rmscheduler: without it nothing says when a date passed, and If-Modified-Since would be answered with a 304
+after it did.
+"""
+
+import hashlib
+import math
+import time
+from collections import namedtuple
+
+from django.contrib.sites.shortcuts import get_current_site
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from releasemanager import settings as rm_settings
+from releasemanager.audience import get_audience
+from releasemanager.cache import (
+    get_backend,
+    get_generation,
+    get_generation_timestamp,
+    get_transition_state,
+)
+
+ReleaseState = namedtuple("ReleaseState", ["etag_parts", "last_modified"])
+
+
+def get_release_state():
+    """Which releases are visible, as a ReleaseState.  None without a shared cache backend, when it can't be known
+    without queries.
+
+    The ETag parts are the release generation, when it was bumped and where the clock stands.  Dates take effect
+    without a bump.  While rmscheduler publishes the next transition the ETag changes as it comes due (and again when
+    the scheduler bumps the generation for it).  Without the scheduler nothing says when a date passes, so ETags last
+    no longer than the release caches (RM_CACHE_TIMEOUT) and there is no last_modified.  With it, last_modified is the
+    later of the last bump and a transition that is due but not handled yet.
+    """
+    if get_backend() is None:
+        return None
+
+    now = time.time()
+    generation, bumped = get_generation(), get_generation_timestamp()
+    last_modified = None if bumped is None else int(bumped)
+    transition = get_transition_state()
+    if transition is None:
+        clock = int(now // (rm_settings.RM_CACHE_TIMEOUT or 60))
+        last_modified = None
+    else:
+        next_transition = transition[1]
+        if next_transition is not None and next_transition <= now:
+            clock = "due"
+            last_modified = max(last_modified or 0, math.ceil(next_transition))
+        else:
+            clock = next_transition
+    return ReleaseState([generation, bumped, clock], last_modified)
+
+
+def make_etag(parts):
+    """A strong ETag from everything a response depends on."""
+    parts = ":".join(str(part) for part in parts)
+    return quote_etag(hashlib.sha256(parts.encode()).hexdigest()[:32])
+
+
+def add_validators(response, etag, last_modified, vary_headers):
+    """Set the ETag, Last-Modified and Vary headers of a response."""
+    response.headers.setdefault("ETag", etag)
+    if last_modified is not None:
+        response.headers.setdefault("Last-Modified", http_date(last_modified))
+    patch_vary_headers(response, vary_headers)
+    return response
+
+
+class ConditionalReleaseMixin:
+    """Add ETag and Last-Modified headers to GET responses and answer matching conditional requests with a 304."""
+
+    # the response depends on the user, so shared caches have to keep one copy per user
+    vary_headers = ["Authorization", "Cookie"]
+
+    def get_etag_parts(self, request):
+        """Everything the response depends on besides the release state (see get_release_state).  Views with more
+        inputs than the URL and user should extend this.
+        """
+        return [
+            get_audience(request.user).key,
+            get_current_site(request).pk,
+            request.get_full_path(),
+        ]
+
+    def get_etag(self, request, release_state):
+        return make_etag(release_state.etag_parts + self.get_etag_parts(request))
+
+    def get(self, request, *args, **kwargs):
+        release_state = get_release_state()
+        if (
+            release_state is None
+        ):  # nothing to validate against, but the response still depends on the user
+            response = super().get(request, *args, **kwargs)
+            patch_vary_headers(response, self.vary_headers)
+            return response
+
+        etag = self.get_etag(request, release_state)
+        last_modified = release_state.last_modified
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+        return add_validators(response, etag, last_modified, self.vary_headers)
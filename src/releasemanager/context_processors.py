@@ -0,0 +1,75 @@
+from collections.abc import Mapping
+
+from asgiref.sync import sync_to_async
+from django.contrib.sites.shortcuts import get_current_site
+
+from .models import Release
+from .packages import registry
+
+
+class RequestReleases(Mapping):
+    """The latest release of every registered package for a request's user and site, by package key (None where
+    there is none).
+
+    Nothing is resolved until a package is looked up, so requests that never look at releases cost nothing, and each
+    package is only resolved once per request.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self._releases = {}
+
+    def resolve(self, packages=None):
+        """Resolve the given packages (all of them by default) that haven't been yet, together."""
+        missing = [
+            package
+            for package in (registry if packages is None else packages)
+            if package not in self._releases
+        ]
+        if missing:
+            self._releases.update(
+                Release.objects.get_latest_releases(
+                    self.request.user, get_current_site(self.request), missing
+                )
+            )
+        return {
+            package: self._releases[package]
+            for package in (self if packages is None else packages)
+        }
+
+    async def aresolve(self, packages=None):
+        """resolve() for async views, where the user and site can't be looked up on the event loop."""
+        return await sync_to_async(self.resolve)(packages)
+
+    def __getitem__(self, package):
+        if package not in registry:
+            raise KeyError(package)
+        if package not in self._releases:
+            self.resolve([package])
+        return self._releases[package]
+
+    def __iter__(self):
+        return iter(registry)
+
+    def __len__(self):
+        return len(registry)
+
+    # looking at every package resolves them in one go rather than one by one
+    def items(self):
+        return self.resolve().items()
+
+    def values(self):
+        return self.resolve().values()
+
+
+def get_request_releases(request):
+    """The request's RequestReleases, set by ReleaseMiddleware or created on first use."""
+    releases = getattr(request, "releases", None)
+    if not isinstance(releases, RequestReleases):
+        releases = request.releases = RequestReleases(request)
+    return releases
+
+
+def releases(request):
+    """Context processor adding the request's releases as current_releases, e.g. {{ current_releases.basic.name }}."""
+    return {"current_releases": get_request_releases(request)}
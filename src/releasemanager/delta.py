@@ -0,0 +1,84 @@
+"""
+Deltas between the files manifests of two releases.
+
+Files are matched by path.  A file is unchanged only when both releases have a content hash for it (see rmsign),
+the hashes match and it is in the same group with the same options; a file without a hash could have changed under
+the same path, so it is always reported as changed.  Deltas can only start from a release the client could have
+been offered, and are cached per pair of releases until a release or its files change.
+"""
+
+from releasemanager.cache import release_cache
+
+
+def _index(manifest):
+    """{path: entry with its file_group} for a {file_group: [entry, ...]} manifest."""
+    index = {}
+    for file_group, entries in (manifest or {}).items():
+        for entry in entries:
+            if isinstance(entry, str):  # a bare path
+                entry = {"path": entry}
+            index[entry["path"]] = dict(entry, file_group=file_group)
+    return index
+
+
+def _unchanged(old, new):
+    return (
+        bool(old.get("hash"))
+        and old.get("hash") == new.get("hash")
+        and old["file_group"] == new["file_group"]
+        and (old.get("options") or {}) == (new.get("options") or {})
+    )
+
+
+def diff_manifests(old, new):
+    """Return the {"added": [...], "removed": [...], "changed": [...]} entries to go from one manifest to another.
+
+    Added and changed files are given as their entry in the new manifest, removed ones by path and group.
+    """
+    old, new = _index(old), _index(new)
+
+    return {
+        "added": [entry for path, entry in new.items() if path not in old],
+        "removed": [
+            {"path": path, "file_group": entry["file_group"]}
+            for path, entry in old.items()
+            if path not in new
+        ],
+        "changed": [
+            entry
+            for path, entry in new.items()
+            if path in old and not _unchanged(old[path], entry)
+        ],
+    }
+
+
+def get_sources(audience, site, package):
+    """{name: pk} of the releases of a package that the audience may be running and so get a delta from.  Cached per
+    audience and site, so the names clients send never end up in cache keys.
+    """
+    from releasemanager.models import Release
+
+    def sources():
+        return dict(
+            Release.objects.get_installed_releases_for_audience(
+                audience, site, package
+            ).values_list("name", "pk")
+        )
+
+    key = release_cache.make_key(
+        "delta-sources", audience.key, getattr(site, "pk", site), package
+    )
+    return release_cache.get_or_set(key, sources)
+
+
+def get_delta(source_pk, target):
+    """The delta to a release from the release with the primary key source_pk (see get_sources).  Computed once per
+    pair of releases, so clients polling for the same update cost no queries.
+    """
+    from releasemanager.models import Release
+
+    def diff():
+        return Release.objects.get(pk=source_pk).diff_files(target)
+
+    key = release_cache.make_key("delta", source_pk, target.pk)
+    return release_cache.get_or_set(key, diff)
@@ -0,0 +1,191 @@
+"""
+Static manifests of the current releases, written by the rmexport command so that a CDN can answer update checks
+without Django.
+
+For each package, site and audience the current release is resolved through Release.objects and its latest release
+payload (the same as the API's) is written to the RM_EXPORT_STORAGE storage as
+<prefix>/<site>/<audience>/<package>/<release>.<digest>.json.  Next to it go .gz and, when the optional brotli
+package is installed, .br copies for serving with a Content-Encoding.  Manifests are named after a digest of their
+content, so they never change once written and can be cached forever.  <prefix>/index.json maps every package, site
+and audience to its current manifest; it is the only file that has to be revalidated.
+
+Exports are incremental.  A manifest whose digest is already in the index isn't written again, and the index is only
+rewritten when a resolution changed.  On storages with local paths every file is written under a temporary name and
+renamed into place, so readers never see a partial file.  Other storages have no rename, so files are saved over their
+name: object stores that overwrite (e.g. S3 with file_overwrite) replace whole objects in one step, but storages that
+keep existing files make write_file delete and save again, and readers can miss the file in between.  The index is
+written last, so it never points at a manifest that isn't there yet.
+
+The audiences are the public one and each group that can test releases on its own.  Releases being rolled out to a
+percentage of users are never exported, because a static file can't tell users apart.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+
+from django.contrib.auth.models import Group
+from django.contrib.sites.models import Site
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage, get_storage_class
+from django.utils.text import get_valid_filename
+
+from releasemanager import settings as rm_settings
+from releasemanager.api.views import get_latest_payload
+from releasemanager.audience import PUBLIC_AUDIENCE, TEST_PERMISSION, ReleaseAudience
+from releasemanager.models import Release
+from releasemanager.packages import registry
+
+try:
+    import brotli
+except ImportError:  # optional, see the "export" extra
+    brotli = None
+
+INDEX_NAME = "index.json"
+
+
+def storage_name(prefix, name):
+    return f"{prefix}/{name}" if prefix else name
+
+
+def get_export_storage():
+    """The RM_EXPORT_STORAGE storage (a dotted path to a storage class), or the default storage."""
+    if rm_settings.RM_EXPORT_STORAGE is None:
+        return default_storage
+    return get_storage_class(rm_settings.RM_EXPORT_STORAGE)(
+        **rm_settings.RM_EXPORT_STORAGE_OPTIONS
+    )
+
+
+def get_export_audiences(public_only=False):
+    """The public audience, then one per group that can test releases."""
+    audiences = [PUBLIC_AUDIENCE]
+    if not public_only:
+        group_ids = (
+            Group.objects.filter(permissions__codename=TEST_PERMISSION)
+            .values_list("pk", flat=True)
+            .distinct()
+            .order_by("pk")
+        )
+        audiences += [ReleaseAudience(False, (pk,)) for pk in group_ids]
+    return audiences
+
+
+def dumps(data):
+    """Compact JSON with sorted keys, so that the same data always makes the same bytes (and digest)."""
+    return json.dumps(data, sort_keys=True, separators=(",", ":")).encode()
+
+
+def compressed_siblings(name, content):
+    """Yield the (name, content) of the compressed copies of a file."""
+    yield f"{name}.gz", gzip.compress(content, compresslevel=9, mtime=0)
+    if brotli is not None:
+        yield f"{name}.br", brotli.compress(content)
+
+
+def write_file(storage, name, content):
+    """Write a file so that it is replaced in one step, never seen half written.
+
+    Only local paths and storages that overwrite on save can do that; for the others the replace isn't atomic.
+    """
+    try:
+        path = storage.path(name)
+    except NotImplementedError:  # not on a local disk
+        saved = storage.save(name, ContentFile(content))
+        if (
+            saved != name
+        ):  # the storage kept the old file and saved this one under another name
+            storage.delete(saved)
+            storage.delete(name)
+            storage.save(name, ContentFile(content))
+        return
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as stream:
+            stream.write(content)
+        os.chmod(temporary, getattr(storage, "file_permissions_mode", None) or 0o644)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def write_with_siblings(storage, name, content):
+    # the compressed copies first, so the plain file is only there once they are too
+    for sibling, compressed in compressed_siblings(name, content):
+        write_file(storage, sibling, compressed)
+    write_file(storage, name, content)
+
+
+def read_index(storage, prefix):
+    """The manifests of the last export's index, or {} if there wasn't one (or it can't be read)."""
+    name = storage_name(prefix, INDEX_NAME)
+    if not storage.exists(name):
+        return {}
+    try:
+        with storage.open(name, "rb") as stream:
+            return json.load(stream)["manifests"]
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+class ExportResult:
+    def __init__(self):
+        self.written = []  # the paths of the manifests that were written
+        self.unchanged = 0
+        self.index_written = False
+
+
+def export_manifests(storage=None, prefix=None, full=False, public_only=False):
+    """Export the current release manifests, only writing the ones whose resolution changed unless full is set."""
+    storage = get_export_storage() if storage is None else storage
+    prefix = (rm_settings.RM_EXPORT_PREFIX if prefix is None else prefix).strip("/")
+    packages = list(registry)
+    previous = {} if full else read_index(storage, prefix)
+
+    result = ExportResult()
+    manifests = {}
+    for site in Site.objects.order_by("pk"):
+        for audience in get_export_audiences(public_only):
+            releases = Release.objects.get_latest_releases_for_audience(
+                audience, site, packages
+            )
+            for package in packages:
+                key = f"{site.pk}/{audience.key}/{package}"
+                release = releases.get(package)
+                if release is None:
+                    manifests[key] = None
+                    continue
+
+                content = dumps(get_latest_payload(release))
+                digest = hashlib.sha256(content).hexdigest()
+                entry = previous.get(key)
+                if entry and entry["digest"] == digest:
+                    manifests[key] = entry
+                    result.unchanged += 1
+                    continue
+
+                path = f"{key}/{get_valid_filename(release.name)}.{digest[:16]}.json"
+                write_with_siblings(storage, storage_name(prefix, path), content)
+                manifests[key] = {
+                    "release": release.name,
+                    "path": path,
+                    "digest": digest,
+                }
+                result.written.append(path)
+
+    if full or manifests != previous:
+        index = {
+            "generated": datetime.now(timezone.utc).isoformat(),
+            "manifests": manifests,
+        }
+        write_with_siblings(storage, storage_name(prefix, INDEX_NAME), dumps(index))
+        result.index_written = True
+
+    return result
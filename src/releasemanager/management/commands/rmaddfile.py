@@ -1,9 +1,7 @@
 from django.core.management.base import BaseCommand, CommandError
 
 from releasemanager.models import Release
-
-# django settings
-from django.conf import settings
+from releasemanager.packages import registry
 
 
 class Command(BaseCommand):
@@ -36,46 +34,43 @@ class Command(BaseCommand):
             file_extension = path.split(".")[-1]  # Simple extraction of file extension
             file_group = file_extension  # Use the file extension as the file group
 
-        options_list = options.get("option", [])
-
-        try:
-            package = settings.RM_PACKAGES[package_name]
-            release = Release.objects.get(name=release_name, package=package)
-
-            if not release.files:  # make sure the object is created
-                release.files = {}
-
-            if file_group not in release.files:
-                release.files[file_group] = []
+        options_list = options.get("option") or []
 
-            options = {}
+        if package_name not in registry:
+            raise CommandError(f'Package "{package_name}" does not exist.')
 
-            # TODO:  Check if the file is already added.  Just update options if it is.
+        file_options = {}
+        for option in options_list:
+            try:
+                key, value = option.split("=", 1)
+                file_options[key] = value
+            except ValueError:
+                raise CommandError("Options must be in the format key=value")
 
-            if options_list:
-                for option in options_list:
-                    try:
-                        key, value = option.split("=")
-                        options[key] = value
-                    except ValueError:
-                        raise CommandError("Options must be in the format key=value")
+        try:
+            release = Release.objects.get(name=release_name, package=package_name)
+        except Release.DoesNotExist:
+            raise CommandError(
+                f'Release "{release_name}" for package "{package_name}" does not exist.'
+            )
 
-            release.files[file_group].append({"path": path, "options": options})
+        try:
+            # If the file is already registered only its group and options are updated
+            created, updated = release.add_files(
+                {file_group: [{"path": path, "options": file_options}]}
+            )
+        except Exception as e:
+            raise CommandError(f"Error registering file: {e}")
 
-            release.save()
+        if created:
             self.stdout.write(
                 self.style.SUCCESS(
                     f"Successfully registered file at {path} under {file_group} in release {release_name} of package {package_name}."
                 )
             )
-
-        except KeyError:
-            raise CommandError(
-                f'Package "{package_name}" does not exist.'
-            )  # Only dictionary query is checing on the package so this works
-        except Release.DoesNotExist:
-            raise CommandError(
-                f'Release "{release_name}" for package "{package_name}" does not exist.'
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Updated file at {path} under {file_group} in release {release_name} of package {package_name}."
+                )
             )
-        except Exception as e:
-            raise CommandError(f"Error registering file: {e}")
@@ -1,43 +1,116 @@
+import json
+import sys
+
 from django.core.management.base import BaseCommand, CommandError
 
+from releasemanager.api.serializers import ReleaseBulkSerializer
 from releasemanager.models import Release
-
-# django settings
-from django.conf import settings
+from releasemanager.packages import registry
 
 
 class Command(BaseCommand):
-    help = "Registers a new release for a package"
+    help = "Registers a new release for a package, or every release listed in a JSON or NDJSON file"
 
     def add_arguments(self, parser):
-        parser.add_argument("package_name", type=str, help="Name of the package")
-        parser.add_argument("release_name", type=str, help="Name of the release")
+        parser.add_argument(
+            "package_name", type=str, nargs="?", help="Name of the package"
+        )
+        parser.add_argument(
+            "release_name", type=str, nargs="?", help="Name of the release"
+        )
+        parser.add_argument(
+            "--from-file",
+            type=str,
+            help='Optional: a JSON list (or NDJSON, one per line) of {"package": ..., "name": ..., "sites": [...], '
+            '"groups": [...], ...} releases to create in bulk, or - to read it from stdin',
+        )
 
     def handle(self, *args, **options):
+        if options["from_file"]:
+            return self.handle_file(options["from_file"])
+
         package_name = options["package_name"]
         release_name = options["release_name"]
 
-        try:
-            package = settings.RM_PACKAGES[package_name]
-            release, created = Release.objects.get_or_create(
-                name=release_name, package=package_name
-            )
+        if not package_name or not release_name:
+            raise CommandError("Give a package and release name, or --from-file.")
+
+        if package_name not in registry:
+            raise CommandError(f'Package "{package_name}" does not exist.')
 
-            if created:
-                release.save()
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f"Successfully registered release {release_name} for package {package_name}."
-                    )
+        release, created = Release.objects.get_or_create(
+            name=release_name, package=package_name
+        )
+
+        if created:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Successfully registered release {release_name} for package {package_name}."
                 )
-            else:
-                self.stdout.write(
-                    self.style.WARNING(
-                        f"Release {release_name} for package {package_name} already exists."
-                    )
+            )
+        else:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Release {release_name} for package {package_name} already exists."
                 )
+            )
+
+    def handle_file(self, path):
+        try:
+            if path == "-":
+                entries = self.read_entries(sys.stdin)
+            else:
+                with open(path) as stream:
+                    entries = self.read_entries(stream)
+        except OSError as e:
+            raise CommandError(f"Error reading releases: {e}")
+        except ValueError as e:
+            raise CommandError(f"Error parsing releases: {e}")
+
+        if not isinstance(entries, list):
+            raise CommandError("Error parsing releases: expected a list of releases.")
 
-        except KeyError:
+        # the same checks as the bulk create API: packages, sites, groups, dates and statuses
+        serializer = ReleaseBulkSerializer(data=entries, many=True)
+        if not serializer.is_valid():
             raise CommandError(
-                f'Package "{package_name}" does not exist.'
-            )  # Only dictionary query is checing on the package so this works
+                f"Invalid releases: {self.format_errors(serializer.errors)}"
+            )
+
+        created, skipped = Release.objects.bulk_create_releases(
+            serializer.validated_data
+        )
+
+        for entry in skipped:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Release {entry['name']} for package {entry['package']} already exists."
+                )
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"Successfully registered {len(created)} releases.")
+        )
+
+    def format_errors(self, errors):
+        """The serializer's errors as text, by release number (from 1) and field."""
+        if isinstance(errors, dict):  # about the whole list, e.g. unknown sites
+            errors = [errors]
+            numbered = False
+        else:
+            numbered = True
+
+        messages = []
+        for number, entry in enumerate(errors, 1):
+            for field, field_errors in entry.items():
+                if not isinstance(field_errors, list):  # per list item, e.g. sites
+                    field_errors = list(field_errors.values())
+                prefix = f"release {number} " if numbered else ""
+                messages.append(f"{prefix}{field}: {' '.join(map(str, field_errors))}")
+        return "; ".join(messages)
+
+    def read_entries(self, stream):
+        """Read a JSON list of releases, or NDJSON with one release per line."""
+        content = stream.read()
+        if content.lstrip().startswith("["):
+            return json.loads(content)
+        return [json.loads(line) for line in content.splitlines() if line.strip()]
@@ -0,0 +1,120 @@
+import json
+import platform
+from datetime import datetime, timezone
+
+import django
+from django.contrib.auth.models import Group
+from django.contrib.sites.models import Site
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from releasemanager.benchmark import Benchmark, compare
+from releasemanager.models import Release, ReleaseFile
+
+FORMATS = ["table", "json"]
+
+
+class Command(BaseCommand):
+    help = "Measures release resolution latency and query counts against the current database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "scenarios",
+            nargs="*",
+            type=str,
+            help="Optional: only run these scenarios (defaults to all of them)",
+        )
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=100,
+            help="Number of calls per scenario",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Random seed for the inputs"
+        )
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            default="table",
+            help="Optional: output format, table (the default) or json",
+        )
+        parser.add_argument(
+            "--output",
+            type=str,
+            default=None,
+            help="Optional: also write the results as JSON to this file",
+        )
+        parser.add_argument(
+            "--compare",
+            type=str,
+            default=None,
+            help="Optional: a JSON results file of an earlier run to compare the percentiles with",
+        )
+        parser.add_argument(
+            "--label",
+            type=str,
+            default="",
+            help="Optional: recorded with the results, e.g. the commit being measured",
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options["compare"]:
+            try:
+                with open(options["compare"]) as stream:
+                    baseline = json.load(stream)["results"]
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f"Error reading the baseline: {e}")
+
+        benchmark = Benchmark(seed=options["seed"])
+        unknown = set(options["scenarios"]) - set(benchmark.scenarios())
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+        report = {
+            "meta": {
+                "label": options["label"],
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "iterations": options["iterations"],
+                "seed": options["seed"],
+                "releases": Release.objects.count(),
+                "files": ReleaseFile.objects.count(),
+                "groups": Group.objects.count(),
+                "sites": Site.objects.count(),
+            },
+            "results": benchmark.run(options["iterations"], options["scenarios"]),
+        }
+        if baseline is not None:
+            report["changes"] = compare(report["results"], baseline)
+
+        if options["output"]:
+            with open(options["output"], "w") as stream:
+                json.dump(report, stream, indent=2)
+
+        if options["format"] == "json":
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.write_table(report)
+
+    def write_table(self, report):
+        meta = report["meta"]
+        self.stdout.write(
+            f"{meta['releases']} releases, {meta['groups']} groups, {meta['sites']} sites on {meta['database']}, "
+            f"{meta['iterations']} iterations"
+        )
+
+        columns = ["scenario", "p50_ms", "p90_ms", "p99_ms", "max_ms", "queries_mean"]
+        if "changes" in report:
+            columns.append("p50 change")
+        self.stdout.write(self.style.SUCCESS("\t".join(columns)))
+
+        for name, summary in report["results"].items():
+            cells = [name] + [summary[column] for column in columns[1:6]]
+            if "changes" in report:
+                change = report["changes"].get(name, {}).get("p50_ms")
+                cells.append("-" if change is None else f"{change:+.1%}")
+            self.stdout.write("\t".join(str(cell) for cell in cells))
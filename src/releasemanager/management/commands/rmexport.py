@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from releasemanager.export import export_manifests
+
+
+class Command(BaseCommand):
+    help = "Exports the current release of every package, site and audience as static manifests for a CDN"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--prefix",
+            type=str,
+            default=None,
+            help="Optional: directory of the export in the storage (defaults to RM_EXPORT_PREFIX)",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Optional: rewrite every manifest, not just the ones whose release changed",
+        )
+        parser.add_argument(
+            "--public-only",
+            action="store_true",
+            help="Optional: only export the public audience, not the tester groups",
+        )
+
+    def handle(self, *args, **options):
+        result = export_manifests(
+            prefix=options["prefix"],
+            full=options["full"],
+            public_only=options["public_only"],
+        )
+
+        if options["verbosity"] > 1:
+            for path in result.written:
+                self.stdout.write(path)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{len(result.written)} manifests written, {result.unchanged} unchanged"
+                + ("" if result.index_written else ", index unchanged")
+            )
+        )
@@ -0,0 +1,225 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.contrib.sites.models import Site
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.utils import timezone
+
+from releasemanager.audience import TEST_PERMISSION, forget_audiences
+from releasemanager.models import Release, ReleaseFile, Status
+from releasemanager.packages import registry
+from releasemanager.signals import release_deleted, releases_changed
+
+PREFIX = "synthetic"  # everything generated is named after it, so it can be told apart and cleared
+RELEASE_PREFIX = "syn-"  # release names are limited to 20 characters
+BATCH_SIZE = 1000
+FILE_GROUPS = ["css", "js"]
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Generates a synthetic dataset of releases, groups, sites and users for benchmarking"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--releases", type=int, default=1000, help="Number of releases"
+        )
+        parser.add_argument(
+            "--packages",
+            type=int,
+            default=None,
+            help="Number of packages, the registered ones first (defaults to the registered packages)",
+        )
+        parser.add_argument(
+            "--groups", type=int, default=20, help="Number of tester groups"
+        )
+        parser.add_argument("--sites", type=int, default=5, help="Number of sites")
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=50,
+            help="Number of users, each in up to 3 tester groups",
+        )
+        parser.add_argument(
+            "--files", type=int, default=5, help="Number of files per release"
+        )
+        parser.add_argument(
+            "--site-ratio",
+            type=float,
+            default=0.2,
+            help="Share of releases isolated to some sites",
+        )
+        parser.add_argument(
+            "--group-ratio",
+            type=float,
+            default=0.1,
+            help="Share of releases locked to some groups",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Random seed, for repeatable datasets"
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Remove previously generated data first",
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        start = time.perf_counter()
+
+        if options["clear"]:
+            self.clear()
+
+        packages = list(registry)
+        if options["packages"] is not None:
+            if options["packages"] < 1:
+                raise CommandError("There has to be at least one package.")
+            packages = packages[: options["packages"]] + [
+                f"{PREFIX}-{n}" for n in range(options["packages"] - len(packages))
+            ]
+
+        with transaction.atomic():
+            groups = self.create_groups(options["groups"])
+            sites = self.create_sites(options["sites"])
+            self.create_users(options["users"], groups, rng)
+
+        created = 0
+        offset = Release.objects.filter(name__startswith=RELEASE_PREFIX).count()
+        for batch_start in range(0, options["releases"], BATCH_SIZE):
+            count = min(BATCH_SIZE, options["releases"] - batch_start)
+            entries = [
+                self.release_entry(
+                    offset + batch_start + n, packages, groups, sites, rng, options
+                )
+                for n in range(count)
+            ]
+            releases, _ = Release.objects.bulk_create_releases(entries)
+            self.create_files(releases, options["files"])
+            created += len(releases)
+
+        forget_audiences()
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {created} releases of {len(packages)} packages, {len(groups)} groups, {len(sites)} sites "
+                f"and {options['users']} users in {elapsed:.2f}s."
+            )
+        )
+
+    def create_groups(self, count):
+        permission = Permission.objects.get(
+            codename=TEST_PERMISSION, content_type__app_label="releasemanager"
+        )
+        names = [f"{PREFIX}-group-{n}" for n in range(count)]
+        Group.objects.bulk_create(
+            [Group(name=name) for name in names], ignore_conflicts=True
+        )
+        groups = list(Group.objects.filter(name__in=names))
+        Group.permissions.through.objects.bulk_create(
+            [
+                Group.permissions.through(
+                    group_id=group.pk, permission_id=permission.pk
+                )
+                for group in groups
+            ],
+            ignore_conflicts=True,
+        )
+        return groups
+
+    def create_sites(self, count):
+        domains = [f"{PREFIX}-{n}.example.com" for n in range(count)]
+        Site.objects.bulk_create(
+            [Site(domain=domain, name=domain) for domain in domains],
+            ignore_conflicts=True,
+        )
+        return list(Site.objects.filter(domain__in=domains))
+
+    def create_users(self, count, groups, rng):
+        usernames = [f"{PREFIX}-user-{n}" for n in range(count)]
+        User.objects.bulk_create(
+            [User(username=username) for username in usernames],
+            ignore_conflicts=True,
+        )
+        users = list(User.objects.filter(username__in=usernames))
+        if groups:
+            # the through table's columns depend on the user model
+            field = User.groups.field
+            user_field, group_field = (
+                field.m2m_field_name(),
+                field.m2m_reverse_field_name(),
+            )
+            User.groups.through.objects.bulk_create(
+                [
+                    User.groups.through(**{user_field: user, group_field: group})
+                    for user in users
+                    for group in rng.sample(groups, rng.randint(0, min(3, len(groups))))
+                ],
+                ignore_conflicts=True,
+            )
+
+    def release_entry(self, number, packages, groups, sites, rng, options):
+        now = timezone.now()
+        release_date = now + timedelta(days=rng.uniform(-365, 30))
+        deprecation_date = None
+        if rng.random() < 0.1:
+            deprecation_date = release_date + timedelta(days=rng.uniform(1, 180))
+
+        entry = {
+            "package": rng.choice(packages),
+            "name": f"{RELEASE_PREFIX}{number}",
+            "active": rng.random() < 0.9,
+            "status": rng.choice(Status.values),
+            "release_date": release_date,
+            "deprecation_date": deprecation_date,
+        }
+        if sites and rng.random() < options["site_ratio"]:
+            entry["sites"] = [
+                site.pk
+                for site in rng.sample(sites, rng.randint(1, min(3, len(sites))))
+            ]
+        if groups and rng.random() < options["group_ratio"]:
+            entry["groups"] = [
+                group.pk
+                for group in rng.sample(groups, rng.randint(1, min(3, len(groups))))
+            ]
+        return entry
+
+    def create_files(self, releases, count):
+        ReleaseFile.objects.bulk_create(
+            [
+                ReleaseFile(
+                    release=release,
+                    file_group=FILE_GROUPS[n % len(FILE_GROUPS)],
+                    path=f"{release.package}/{release.name}/{n}.{FILE_GROUPS[n % len(FILE_GROUPS)]}",
+                    order=n,
+                )
+                for release in releases
+                for n in range(count)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+    def clear(self):
+        releases = Release.objects.filter(name__startswith=RELEASE_PREFIX)
+        packages = set(releases.values_list("package", flat=True).distinct())
+
+        # every deleted release would refresh its package, so refresh them once afterwards instead
+        post_delete.disconnect(release_deleted, sender=Release)
+        try:
+            releases.delete()
+        finally:
+            post_delete.connect(release_deleted, sender=Release)
+
+        User.objects.filter(username__startswith=f"{PREFIX}-user-").delete()
+        Group.objects.filter(name__startswith=f"{PREFIX}-group-").delete()
+        Site.objects.filter(domain__startswith=f"{PREFIX}-").delete()
+
+        releases_changed(packages)
@@ -0,0 +1,153 @@
+import csv
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from releasemanager.cache import bump_generation
+from releasemanager.models import Release
+from releasemanager.packages import registry
+
+FORMATS = ["json", "ndjson", "csv"]
+ENTRY_FIELDS = ["path", "file_group", "options", "size", "hash"]
+
+
+def read_entries(stream, manifest_format):
+    """Yield {"path": ..., "file_group": ..., ...} dicts from a manifest.
+
+    NDJSON and CSV are read a line at a time.  JSON is either a list of entries or a release style
+    {file_group: [path or entry, ...]} manifest.
+    """
+    if manifest_format == "ndjson":
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+    elif manifest_format == "csv":
+        # path, file_group, size & hash columns, anything else is an option
+        for row in csv.DictReader(stream):
+            entry = {"options": {}}
+            for key, value in row.items():
+                if key in ("path", "file_group", "hash"):
+                    entry[key] = value
+                elif key == "size":
+                    entry[key] = int(value) if value else None
+                elif key and value:
+                    entry["options"][key] = value
+            yield entry
+
+    else:
+        data = json.load(stream)
+        if isinstance(data, dict):
+            for file_group, items in data.items():
+                for item in items if isinstance(items, list) else [items]:
+                    if isinstance(item, str):
+                        item = {"path": item}
+                    yield dict(item, file_group=file_group)
+        else:
+            yield from data
+
+
+class Command(BaseCommand):
+    help = "Registers every file listed in a JSON, NDJSON or CSV manifest under a release in a single transaction"
+
+    def add_arguments(self, parser):
+        parser.add_argument("package_name", type=str, help="Name of the package")
+        parser.add_argument("release_name", type=str, help="Name of the release")
+        parser.add_argument(
+            "manifest",
+            type=str,
+            help="Path of the manifest file, or - to read it from stdin",
+        )
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            default=None,
+            help="Optional: manifest format, guessed from the file extension by default (stdin defaults to ndjson)",
+        )
+        parser.add_argument(
+            "--replace",
+            action="store_true",
+            help="Optional: remove the release's files that are not in the manifest",
+        )
+
+    def handle(self, *args, **options):
+        package_name = options["package_name"]
+        release_name = options["release_name"]
+        manifest_path = options["manifest"]
+        manifest_format = options["format"]
+
+        if not manifest_format:
+            extension = manifest_path.rsplit(".", 1)[-1].lower()
+            manifest_format = extension if extension in FORMATS else "ndjson"
+
+        if package_name not in registry:
+            raise CommandError(f'Package "{package_name}" does not exist.')
+
+        try:
+            release = Release.objects.get(name=release_name, package=package_name)
+        except Release.DoesNotExist:
+            raise CommandError(
+                f'Release "{release_name}" for package "{package_name}" does not exist.'
+            )
+
+        start = time.perf_counter()
+
+        if manifest_path == "-":
+            entries, read = self.collect(sys.stdin, manifest_format)
+        else:
+            try:
+                with open(manifest_path, newline="") as stream:
+                    entries, read = self.collect(stream, manifest_format)
+            except OSError as e:
+                raise CommandError(f"Error reading manifest: {e}")
+
+        manifest = {}
+        for entry in entries.values():
+            manifest.setdefault(entry["file_group"], []).append(entry)
+
+        with transaction.atomic():
+            removed = 0
+            if options["replace"]:
+                removed, _ = release.release_files.exclude(
+                    path__in=list(entries)
+                ).delete()
+            created, updated = release.add_files(manifest)
+            if removed and not (
+                created or updated
+            ):  # add_files didn't invalidate anything
+                transaction.on_commit(bump_generation)
+
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {len(entries)} files into release {release_name} of package {package_name} in "
+                f"{elapsed:.2f}s: {created} added, {updated} updated, {removed} removed, "
+                f"{read - len(entries)} duplicate entries skipped."
+            )
+        )
+
+    def collect(self, stream, manifest_format):
+        """Read the manifest into a {path: entry} dict, later entries for a path replace earlier ones."""
+        entries = {}
+        read = 0
+
+        try:
+            for entry in read_entries(stream, manifest_format):
+                read += 1
+                path = entry.get("path")
+                if not path:
+                    raise CommandError(f"Manifest entry {read} has no path")
+
+                # as with rmaddfile, the file extension is the default file group
+                entry["file_group"] = entry.get("file_group") or path.split(".")[-1]
+                entries[path] = {
+                    key: entry[key] for key in ENTRY_FIELDS if key in entry
+                }
+        except (ValueError, TypeError, AttributeError) as e:
+            raise CommandError(f"Error reading manifest entry {read + 1}: {e}")
+
+        return entries, read
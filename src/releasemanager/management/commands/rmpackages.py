@@ -1,49 +1,139 @@
+import json
+
 from django.core.management.base import BaseCommand
+from django.db.models import Count, Min, OuterRef, Q, Subquery
+from django.utils import timezone
 
 from releasemanager.models import Release, Status
+from releasemanager.packages import registry
+
+FORMATS = ["table", "json", "ndjson"]
+
+
+def package_report(packages):
+    """Summarize the releases of each package with a single grouped query.
+
+    Returns a {package: row} dict: release counts (in total, active and by status), the latest released version and
+    when the next scheduled release and deprecation are due.
+    """
+    now = timezone.now()
+
+    latest_released = (
+        Release.objects.filter(
+            Q(deprecation_date__gt=now) | Q(deprecation_date__isnull=True),
+            package=OuterRef("package"),
+            active=True,
+            status=Status.RELEASED,
+            release_date__lte=now,
+        )
+        .order_by("-release_date", "-pk")
+        .values("name")[:1]
+    )
+
+    rows = (
+        Release.objects.filter(package__in=list(packages))
+        .order_by()
+        .values("package")
+        .annotate(
+            releases=Count("pk"),
+            active_releases=Count("pk", filter=Q(active=True)),
+            latest_release=Subquery(latest_released),
+            next_release=Min(
+                "release_date", filter=Q(active=True, release_date__gt=now)
+            ),
+            next_deprecation=Min(
+                "deprecation_date", filter=Q(active=True, deprecation_date__gt=now)
+            ),
+            **{
+                f"status_{value}": Count("pk", filter=Q(status=value))
+                for value in Status.values
+            },
+        )
+    )
 
-# django settings
-from django.conf import settings
+    report = {}
+    for row in rows:
+        report[row["package"]] = {
+            "releases": row["releases"],
+            "active": row["active_releases"],
+            "statuses": {
+                Status(value).name.lower(): row[f"status_{value}"]
+                for value in Status.values
+            },
+            "latest_release": row["latest_release"],
+            "next_release": row["next_release"],
+            "next_deprecation": row["next_deprecation"],
+        }
+    return report
 
 
 class Command(BaseCommand):
-    help = "Lists all packages defined in settings.RM_PACKAGES"
+    help = "Reports the releases of every registered package"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            default="table",
+            help="Optional: output format, table (the default), json or ndjson",
+        )
 
     def handle(self, *args, **options):
-        packages = getattr(settings, "RM_PACKAGES", {})
-        if packages:
-            self.stdout.write(
-                self.style.SUCCESS(
-                    "Listing all configured packages and their active releases:"
-                )
-            )
-            for key, details in packages.items():
-                self.stdout.write(f'Package key: {key}, Name: {details.get("name")}')
-                # Fetch active releases for this package key
-                active_releases = Release.objects.filter(package=key, active=True)
-                if active_releases.exists():
-                    self.stdout.write("\tActive Releases:")
-                    for release in active_releases:
-                        if release.status == Status.RELEASED:
-                            self.stdout.write(
-                                self.style.SUCCESS(f"\t\tVersion: {release.name}*")
-                            )
-                        elif (
-                            release.status == Status.TESTING
-                            or release.status == Status.DEVELOPMENT
-                        ):
-                            self.stdout.write(
-                                self.style.WARNING(f"\t\tVersion: {release.name}")
-                            )
-                        elif release.status == Status.DEPRECATED:
-                            self.stdout.write(
-                                self.style.ERROR(f"\t\tVersion: {release.name}~")
-                            )
-                        else:
-                            self.stdout.write(f"\t\tVersion: {release.name}")
-                else:
-                    self.stdout.write("\tNo active releases")
+        packages = registry.packages
+        report = package_report(packages)
+        empty = {
+            "releases": 0,
+            "active": 0,
+            "statuses": {status.name.lower(): 0 for status in Status},
+            "latest_release": None,
+            "next_release": None,
+            "next_deprecation": None,
+        }
+
+        rows = (
+            dict(package=key, name=package.name, **report.get(key, empty))
+            for key, package in packages.items()
+        )
+
+        if options["format"] == "table":
+            if not packages:
+                self.stdout.write(self.style.WARNING("No packages registered."))
+                return
+            self.write_table(rows)
+        elif options["format"] == "json":
+            self.stdout.write("[")
+            for number, row in enumerate(rows):
+                separator = "," if number < len(packages) - 1 else ""
+                self.stdout.write(f"  {self.dumps(row)}{separator}")
+            self.stdout.write("]")
         else:
-            self.stdout.write(
-                self.style.WARNING("No packages defined in settings.RM_PACKAGES.")
-            )
+            for row in rows:
+                self.stdout.write(self.dumps(row))
+
+    def dumps(self, row):
+        return json.dumps(row, default=lambda value: value.isoformat())
+
+    def write_table(self, rows):
+        statuses = [status.name.lower() for status in Status]
+        columns = [
+            "package",
+            "releases",
+            "active",
+            *statuses,
+            "latest",
+            "next release",
+            "next deprecation",
+        ]
+        self.stdout.write(self.style.SUCCESS("\t".join(columns)))
+
+        for row in rows:
+            cells = [
+                row["package"],
+                row["releases"],
+                row["active"],
+                *(row["statuses"][status] for status in statuses),
+                row["latest_release"] or "-",
+                row["next_release"].isoformat() if row["next_release"] else "-",
+                row["next_deprecation"].isoformat() if row["next_deprecation"] else "-",
+            ]
+            self.stdout.write("\t".join(str(cell) for cell in cells))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from releasemanager.cache import bump_generation
+from releasemanager.models import ReleaseResolution
+from releasemanager.packages import registry
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the materialized release resolution table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "packages",
+            nargs="*",
+            type=str,
+            help="Optional: only rebuild these packages (defaults to all of them)",
+        )
+        parser.add_argument(
+            "--stale",
+            action="store_true",
+            help="Only rebuild packages that have passed a release or deprecation date since their last rebuild",
+        )
+
+    def handle(self, *args, **options):
+        packages = options["packages"] or None
+
+        for package_name in packages or []:
+            if package_name not in registry:
+                raise CommandError(f'Package "{package_name}" does not exist.')
+
+        if options["stale"]:
+            stale = ReleaseResolution.objects.stale_packages()
+            packages = stale if packages is None else stale & set(packages)
+
+        rows = ReleaseResolution.objects.rebuild(packages)
+        bump_generation()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt the release resolution table ({rows} rows).")
+        )
@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from releasemanager.scheduler import run_scheduler
+
+
+class Command(BaseCommand):
+    help = "Applies release and deprecation dates that have come due, once or in a loop"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Optional: keep running, waking up at each scheduled transition",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=60,
+            help="Optional: with --loop, the most seconds to wait between runs (default 60), which also picks up "
+            "releases scheduled since the last run",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            run = run_scheduler()
+            self.report(run)
+
+            if not options["loop"]:
+                return
+
+            # wake up for the next transition, or after the interval to pick up newly scheduled ones
+            wait = options["interval"]
+            if run.next_transition is not None:
+                wait = min(wait, (run.next_transition - timezone.now()).total_seconds())
+
+            close_old_connections()
+            try:
+                time.sleep(max(wait, 1))
+            except KeyboardInterrupt:
+                return
+
+    def report(self, run):
+        if run.packages is None:
+            changed = "all packages refreshed"
+        else:
+            changed = f"{len(run.packages)} packages refreshed"
+
+        next_transition = (
+            run.next_transition.isoformat() if run.next_transition else "none"
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{run.deprecated} releases deprecated, {changed}, next transition: {next_transition}."
+            )
+        )
@@ -0,0 +1,84 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from releasemanager.models import Release
+from releasemanager.packages import registry
+from releasemanager.signing import digest_files, release_signature, store_digests
+
+
+class Command(BaseCommand):
+    help = "Hashes every file of a release and signs the release with RM_SIGNING_KEY"
+
+    def add_arguments(self, parser):
+        parser.add_argument("package_name", type=str, help="Name of the package")
+        parser.add_argument("release_name", type=str, help="Name of the release")
+        parser.add_argument(
+            "--root",
+            type=str,
+            default=None,
+            help="Optional: directory the release's files are in (defaults to RM_FILE_ROOT)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Optional: number of files hashed at once",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Optional: hash every file again, even those unchanged since they were last hashed",
+        )
+
+    def handle(self, *args, **options):
+        package_name = options["package_name"]
+        release_name = options["release_name"]
+
+        if package_name not in registry:
+            raise CommandError(f'Package "{package_name}" does not exist.')
+
+        try:
+            release = Release.objects.get(name=release_name, package=package_name)
+        except Release.DoesNotExist:
+            raise CommandError(
+                f'Release "{release_name}" for package "{package_name}" does not exist.'
+            )
+
+        start = time.perf_counter()
+        digests = digest_files(
+            release.release_files.all(),
+            root=options["root"],
+            workers=options["workers"],
+            incremental=not options["force"],
+        )
+        elapsed = time.perf_counter() - start
+
+        errors = [digest for digest in digests if digest.error]
+        if errors:
+            for digest in errors:
+                self.stderr.write(f"{digest.release_file.path}: {digest.error}")
+            raise CommandError(
+                f"Could not hash {len(errors)} files, release {release_name} was not signed."
+            )
+
+        for digest in digests:
+            if not digest.hash:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"{digest.release_file.path} is not a local file and has no hash, it is not signed."
+                    )
+                )
+
+        updated = store_digests(digests)
+        release.signature = release_signature(digests)
+        release.save(update_fields=["signature"])
+
+        read = [digest for digest in digests if digest.read]
+        megabytes = sum(digest.size for digest in read) / (1024 * 1024)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Signed release {release_name} of package {package_name}: {len(digests)} files, {len(read)} hashed "
+                f"({megabytes:.1f} MB in {elapsed:.2f}s), {updated} updated."
+            )
+        )
@@ -0,0 +1,94 @@
+import hmac
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from releasemanager.models import Release
+from releasemanager.packages import registry
+from releasemanager.signing import digest_files, release_signature, store_digests
+
+
+class Command(BaseCommand):
+    help = "Checks a release's files against their stored hashes and the release's signature"
+
+    def add_arguments(self, parser):
+        parser.add_argument("package_name", type=str, help="Name of the package")
+        parser.add_argument("release_name", type=str, help="Name of the release")
+        parser.add_argument(
+            "--root",
+            type=str,
+            default=None,
+            help="Optional: directory the release's files are in (defaults to RM_FILE_ROOT)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Optional: number of files hashed at once",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Optional: hash every file, rather than trusting files whose size and mtime are unchanged",
+        )
+
+    def handle(self, *args, **options):
+        package_name = options["package_name"]
+        release_name = options["release_name"]
+
+        if package_name not in registry:
+            raise CommandError(f'Package "{package_name}" does not exist.')
+
+        try:
+            release = Release.objects.get(name=release_name, package=package_name)
+        except Release.DoesNotExist:
+            raise CommandError(
+                f'Release "{release_name}" for package "{package_name}" does not exist.'
+            )
+
+        if not release.signature:
+            raise CommandError(
+                f"Release {release_name} of package {package_name} is not signed, run rmsign first."
+            )
+
+        start = time.perf_counter()
+        digests = digest_files(
+            release.release_files.all(),
+            root=options["root"],
+            workers=options["workers"],
+            incremental=not options["full"],
+        )
+        elapsed = time.perf_counter() - start
+
+        problems = []
+        for digest in digests:
+            path = digest.release_file.path
+            if digest.error:
+                problems.append(f"{path}: {digest.error}")
+            elif not digest.release_file.hash and digest.location is None:
+                continue  # neither local nor registered with a hash, as rmsign warned
+            elif not digest.release_file.hash:
+                problems.append(f"{path}: not signed")
+            elif digest.hash != digest.release_file.hash:
+                problems.append(f"{path}: modified")
+
+        if not hmac.compare_digest(release_signature(digests), release.signature):
+            problems.append("The release signature does not match its files.")
+
+        if problems:
+            for problem in problems:
+                self.stderr.write(problem)
+            raise CommandError(
+                f"Release {release_name} of package {package_name} failed verification."
+            )
+
+        # the content is unchanged, remember the new mtimes so these files are skipped next time
+        store_digests(digests)
+
+        read = sum(1 for digest in digests if digest.read)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Verified release {release_name} of package {package_name}: {len(digests)} files, {read} hashed "
+                f"in {elapsed:.2f}s."
+            )
+        )
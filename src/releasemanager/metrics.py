@@ -0,0 +1,284 @@
+"""
+Instrumentation of release resolution.
+
+Counters and histograms are kept in process and can be scraped in the Prometheus text format (see
+releasemanager.views.MetricsView, enabled with RM_METRICS_ENDPOINT).  Every observation is also passed to the
+RM_METRICS_HOOK callable, if one is set, as hook(kind, name, value, labels) so that it can be forwarded to statsd or
+the like.  RM_METRICS = False turns all of it off.
+
+Resolutions slower than RM_SLOW_RESOLUTION_MS are logged to the "releasemanager.metrics" logger together with the
+query plan of the resolution query.
+"""
+
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from releasemanager import settings as rm_settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 25)
+
+REGISTRY = []
+
+_hooks = {}
+
+
+def get_hook():
+    """The RM_METRICS_HOOK callable (given as one or as a dotted path), or None."""
+    hook = rm_settings.RM_METRICS_HOOK
+    if hook is None or callable(hook):
+        return hook
+    if hook not in _hooks:
+        _hooks[hook] = import_string(hook)
+    return _hooks[hook]
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # label values -> state
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(label, "")) for label in self.labelnames)
+
+    def _emit(self, value, labels):
+        hook = get_hook()
+        if hook is not None:
+            hook(self.kind, self.name, value, labels)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, value=1, **labels):
+        if not rm_settings.RM_METRICS:
+            return
+
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+        self._emit(value, labels)
+
+    def get(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        """Yield (name, {label: value}, value) for the Prometheus exposition."""
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        if not rm_settings.RM_METRICS:
+            return
+
+        key = self._key(labels)
+        with self._lock:
+            # [count per bucket..., sum, count]
+            state = self._values.setdefault(key, [0] * len(self.buckets) + [0, 0])
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+        self._emit(value, labels)
+
+    def get(self, **labels):
+        """Return the (count, sum) of the observations with the given labels."""
+        state = self._values.get(self._key(labels))
+        return (state[-1], state[-2]) if state else (0, 0)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        yield
+        self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, list(state)) for key, state in self._values.items())
+        for key, state in values:
+            labels = dict(zip(self.labelnames, key))
+            for bound, count in zip(self.buckets, state):
+                yield f"{self.name}_bucket", dict(labels, le=str(bound)), count
+            yield f"{self.name}_bucket", dict(labels, le="+Inf"), state[-1]
+            yield f"{self.name}_sum", labels, state[-2]
+            yield f"{self.name}_count", labels, state[-1]
+
+
+resolution_seconds = Histogram(
+    "releasemanager_resolution_seconds",
+    "Time taken to resolve the latest release of a package (a batch's time is split between its packages)",
+    ["package"],
+)
+resolution_queries = Histogram(
+    "releasemanager_resolution_queries",
+    "Database queries run per resolution",
+    buckets=QUERY_BUCKETS,
+)
+cache_requests = Counter(
+    "releasemanager_cache_requests_total",
+    "Release cache lookups, by cache and result (local_hit, shared_hit or miss)",
+    ["cache", "result"],
+)
+template_render_seconds = Histogram(
+    "releasemanager_template_render_seconds",
+    "Time taken to render a release template tag",
+    ["tag"],
+)
+
+
+def reset():
+    """Clear every metric, e.g. between tests."""
+    for metric in REGISTRY:
+        metric.reset()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_prometheus():
+    """Return every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            if labels:
+                labels = ",".join(
+                    f'{label}="{_escape(label_value)}"'
+                    for label, label_value in labels.items()
+                )
+                name = f"{name}{{{labels}}}"
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class ResolutionTracker:
+    """Collects what track_resolution() needs to know about a resolution as it runs."""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.queries = 0
+        self.queryset = None  # a callable returning the resolution queryset, for the slow log's query plan
+
+    # a database execute wrapper, see connection.execute_wrapper()
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def counting(self):
+        """Count the queries run on this thread's connection."""
+        if not self.enabled:
+            yield
+            return
+        with connection.execute_wrapper(self):
+            yield
+
+
+def is_tracking():
+    return rm_settings.RM_METRICS or rm_settings.RM_SLOW_RESOLUTION_MS is not None
+
+
+def record_resolution(tracker, elapsed, packages):
+    """Observe a resolution, returning whether it was slow.
+
+    Packages resolved together share the work, so each is observed with its share of the batch's time, and that share
+    is what is compared with RM_SLOW_RESOLUTION_MS.
+    """
+    per_package = elapsed / max(len(packages), 1)
+    for package in packages:
+        resolution_seconds.observe(per_package, package=package)
+    resolution_queries.observe(tracker.queries)
+
+    threshold = rm_settings.RM_SLOW_RESOLUTION_MS
+    return threshold is not None and per_package * 1000 >= threshold
+
+
+@contextmanager
+def track_resolution(audience, site, packages):
+    """Time a resolution and count its queries, logging it (with its query plan) if it was slow."""
+    tracker = ResolutionTracker(is_tracking())
+    if not tracker.enabled:
+        yield tracker
+        return
+
+    start = time.perf_counter()
+    with tracker.counting():
+        yield tracker
+    elapsed = time.perf_counter() - start
+
+    if record_resolution(tracker, elapsed, packages):
+        log_slow_resolution(tracker, elapsed, audience, site, packages)
+
+
+@asynccontextmanager
+async def atrack_resolution(audience, site, packages):
+    """track_resolution() for async code.
+
+    Queries run in threads, not on the event loop's connection, so only those run within tracker.counting() in the
+    thread that runs them are counted.  A slow resolution's query plan is fetched from a thread too.
+    """
+    tracker = ResolutionTracker(is_tracking())
+    if not tracker.enabled:
+        yield tracker
+        return
+
+    start = time.perf_counter()
+    yield tracker
+    elapsed = time.perf_counter() - start
+
+    if record_resolution(tracker, elapsed, packages):
+        await sync_to_async(log_slow_resolution)(
+            tracker, elapsed, audience, site, packages
+        )
+
+
+def log_slow_resolution(tracker, elapsed, audience, site, packages):
+    plan = None
+    if tracker.queryset is not None:
+        try:
+            plan = tracker.queryset().explain()
+        # explain() isn't supported everywhere, and the log mustn't break resolution
+        except Exception as e:
+            plan = f"unavailable: {e}"
+
+    logger.warning(
+        "Slow release resolution: %.1fms (%.1fms per package), %d queries, packages %s, audience %s, site %s\n%s",
+        elapsed * 1000,
+        elapsed * 1000 / max(len(packages), 1),
+        tracker.queries,
+        ", ".join(packages),
+        audience.key,
+        getattr(site, "pk", site),
+        plan or "no query plan",
+    )
@@ -0,0 +1,39 @@
+import asyncio
+
+from .context_processors import get_request_releases
+
+try:
+    from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+except ImportError:  # asgiref < 3.6, as used by older Django versions
+    iscoroutinefunction = asyncio.iscoroutinefunction
+
+    def markcoroutinefunction(func):
+        func._is_coroutine = asyncio.coroutines._is_coroutine
+        return func
+
+
+class ReleaseMiddleware:
+    """Set request.releases, the latest release of every registered package for the user, resolved lazily (see
+    releasemanager.context_processors.RequestReleases).
+
+    Nothing is resolved on the way in, so the middleware runs as is in both sync and async middleware chains, without
+    switching threads.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        get_request_releases(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        get_request_releases(request)
+        return await self.get_response(request)
@@ -0,0 +1,81 @@
+# Generated by Django 4.1.13 on 2026-10-18 09:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("sites", "0002_alter_domain_unique"),
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("releasemanager", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReleaseResolution",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("package", models.CharField(max_length=100)),
+                (
+                    "audience",
+                    models.IntegerField(
+                        choices=[(1, "Public"), (10, "Tester"), (20, "Superuser")]
+                    ),
+                ),
+                (
+                    "expires_at",
+                    models.DateTimeField(
+                        blank=True,
+                        help_text="When a release or deprecation date is reached and the row has to be rebuilt",
+                        null=True,
+                    ),
+                ),
+                (
+                    "group",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="Tester group the releases are locked to.  Empty for releases open to every tester.",
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="auth.group",
+                    ),
+                ),
+                (
+                    "release",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="releasemanager.release",
+                    ),
+                ),
+                (
+                    "site",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="The site the releases are isolated to.  Empty for global releases.",
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="sites.site",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="releaseresolution",
+            index=models.Index(
+                fields=["package", "audience", "site"], name="rm_resolution_lookup"
+            ),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.1.13 on 2026-10-18 09:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("releasemanager", "0002_releaseresolution"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="release",
+            index=models.Index(
+                fields=["package", "active", "-release_date"],
+                name="rm_release_package_active",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="release",
+            index=models.Index(
+                condition=models.Q(("active", True), ("status", 30)),
+                fields=["package", "-release_date", "deprecation_date"],
+                name="rm_release_published",
+            ),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.1.13 on 2026-10-18 10:00
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def sync_relation_flags(apps, schema_editor):
+    Release = apps.get_model("releasemanager", "Release")
+
+    Release.objects.update(
+        is_global=~Exists(
+            Release.sites.through.objects.filter(release_id=OuterRef("pk"))
+        ),
+        is_group_restricted=Exists(
+            Release.groups.through.objects.filter(release_id=OuterRef("pk"))
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("releasemanager", "0003_release_resolution_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="release",
+            name="is_global",
+            field=models.BooleanField(
+                default=True,
+                editable=False,
+                help_text="The release is not isolated to any sites",
+            ),
+        ),
+        migrations.AddField(
+            model_name="release",
+            name="is_group_restricted",
+            field=models.BooleanField(
+                default=False,
+                editable=False,
+                help_text="The release is locked to user groups",
+            ),
+        ),
+        migrations.RunPython(sync_relation_flags, migrations.RunPython.noop),
+    ]
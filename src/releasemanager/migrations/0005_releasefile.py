@@ -0,0 +1,124 @@
+# Generated by Django 4.1.13 on 2026-10-18 10:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def files_to_rows(apps, schema_editor):
+    Release = apps.get_model("releasemanager", "Release")
+    ReleaseFile = apps.get_model("releasemanager", "ReleaseFile")
+
+    for release in Release.objects.exclude(files__isnull=True).iterator():
+        rows = {}  # the JSON could list a path more than once, keep the first
+        for file_group, entries in (release.files or {}).items():
+            for entry in entries if isinstance(entries, list) else [entries]:
+                if isinstance(entry, str):
+                    entry = {"path": entry}
+                if entry.get("path") and entry["path"] not in rows:
+                    rows[entry["path"]] = ReleaseFile(
+                        release=release,
+                        file_group=file_group,
+                        path=entry["path"],
+                        options=entry.get("options") or {},
+                        order=len(rows) + 1,
+                    )
+
+        ReleaseFile.objects.bulk_create(rows.values())
+
+
+def rows_to_files(apps, schema_editor):
+    Release = apps.get_model("releasemanager", "Release")
+    ReleaseFile = apps.get_model("releasemanager", "ReleaseFile")
+
+    manifests = {}
+    for release_file in ReleaseFile.objects.order_by(
+        "release", "order", "pk"
+    ).iterator():
+        manifest = manifests.setdefault(release_file.release_id, {})
+        manifest.setdefault(release_file.file_group, []).append(
+            {"path": release_file.path, "options": release_file.options}
+        )
+
+    for release_id, manifest in manifests.items():
+        Release.objects.filter(pk=release_id).update(files=manifest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("releasemanager", "0004_release_relation_flags"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReleaseFile",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "file_group",
+                    models.CharField(
+                        help_text="Group for categorization and use with template tags, e.g. css or js",
+                        max_length=50,
+                    ),
+                ),
+                ("path", models.CharField(max_length=512)),
+                (
+                    "options",
+                    models.JSONField(
+                        blank=True,
+                        default=dict,
+                        help_text="Extra attributes to render with the file",
+                    ),
+                ),
+                (
+                    "size",
+                    models.BigIntegerField(
+                        blank=True, help_text="Size in bytes", null=True
+                    ),
+                ),
+                (
+                    "hash",
+                    models.CharField(
+                        blank=True,
+                        help_text="Hex digest of the file's content",
+                        max_length=128,
+                    ),
+                ),
+                ("order", models.PositiveIntegerField(default=0)),
+                (
+                    "release",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="release_files",
+                        to="releasemanager.release",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["order", "pk"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="releasefile",
+            index=models.Index(
+                fields=["release", "file_group"], name="rm_releasefile_group"
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="releasefile",
+            unique_together={("release", "path")},
+        ),
+        migrations.RunPython(files_to_rows, rows_to_files),
+        migrations.RemoveField(
+            model_name="release",
+            name="files",
+        ),
+    ]
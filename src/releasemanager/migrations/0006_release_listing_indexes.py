@@ -0,0 +1,26 @@
+# Generated by Django 4.1.13 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("releasemanager", "0005_releasefile"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="release",
+            index=models.Index(
+                fields=["-release_date", "-id"], name="rm_release_listing"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="release",
+            index=models.Index(
+                fields=["package", "-release_date", "-id"],
+                name="rm_release_package_listing",
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.1.13 on 2026-10-18 10:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("releasemanager", "0006_release_listing_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="releasefile",
+            name="mtime",
+            field=models.FloatField(
+                blank=True,
+                help_text="Modification time of the file on disk when it was hashed",
+                null=True,
+            ),
+        ),
+    ]
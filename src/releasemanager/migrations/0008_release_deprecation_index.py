@@ -0,0 +1,21 @@
+# Generated by Django 4.1.13 on 2026-10-18 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("releasemanager", "0007_releasefile_mtime"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="release",
+            index=models.Index(
+                condition=models.Q(("status", 40), _negated=True),
+                fields=["deprecation_date"],
+                name="rm_release_deprecation",
+            ),
+        ),
+    ]
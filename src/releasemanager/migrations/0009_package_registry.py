@@ -0,0 +1,44 @@
+# Generated by Django 4.1.13 on 2026-10-18 10:23
+
+from django.db import migrations, models
+import releasemanager.packages
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("releasemanager", "0008_release_deprecation_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PackageDefinition",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=100, unique=True)),
+                ("name", models.CharField(max_length=100)),
+                ("description", models.TextField(blank=True)),
+                (
+                    "active",
+                    models.BooleanField(
+                        default=True, help_text="Can releases be made for this package?"
+                    ),
+                ),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="release",
+            name="package",
+            field=models.CharField(
+                max_length=100, validators=[releasemanager.packages.validate_package]
+            ),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.1.13 on 2026-10-18 10:30
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("releasemanager", "0009_package_registry"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="release",
+            name="rollout_percentage",
+            field=models.PositiveSmallIntegerField(
+                default=100,
+                help_text="Share of users the release is offered to, picked by a stable hash of their id",
+                validators=[django.core.validators.MaxValueValidator(100)],
+            ),
+        ),
+        migrations.AddField(
+            model_name="release",
+            name="rollout_salt",
+            field=models.CharField(
+                blank=True,
+                help_text=(
+                    "Releases with the same salt are rolled out to the same users.  "
+                    "Defaults to the package and name."
+                ),
+                max_length=50,
+            ),
+        ),
+    ]
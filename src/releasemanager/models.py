@@ -1,6 +1,10 @@
-from django.conf import settings
-from django.db import models
-from django.db.models import Q
+import threading
+from contextlib import nullcontext
+
+from asgiref.sync import sync_to_async
+from django.core.validators import MaxValueValidator
+from django.db import connections, models, router, transaction
+from django.db.models import Exists, OuterRef, Q, Subquery
 from django.utils import timezone
 
 # get User from the custom user model
@@ -9,8 +13,28 @@ from django.contrib.auth.models import Group
 from django.contrib.sites.models import Site
 from django.contrib.sites.shortcuts import get_current_site
 
+from releasemanager.audience import aget_audience, get_audience
+from releasemanager import settings as rm_settings
+from releasemanager.cache import (
+    MISSING,
+    acall,
+    bump_generation,
+    get_generation,
+    release_cache,
+)
+from releasemanager.delta import diff_manifests
+from releasemanager.metrics import atrack_resolution, track_resolution
+from releasemanager.packages import registry, validate_package
+from releasemanager.rollout import (
+    FULL_ROLLOUT,
+    pick_release,
+    rollout_candidates,
+)
+
 User = get_user_model()
 
+_append_lock = threading.Lock()  # see Release.add_files
+
 
 class Status(models.IntegerChoices):
     DEVELOPMENT = 1, "Development"
@@ -30,64 +54,375 @@ class ReleaseManager(models.Manager):
         - Filter out releases that are not for the user's group
         - Pickup both global releases and site-specific releases
         """
+        return self.get_accessible_releases_for_audience(
+            get_audience(user), site, package
+        )
 
-        # Instead of using user.has_perm("releasemanager.can_test_releases") a query to check if a release is
-        # exclusive, a query for a group can handle double duty.
+    async def aget_accessible_releases(self, user, site, package):
+        """get_accessible_releases() for async code.  Iterate the queryset it returns with ``async for``."""
+        return self.get_accessible_releases_for_audience(
+            await aget_audience(user), site, package
+        )
 
-        # If the user is a superuser, return all releases available on the site
-        if user.is_superuser:
-            return self.get_queryset().filter(
-                (Q(sites=site) | Q(sites__isnull=True)), package=package, active=True
-            )
+    def get_accessible_releases_for_audience(self, audience, site, package):
+        """Same as get_accessible_releases() but for an already resolved ReleaseAudience."""
+        return self._filter_accessible(audience, site).filter(package=package)
 
-        # Only get the user's groups that have the special permissions
-        user_groups = user.groups.filter(
-            permissions__codename__in=[
-                "can_test_releases",
-            ]
-        ).distinct()
+    def get_installed_releases_for_audience(self, audience, site, package):
+        """The releases of a package that the audience may be running: the accessible ones, whatever their release
+        and deprecation dates, e.g. to compute deltas from.
+        """
+        return self._filter_accessible(audience, site, dated=False).filter(
+            package=package
+        )
 
-        now = timezone.now()
+    def _filter_accessible(self, audience, site, dated=True):
+        """The accessibility filters shared by the single and batched lookups, across all packages.
+
+        Site and group restrictions are checked with EXISTS subqueries against the through tables, and skipped
+        entirely for the (common) global and unrestricted releases, so the rows never fan out and need no distinct().
+        Unless dated is False, releases that aren't out yet or are past their deprecation date are left out too.
+        """
+        on_site = self.on_site_filter(site)
+
+        # If the user is a superuser, return all releases available on the site
+        if audience.is_superuser:
+            return self.get_queryset().filter(on_site, active=True)
 
         releases = self.get_queryset().filter(
-            (Q(sites=site) | Q(sites__isnull=True))
-            & (
-                Q(deprecation_date__gt=now) | Q(deprecation_date__isnull=True)
-            ),  # ignore any releases past its deprecation date
-            package=package,  # get the package
-            active=True,  # get only active releases
-            release_date__lte=now,
-        )
+            on_site, active=True
+        )  # get only active releases
+
+        if dated:
+            now = timezone.now()
+            releases = releases.filter(
+                Q(deprecation_date__gt=now) | Q(deprecation_date__isnull=True),
+                release_date__lte=now,
+            )  # ignore any releases past its deprecation date
 
         # If the user is a member of any groups with testing permission, return the latest testing release.  Otherwise,
         # return the latest production release not locked to a group.
-        if user_groups.exists():
+        if audience.is_tester:
             releases = releases.filter(
-                Q(groups__in=user_groups) | Q(groups__isnull=True)
-            ).distinct()  # get the latest testing release
+                Q(is_group_restricted=False)
+                | Exists(
+                    Release.groups.through.objects.filter(
+                        release_id=OuterRef("pk"), group_id__in=audience.group_ids
+                    )
+                )
+            )  # get the latest testing release
         else:
             releases = releases.filter(
-                Q(groups__isnull=True), status=Status.RELEASED
-            ).distinct()  # get the latest production release not locked to a group
+                is_group_restricted=False, status=Status.RELEASED
+            )  # get the latest production release not locked to a group
 
         return releases
 
+    def on_site_filter(self, site):
+        """A filter for releases available on a site: global ones and those isolated to it."""
+        return Q(is_global=True) | Exists(
+            Release.sites.through.objects.filter(
+                release_id=OuterRef("pk"), site_id=getattr(site, "pk", site)
+            )
+        )
+
+    def sync_relation_flags(self, pks=None):
+        """Recompute is_global and is_group_restricted from the sites and groups of the given releases (or all)."""
+        releases = self.get_queryset()
+        if pks is not None:
+            releases = releases.filter(pk__in=pks)
+
+        return releases.update(
+            is_global=~Exists(
+                Release.sites.through.objects.filter(release_id=OuterRef("pk"))
+            ),
+            is_group_restricted=Exists(
+                Release.groups.through.objects.filter(release_id=OuterRef("pk"))
+            ),
+        )
+
+    def bulk_create_releases(self, entries, released_by=None):
+        """Create many releases with a few queries, e.g. when cutting releases for a whole product line.
+
+        Each entry is a dict of Release fields, plus optional "sites" and "groups" lists of ids.  Releases that
+        already exist (by package and name), or that a concurrent writer creates first, are left as they are.  Returns
+        the (created releases, skipped entries).
+        """
+        entries = {(entry["package"], entry["name"]): entry for entry in entries}
+        if not entries:
+            return [], []
+
+        packages = {package for package, name in entries}
+        names = {name for package, name in entries}
+
+        def find(keys):
+            return {
+                (release.package, release.name): release
+                for release in self.get_queryset().filter(
+                    package__in=packages, name__in=names
+                )
+                if (release.package, release.name) in keys
+            }
+
+        existing = set(find(entries))
+        releases = {}
+        for key, entry in entries.items():
+            if key in existing:
+                continue
+            fields = {
+                name: value
+                for name, value in entry.items()
+                if name not in ("sites", "groups")
+            }
+            fields.setdefault("released_by", released_by)
+            # bulk_create skips save() and the signals, so the relation flags are set up front
+            releases[key] = self.model(
+                is_global=not entry.get("sites"),
+                is_group_restricted=bool(entry.get("groups")),
+                **fields,
+            )
+
+        def written(release, key):
+            """Whether a release read back is the one this call inserted, not a concurrent writer's."""
+            ours = releases[key]
+            return all(
+                getattr(release, field.attname) == getattr(ours, field.attname)
+                for field in self.model._meta.concrete_fields
+                if not field.primary_key
+            )
+
+        with transaction.atomic():
+            # anything created since the first look isn't ours either
+            existing |= set(find(releases))
+            # conflicts on (package, name) can only come from a concurrent writer, whose release wins
+            self.bulk_create(
+                [release for key, release in releases.items() if key not in existing],
+                ignore_conflicts=True,
+            )
+
+            # ignore_conflicts doesn't set the primary keys, so read them back, keeping only the rows written here
+            found = find(set(releases) - existing)
+            created = {
+                key: found[key]
+                for key in entries
+                if key in found and written(found[key], key)
+            }
+            site_rows, group_rows = [], []
+            for key, release in created.items():
+                site_rows += [
+                    Release.sites.through(release_id=release.pk, site_id=site_id)
+                    for site_id in entries[key].get("sites") or []
+                ]
+                group_rows += [
+                    Release.groups.through(release_id=release.pk, group_id=group_id)
+                    for group_id in entries[key].get("groups") or []
+                ]
+            Release.sites.through.objects.bulk_create(site_rows, ignore_conflicts=True)
+            Release.groups.through.objects.bulk_create(
+                group_rows, ignore_conflicts=True
+            )
+
+        if created:
+            from releasemanager.signals import releases_changed
+
+            releases_changed({package for package, name in created})
+
+        skipped = [entry for key, entry in entries.items() if key not in created]
+        return list(created.values()), skipped
+
     def get_latest_release_for_package_site_and_user(self, user, site, package):
         """Given a user, site & package key, return the most current release the user has access to."""
+        return self.get_latest_release_for_audience(
+            get_audience(user), site, package, user.pk
+        )
+
+    def get_latest_release_for_audience(self, audience, site, package, user_id=None):
+        """Return the most current release for a ReleaseAudience, served from the resolution cache when possible.
+
+        Releases being rolled out to a percentage of users are only returned for the user_id they were rolled out to.
+        """
+        return self.get_latest_releases_for_audience(
+            audience, site, [package], user_id
+        )[package]
+
+    def get_latest_releases(self, user, site, packages):
+        """Given a user, site & list of package keys, return a {package: release} dict of the most current release
+        the user has access to for each package (None where there is none).
+
+        Cached packages are served from the resolution cache and the rest are resolved together in a single query.
+        """
+        return self.get_latest_releases_for_audience(
+            get_audience(user), site, packages, user.pk
+        )
+
+    def get_latest_releases_for_audience(self, audience, site, packages, user_id=None):
+        with track_resolution(audience, site, packages) as tracker:
+            candidates = self._resolve_candidates(audience, site, packages, tracker)
+        return self._pick(audience, candidates, user_id)
+
+    async def aget_latest_release_for_package_site_and_user(self, user, site, package):
+        """get_latest_release_for_package_site_and_user() for async code."""
+        return await self.aget_latest_release_for_audience(
+            await aget_audience(user), site, package, user.pk
+        )
+
+    async def aget_latest_release_for_audience(
+        self, audience, site, package, user_id=None
+    ):
+        latest = await self.aget_latest_releases_for_audience(
+            audience, site, [package], user_id
+        )
+        return latest[package]
+
+    async def aget_latest_releases(self, user, site, packages):
+        """get_latest_releases() for async code."""
+        return await self.aget_latest_releases_for_audience(
+            await aget_audience(user), site, packages, user.pk
+        )
+
+    async def aget_latest_releases_for_audience(
+        self, audience, site, packages, user_id=None
+    ):
+        """get_latest_releases_for_audience() for async code.
+
+        Packages cached in process are answered on the event loop.  The rest are resolved together, in one query, from
+        a thread (which is also how Django runs its own async queries).
+        """
+        async with atrack_resolution(audience, site, packages) as tracker:
+            keys, candidates, missing = await acall(
+                self._get_cached_candidates, audience, site, packages
+            )
+            if missing:
+
+                def resolve_missing():
+                    # the queries run on the thread's connection
+                    with tracker.counting():
+                        return self._resolve_missing(
+                            audience, site, keys, missing, tracker
+                        )
+
+                candidates.update(await sync_to_async(resolve_missing)())
+        return self._pick(audience, candidates, user_id)
+
+    def _pick(self, audience, candidates, user_id):
+        """Pick each package's release for the user from its candidates (see releasemanager.rollout)."""
+        return {
+            package: pick_release(releases, user_id, everyone=audience.is_superuser)
+            for package, releases in candidates.items()
+        }
+
+    def _resolve_candidates(self, audience, site, packages, tracker):
+        keys, candidates, missing = self._get_cached_candidates(
+            audience, site, packages
+        )
+        if missing:
+            candidates.update(
+                self._resolve_missing(audience, site, keys, missing, tracker)
+            )
+        return candidates
+
+    def _get_cached_candidates(self, audience, site, packages):
+        """Return the cache keys, the {package: cached candidates or MISSING} and the packages that weren't cached."""
+        site_id = getattr(site, "pk", site)
+        generation = get_generation()  # read once, not per package
+        keys = {
+            package: release_cache.make_key(
+                "candidates", site_id, package, audience.key, generation=generation
+            )
+            for package in packages
+        }
+
+        cached = release_cache.get_many(keys.values())
+        candidates = {
+            package: cached.get(key, MISSING) for package, key in keys.items()
+        }
+
+        missing = [
+            package for package, releases in candidates.items() if releases is MISSING
+        ]
+        return keys, candidates, missing
+
+    def _resolve_missing(self, audience, site, keys, missing, tracker):
+        found = None
+        if rm_settings.RM_RESOLUTION_TABLE:
+            found = ReleaseResolution.objects.resolve_candidates(
+                audience, site, missing
+            )
+            # None when a release/deprecation date has passed: the live query answers until rmscheduler (or
+            # rmrebuildresolution --stale) rebuilds the rows, so reads never write or queue up rebuilding them
+
+        if found is None:
+            found = self._get_release_candidates(audience, site, missing)
+            tracker.queryset = lambda: self._latest_releases(audience, site, missing)
+
+        candidates = {package: found.get(package, ()) for package in missing}
+        release_cache.set_many(
+            {keys[package]: releases for package, releases in candidates.items()}
+        )
+        return candidates
+
+    def _get_latest_releases(self, audience, site, packages, user_id=None):
+        return self._pick(
+            audience, self._get_release_candidates(audience, site, packages), user_id
+        )
+
+    def _get_release_candidates(self, audience, site, packages):
+        releases = {}
+        for release in self._latest_releases(audience, site, packages):
+            releases.setdefault(release.package, []).append(release)
+        return {
+            package: rollout_candidates(package_releases)
+            for package, package_releases in releases.items()
+        }
+
+    def _latest_releases(self, audience, site, packages):
+        """A queryset of the rollout candidates of each package: the accessible releases being rolled out that are
+        newer than the newest fully rolled out one, and that one.
+        """
         # Get the current time
         current_datetime = timezone.now()
 
-        return (
-            self.get_accessible_releases(user, site, package)
-            .filter(  # ingore any releases past its deprecation date
-                Q(deprecation_date__gte=current_datetime)
-                | Q(deprecation_date__isnull=True)
+        candidates = self._filter_accessible(audience, site).filter(
+            # ingore any releases past its deprecation date
+            Q(deprecation_date__gte=current_datetime)
+            | Q(deprecation_date__isnull=True),
+            package__in=packages,
+        )
+
+        # The newest candidate of each package, picked by a correlated subquery so every package is resolved in one
+        # round trip.  Superusers aren't subject to rollouts, so that is all they need.
+        if audience.is_superuser:
+            newest = candidates.filter(package=OuterRef("package")).values("pk")[:1]
+            return candidates.filter(pk=Subquery(newest))
+
+        full = candidates.filter(
+            package=OuterRef("package"), rollout_percentage__gte=FULL_ROLLOUT
+        )
+        return candidates.filter(
+            Q(pk=Subquery(full.values("pk")[:1]))
+            | Q(rollout_percentage__lt=FULL_ROLLOUT)
+            & (
+                Q(release_date__gt=Subquery(full.values("release_date")[:1]))
+                | ~Exists(full)
             )
-            .first()  # get the latest release
         )
 
 
-def default_release_paths():
+class PackageDefinition(models.Model):
+    """A package added at runtime, next to those defined in settings.RM_PACKAGES (only used with RM_PACKAGE_TABLE)."""
+
+    key = models.CharField(max_length=100, unique=True)
+    name = models.CharField(max_length=100)
+    description = models.TextField(blank=True)
+    active = models.BooleanField(
+        default=True, help_text="Can releases be made for this package?"
+    )
+
+    def __str__(self):
+        return self.name
+
+
+def default_release_paths():  # still referenced by the initial migration
     return dict()
 
 
@@ -117,10 +452,10 @@ class Release(models.Model):
     release_notes = models.TextField(
         blank=True, help_text="Detailed notes about what is new, changed, or fixed"
     )
-    package = models.CharField(  # defined in the settings so that it can be changed without changing the application
-        # and be immutable at runtime
+    package = models.CharField(  # a key of the package registry (see releasemanager.packages), checked by the
+        # validator rather than as choices so that adding a package doesn't need a migration
         max_length=100,
-        choices=[(key, pkg["name"]) for key, pkg in settings.RM_PACKAGES.items()],
+        validators=[validate_package],
     )
     groups = models.ManyToManyField(
         Group, blank=True, help_text="User groups that can access this release"
@@ -130,24 +465,144 @@ class Release(models.Model):
         blank=True,
         help_text="Sites where this release is isolated to.  If empty, it is available globally.",
     )
-    files = models.JSONField(
-        blank=True,
-        null=True,
-        help_text="Nested type information for this release",
-        default=default_release_paths,  # Assuming a callable that returns a default dictionary to use
-    )
     signature = models.CharField(
         max_length=256,
         blank=True,
         null=True,
         help_text="Digital signature for release integrity",
     )
+    # Denormalized from sites & groups (see ReleaseManager.sync_relation_flags) so the common global and unrestricted
+    # releases can be resolved without touching the through tables
+    is_global = models.BooleanField(
+        default=True,
+        editable=False,
+        help_text="The release is not isolated to any sites",
+    )
+    is_group_restricted = models.BooleanField(
+        default=False, editable=False, help_text="The release is locked to user groups"
+    )
+    rollout_percentage = models.PositiveSmallIntegerField(
+        default=FULL_ROLLOUT,
+        validators=[MaxValueValidator(FULL_ROLLOUT)],
+        help_text="Share of users the release is offered to, picked by a stable hash of their id",
+    )
+    rollout_salt = models.CharField(
+        max_length=50,
+        blank=True,
+        help_text="Releases with the same salt are rolled out to the same users.  Defaults to the package and name.",
+    )
 
     objects = ReleaseManager()
 
+    def get_rollout_salt(self):
+        return self.rollout_salt or f"{self.package}:{self.name}"
+
     def get_package_details(self):
-        """Retrieve the package details from settings based on the package identifier."""
-        return settings.RM_PACKAGES.get(self.package)
+        """Retrieve the package's Package descriptor from the registry, or None if it isn't registered."""
+        return registry.get(self.package)
+
+    @property
+    def files(self):
+        """The release's files as the {file_group: [{"path": ..., "options": {...}}, ...]} manifest that used to be
+        stored on the release itself.  Built from ReleaseFile once per loaded release.
+        """
+        if getattr(self, "_pending_files", None) is not None:
+            return self._pending_files
+
+        manifest = getattr(self, "_file_manifest", None)
+        if manifest is None:
+            manifest = {}
+            if self.pk is not None:
+                for release_file in self.release_files.all():
+                    manifest.setdefault(release_file.file_group, []).append(
+                        release_file.as_entry()
+                    )
+            self._file_manifest = manifest
+        return manifest
+
+    @files.setter
+    def files(self, manifest):
+        # kept for compatibility: the manifest replaces the release's files when it is saved
+        self._pending_files = manifest or {}
+
+    def diff_files(self, target):
+        """The {"added": [...], "removed": [...], "changed": [...]} files to go from this release to the target one
+        (see releasemanager.delta).
+        """
+        return diff_manifests(self.files, target.files)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+
+        pending = getattr(self, "_pending_files", None)
+        if pending is not None:
+            self._pending_files = None
+            self.release_files.all().delete()
+            self.add_files(pending)
+
+    def add_files(self, manifest):
+        """Register files from a {file_group: [path or {"path": ..., "options": {...}}, ...]} manifest.
+
+        New paths are appended with a single insert and paths the release already has get their group and options
+        updated, so nothing is duplicated.  Returns the number of files (created, updated).
+        """
+        entries = {}  # path -> ReleaseFile, the last entry for a path wins
+        for file_group, items in manifest.items():
+            for item in items if isinstance(items, list) else [items]:
+                release_file = ReleaseFile.from_entry(self, file_group, item)
+                entries[release_file.path] = release_file
+
+        if not entries:
+            return 0, 0
+
+        # Backends without SELECT ... FOR UPDATE (SQLite) only take one writer at a time and fail the others rather
+        # than wait, so appends from this process are serialized here instead.  The lock is process-local: appends
+        # from other worker processes can still fail with "database is locked" there.
+        using = self._state.db or router.db_for_write(Release)
+        if connections[using].features.has_select_for_update:
+            lock = nullcontext()
+        else:
+            lock = _append_lock
+
+        with lock, transaction.atomic(using=using):
+            # Lock the release row so concurrent appends to it queue up rather than racing for the same paths and
+            # order numbers.
+            list(
+                Release.objects.select_for_update()
+                .filter(pk=self.pk)
+                .values_list("pk", flat=True)
+            )
+
+            existing = {
+                release_file.path: release_file
+                for release_file in self.release_files.filter(path__in=list(entries))
+            }
+            next_order = (
+                self.release_files.aggregate(models.Max("order"))["order__max"] or 0
+            ) + 1
+
+            created, updated = [], []
+            for path, release_file in entries.items():
+                if path in existing:
+                    release_file.pk = existing[path].pk
+                    release_file.order = existing[path].order
+                    updated.append(release_file)
+                else:
+                    release_file.order = next_order
+                    next_order += 1
+                    created.append(release_file)
+
+            ReleaseFile.objects.bulk_create(created)
+            # a file whose entry changed has to be hashed again, see releasemanager.signing
+            ReleaseFile.objects.bulk_update(
+                updated, ReleaseFile.ENTRY_FIELDS + ["mtime"]
+            )
+
+        self._file_manifest = None
+        # cached instances and rendered tags include the files; only once the caller's transaction (if any) commits,
+        # or readers could cache the old files under the new generation
+        transaction.on_commit(bump_generation, using=using)
+        return len(created), len(updated)
 
     class Meta:
         # ordering = ["-name"]
@@ -155,13 +610,299 @@ class Release(models.Model):
             "-release_date"
         ]  # sort the releases by release date rather than name number since it's more reliable
         unique_together = (("package", "name"),)
+        indexes = [
+            # tester & superuser resolution: every active release of a package, newest first
+            models.Index(
+                fields=["package", "active", "-release_date"],
+                name="rm_release_package_active",
+            ),
+            # public resolution, the hot path: only active production releases are ever candidates
+            models.Index(
+                fields=["package", "-release_date", "deprecation_date"],
+                name="rm_release_published",
+                condition=Q(active=True, status=Status.RELEASED),
+            ),
+            # keyset pagination of the releases API, optionally by package
+            models.Index(fields=["-release_date", "-id"], name="rm_release_listing"),
+            models.Index(
+                fields=["package", "-release_date", "-id"],
+                name="rm_release_package_listing",
+            ),
+            # the scheduler's upcoming and due deprecations (rm_release_listing covers release dates)
+            models.Index(
+                fields=["deprecation_date"],
+                name="rm_release_deprecation",
+                condition=~Q(status=Status.DEPRECATED),
+            ),
+        ]
         permissions = [
             ("can_test_releases", "Can access testing releases"),
         ]
 
     def __str__(self):
         package_details = self.get_package_details()
-        return f"{package_details['name']} - {self.name}"
+        name = package_details.name if package_details else self.package
+        return f"{name} - {self.name}"
+
+
+class AudienceType(models.IntegerChoices):
+    PUBLIC = 1, "Public"
+    TESTER = 10, "Tester"
+    SUPERUSER = 20, "Superuser"
+
+
+class ReleaseResolutionManager(models.Manager):
+    def resolve(self, audience, site, packages, user_id=None):
+        """Look up the current release of each package for a ReleaseAudience (and user, for releases being rolled out)
+        in a single indexed query.
+
+        Returns a {package: release} dict, or None if any of the rows involved has passed a release or deprecation
+        date and needs to be rebuilt before it can be trusted.
+        """
+        candidates = self.resolve_candidates(audience, site, packages)
+        if candidates is None:
+            return None
+        return Release.objects._pick(audience, candidates, user_id)
+
+    def resolve_candidates(self, audience, site, packages):
+        """Like resolve(), but return the {package: rollout candidates} to pick each user's release from."""
+        site_id = getattr(site, "pk", site)
+
+        if audience.is_superuser:
+            audience_filter = Q(audience=AudienceType.SUPERUSER)
+        elif audience.is_tester:
+            audience_filter = Q(audience=AudienceType.TESTER) & (
+                Q(group__isnull=True) | Q(group__in=audience.group_ids)
+            )
+        else:
+            audience_filter = Q(audience=AudienceType.PUBLIC)
+
+        rows = self.get_queryset().filter(
+            audience_filter,
+            Q(site=site_id) | Q(site__isnull=True),
+            package__in=packages,
+        )
+
+        now = timezone.now()
+        releases = {package: {} for package in packages}
+
+        for row in rows.select_related("release"):
+            if row.expires_at is not None and row.expires_at <= now:
+                return None
+
+            if (
+                row.release is not None
+            ):  # the same release can come from a site and a global or group row
+                releases[row.package][row.release.pk] = row.release
+
+        return {
+            package: rollout_candidates(package_releases.values())
+            for package, package_releases in releases.items()
+        }
+
+    def rebuild(self, packages=None):
+        """Recompute the rows for the given package keys (or every package).  Returns the number of rows written."""
+        if packages is None:
+            packages = set(registry) | set(
+                Release.objects.values_list("package", flat=True).distinct()
+            )
+
+        return sum(self._rebuild_package(package) for package in packages)
+
+    def stale_packages(self):
+        """Packages with a row whose release or deprecation date has passed."""
+        return set(
+            self.get_queryset()
+            .filter(expires_at__lte=timezone.now())
+            .values_list("package", flat=True)
+            .distinct()
+        )
+
+    def _rebuild_package(self, package):
+        now = timezone.now()
+        rows = {}  # (audience, site_id, group_id) -> [visible releases, expires_at]
+
+        releases = Release.objects.filter(
+            package=package, active=True
+        ).prefetch_related("sites", "groups")
+
+        for release in releases:
+            site_ids = [site.pk for site in release.sites.all()] or [None]
+            group_ids = [group.pk for group in release.groups.all()]
+
+            # superusers see every active release that hasn't been deprecated, whatever the release date
+            keys = [(AudienceType.SUPERUSER, site_id, None) for site_id in site_ids]
+            if group_ids:
+                keys += [
+                    (AudienceType.TESTER, site_id, group_id)
+                    for site_id in site_ids
+                    for group_id in group_ids
+                ]
+            else:
+                keys += [(AudienceType.TESTER, site_id, None) for site_id in site_ids]
+                if release.status == Status.RELEASED:
+                    keys += [
+                        (AudienceType.PUBLIC, site_id, None) for site_id in site_ids
+                    ]
+
+            not_deprecated = (
+                release.deprecation_date is None or release.deprecation_date > now
+            )
+            released = release.release_date is not None and release.release_date <= now
+
+            # the next time this release can appear in, or drop out of, a row
+            boundaries = [
+                date
+                for date in (release.release_date, release.deprecation_date)
+                if date is not None and date > now
+            ]
+
+            for key in keys:
+                row = rows.setdefault(key, [[], None])
+
+                visible = not_deprecated and (
+                    key[0] == AudienceType.SUPERUSER or released
+                )
+                if visible:
+                    row[0].append(release)
+
+                for date in boundaries:
+                    if row[1] is None or date < row[1]:
+                        row[1] = date
+
+        # a row per rollout candidate (only the newest for superusers, who aren't subject to rollouts), or a row
+        # without a release if one will become visible later
+        resolutions = []
+        for (audience, site_id, group_id), (releases, expires_at) in rows.items():
+            candidates = rollout_candidates(releases)
+            if audience == AudienceType.SUPERUSER:
+                candidates = candidates[:1]
+            if not candidates and expires_at is None:
+                continue
+
+            resolutions += [
+                self.model(
+                    package=package,
+                    audience=audience,
+                    site_id=site_id,
+                    group_id=group_id,
+                    release=release,
+                    expires_at=expires_at,
+                )
+                for release in candidates or [None]
+            ]
+
+        with transaction.atomic():
+            self.get_queryset().filter(package=package).delete()
+            self.bulk_create(resolutions)
+
+        return len(resolutions)
+
+
+class ReleaseResolution(models.Model):
+    """Denormalized "current release" for every (package, site or global, audience) maintained as releases change.
+
+    A row with no release records that a release will become visible at expires_at.
+    """
+
+    package = models.CharField(max_length=100)
+    site = models.ForeignKey(
+        Site,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        help_text="The site the releases are isolated to.  Empty for global releases.",
+    )
+    audience = models.IntegerField(choices=AudienceType.choices)
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        help_text="Tester group the releases are locked to.  Empty for releases open to every tester.",
+    )
+    release = models.ForeignKey(
+        Release, on_delete=models.CASCADE, null=True, blank=True, related_name="+"
+    )
+    expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When a release or deprecation date is reached and the row has to be rebuilt",
+    )
+
+    objects = ReleaseResolutionManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["package", "audience", "site"], name="rm_resolution_lookup"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.package} ({self.get_audience_display()}) - {self.release}"
+
+
+class ReleaseFile(models.Model):
+    """A file that belongs to a release, e.g. a script or stylesheet of the built package."""
+
+    ENTRY_FIELDS = ["file_group", "options", "size", "hash"]
+
+    release = models.ForeignKey(
+        Release, on_delete=models.CASCADE, related_name="release_files"
+    )
+    file_group = models.CharField(
+        max_length=50,
+        help_text="Group for categorization and use with template tags, e.g. css or js",
+    )
+    path = models.CharField(max_length=512)
+    options = models.JSONField(
+        blank=True, default=dict, help_text="Extra attributes to render with the file"
+    )
+    size = models.BigIntegerField(blank=True, null=True, help_text="Size in bytes")
+    hash = models.CharField(
+        max_length=128, blank=True, help_text="Hex digest of the file's content"
+    )
+    mtime = models.FloatField(
+        blank=True,
+        null=True,
+        help_text="Modification time of the file on disk when it was hashed",
+    )
+    order = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["order", "pk"]
+        unique_together = (("release", "path"),)
+        indexes = [
+            models.Index(fields=["release", "file_group"], name="rm_releasefile_group"),
+        ]
+
+    def __str__(self):
+        return self.path
+
+    @classmethod
+    def from_entry(cls, release, file_group, entry):
+        """Build an (unsaved) file from a manifest entry, either a bare path or a dict."""
+        if isinstance(entry, str):
+            entry = {"path": entry}
+
+        return cls(
+            release=release,
+            file_group=file_group,
+            path=entry["path"],
+            options=entry.get("options") or {},
+            size=entry.get("size"),
+            hash=entry.get("hash") or "",
+        )
+
+    def as_entry(self):
+        """The file as an entry of the release's files manifest."""
+        entry = {"path": self.path, "options": self.options}
+        if self.size is not None:
+            entry["size"] = self.size
+        if self.hash:
+            entry["hash"] = self.hash
+        return entry
 
 
 """
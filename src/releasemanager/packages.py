@@ -0,0 +1,163 @@
+"""
+The registry of packages that releases can be made for.
+
+Packages are defined in settings.RM_PACKAGES and, when RM_PACKAGE_TABLE is on, can be added at runtime as
+PackageDefinition rows (the settings win for a key defined in both).  They are loaded once per process into immutable
+Package descriptors, so looking one up is a dict access.  Any change to the table bumps the "packages" generation
+(see releasemanager.cache).  A bump in this process is seen straight away; the shared generation, which picks up
+additions made by other processes, is checked at most every RM_PACKAGE_REFRESH seconds.
+"""
+
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+
+from releasemanager import settings as rm_settings
+from releasemanager.cache import (
+    PACKAGE_GENERATION,
+    bump_generation,
+    get_generation,
+    get_local_generation,
+)
+
+# django settings
+from django.conf import settings
+
+
+class Package(namedtuple("Package", ["key", "name", "description", "options"])):
+    __slots__ = ()
+
+    @classmethod
+    def from_settings(cls, key, details):
+        details = dict(details)
+        return cls(
+            key,
+            details.pop("name", key),
+            details.pop("description", ""),
+            MappingProxyType(details),  # anything else the package was defined with
+        )
+
+
+class PackageRegistry:
+    """The packages, loaded on first use and reloaded when the packages generation changes."""
+
+    def __init__(self):
+        self._packages = None
+        self._version = (
+            None  # the (local, shared) generations the packages were loaded at
+        )
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    @property
+    def packages(self):
+        """A read-only {key: Package} mapping of every package, in definition order."""
+        packages = self._packages
+        if packages is None or self._is_stale():
+            packages = self._check()
+        return packages
+
+    async def apackages(self):
+        """packages for async code: answered on the event loop while the loaded packages are fresh, otherwise they
+        are checked (which reaches the shared cache and, with RM_PACKAGE_TABLE, the database) from a thread.
+        """
+        packages = self._packages
+        if packages is None or self._is_stale():
+            packages = await sync_to_async(self._check)()
+        return packages
+
+    async def acontains(self, key):
+        """`key in registry` for async code."""
+        return key in await self.apackages()
+
+    def _is_stale(self):
+        """Whether the packages have to be checked again, answered without any I/O."""
+        return (
+            self._version[0] != get_local_generation(PACKAGE_GENERATION)
+            or time.monotonic() - self._checked_at >= rm_settings.RM_PACKAGE_REFRESH
+        )
+
+    def _check(self):
+        version = (
+            get_local_generation(PACKAGE_GENERATION),
+            get_generation(PACKAGE_GENERATION),
+        )
+        with self._lock:
+            if self._packages is None or version != self._version:
+                self._packages = self._load()
+                self._version = version
+            self._checked_at = time.monotonic()
+            return self._packages
+
+    def _load(self):
+        packages = {
+            key: Package.from_settings(key, details)
+            for key, details in getattr(settings, "RM_PACKAGES", {}).items()
+        }
+
+        if rm_settings.RM_PACKAGE_TABLE:
+            from releasemanager.models import PackageDefinition
+
+            for definition in PackageDefinition.objects.filter(active=True).order_by(
+                "key"
+            ):
+                packages.setdefault(
+                    definition.key,
+                    Package(
+                        definition.key,
+                        definition.name,
+                        definition.description,
+                        MappingProxyType({}),
+                    ),
+                )
+
+        return MappingProxyType(packages)
+
+    def refresh(self):
+        """Reload the packages in this process on next use."""
+        with self._lock:
+            self._packages = None
+
+    def invalidate(self):
+        """Reload the packages in every process, e.g. after PackageDefinition rows were written without signals."""
+        bump_generation(PACKAGE_GENERATION)
+
+    def get(self, key, default=None):
+        return self.packages.get(key, default)
+
+    def __getitem__(self, key):
+        return self.packages[key]
+
+    def __contains__(self, key):
+        return key in self.packages
+
+    def __iter__(self):
+        return iter(self.packages)
+
+    def __len__(self):
+        return len(self.packages)
+
+    def keys(self):
+        return self.packages.keys()
+
+    def values(self):
+        return self.packages.values()
+
+    def choices(self):
+        """(key, name) pairs for form fields."""
+        return [(package.key, package.name) for package in self.values()]
+
+
+registry = PackageRegistry()
+
+
+def validate_package(value):
+    """Model field validator: the value has to be a registered package."""
+    if value not in registry:
+        raise ValidationError(
+            f'"{value}" is not a registered package.', code="invalid_package"
+        )
@@ -0,0 +1,62 @@
+"""
+Percentage rollouts.
+
+A release with a rollout_percentage below 100 is only offered to that share of users.  A user's bucket (0 to 99) is
+a stable hash of the release's rollout salt and their id, so no rows or queries are needed.  Users stay in a rollout
+as it is ramped up, and releases that share a salt go to the same users.  Anonymous users only get fully rolled out
+releases, and superusers are not subject to rollouts at all.
+
+Resolution caches a short candidate list per audience: the releases being rolled out that are newer than the newest
+fully rolled out one, then that one, newest first.  Each user's release is picked from it in memory.
+"""
+
+import hashlib
+
+FULL_ROLLOUT = 100
+
+
+def rollout_bucket(salt, user_id):
+    """The user's bucket, from 0 to 99, for a rollout salt."""
+    digest = hashlib.sha256(f"{salt}:{user_id}".encode()).digest()
+    return int.from_bytes(digest[:8], "big") % FULL_ROLLOUT
+
+
+def is_rolled_out(release, user_id):
+    """Whether a release is offered to a user (None for an anonymous user)."""
+    if release.rollout_percentage >= FULL_ROLLOUT:
+        return True
+    if user_id is None:
+        return False
+    return (
+        rollout_bucket(release.get_rollout_salt(), user_id) < release.rollout_percentage
+    )
+
+
+def newest_first(releases):
+    """Sort releases the way Release.Meta.ordering does, with undated releases last."""
+    return sorted(
+        releases,
+        key=lambda release: (
+            release.release_date is None,
+            -release.release_date.timestamp() if release.release_date else 0,
+            -(release.pk or 0),
+        ),
+    )
+
+
+def rollout_candidates(releases):
+    """The releases a user of the audience could be offered, newest first, up to the newest fully rolled out one."""
+    candidates = []
+    for release in newest_first(releases):
+        candidates.append(release)
+        if release.rollout_percentage >= FULL_ROLLOUT:
+            break
+    return tuple(candidates)
+
+
+def pick_release(candidates, user_id, everyone=False):
+    """The newest candidate offered to the user, or every user with everyone (for superusers)."""
+    for release in candidates:
+        if everyone or is_rolled_out(release, user_id):
+            return release
+    return None
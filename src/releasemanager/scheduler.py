@@ -0,0 +1,79 @@
+"""
+Date driven release transitions.
+
+Which releases are visible depends on their release and deprecation dates, so it changes as time passes without any
+write that could invalidate a cache.  run_scheduler() brings everything up to date when those dates come due: it
+marks releases past their deprecation date as DEPRECATED, refreshes the packages whose dates were crossed and
+publishes when the next transition is due (see releasemanager.cache.set_next_transition), so that caches expire
+exactly then.  The rmscheduler command runs it once or in a loop.
+"""
+
+from collections import namedtuple
+from datetime import datetime, timezone as dt_timezone
+
+from django.db.models import Q
+from django.utils import timezone
+
+from releasemanager.cache import get_transition_state, set_next_transition
+from releasemanager.models import Release, Status
+from releasemanager.signals import releases_changed
+
+SchedulerRun = namedtuple("SchedulerRun", ["deprecated", "packages", "next_transition"])
+
+
+def next_transition(now=None):
+    """Return when the visible releases next change: the next release date of an active release or deprecation
+    date of a release not yet deprecated, whichever comes first (None if nothing is scheduled).
+    """
+    now = now or timezone.now()
+
+    dates = [
+        Release.objects.filter(active=True, release_date__gt=now)
+        .order_by("release_date")
+        .values_list("release_date", flat=True)
+        .first(),
+        Release.objects.filter(deprecation_date__gt=now)
+        .exclude(status=Status.DEPRECATED)
+        .order_by("deprecation_date")
+        .values_list("deprecation_date", flat=True)
+        .first(),
+    ]
+    dates = [date for date in dates if date is not None]
+    return min(dates) if dates else None
+
+
+def run_scheduler(now=None):
+    """Apply the transitions that have come due and publish the next one."""
+    now = now or timezone.now()
+
+    # releases past their deprecation date, deprecated in bulk
+    due = Release.objects.filter(deprecation_date__lte=now).exclude(
+        status=Status.DEPRECATED
+    )
+    deprecated = dict(due.values_list("pk", "package"))
+    if deprecated:
+        Release.objects.filter(pk__in=list(deprecated)).update(status=Status.DEPRECATED)
+
+    # packages with a release or deprecation date passed since the last run, or every package on the first run
+    # since nothing says what might have been cached before
+    state = get_transition_state()
+    if state is None:
+        packages = None
+    else:
+        since = datetime.fromtimestamp(state[0], dt_timezone.utc)
+        packages = set(deprecated.values()) | set(
+            Release.objects.filter(
+                Q(release_date__gt=since, release_date__lte=now)
+                | Q(deprecation_date__gt=since, deprecation_date__lte=now)
+            )
+            .values_list("package", flat=True)
+            .distinct()
+        )
+
+    if packages is None or packages:
+        releases_changed(packages)
+
+    upcoming = next_transition(now)
+    set_next_transition(upcoming.timestamp() if upcoming else None, now.timestamp())
+
+    return SchedulerRun(len(deprecated), packages, upcoming)
@@ -5,3 +5,40 @@ from django.conf import settings
 #     return getattr(settings, name, default)
 
 RM_URL = getattr(settings, 'RM_URL', settings.STATIC_URL)
+
+# Packages (see releasemanager.packages), defined in RM_PACKAGES
+RM_PACKAGE_TABLE = getattr(settings, 'RM_PACKAGE_TABLE', False)  # also load packages added as PackageDefinition rows
+RM_PACKAGE_REFRESH = getattr(settings, 'RM_PACKAGE_REFRESH', 5)  # seconds between checks for packages added elsewhere
+
+# Release resolution caching
+RM_CACHE_SIZE = getattr(settings, 'RM_CACHE_SIZE', 1024)  # entries kept in the in-process LRU, 0 disables it
+RM_CACHE_BACKEND = getattr(settings, 'RM_CACHE_BACKEND', None)  # alias from CACHES for a tier shared by every node
+RM_CACHE_TIMEOUT = getattr(settings, 'RM_CACHE_TIMEOUT', 60)  # seconds, since visibility also depends on the clock
+RM_CACHE_PREFIX = getattr(settings, 'RM_CACHE_PREFIX', 'releasemanager')
+
+# Read resolutions from the materialized ReleaseResolution table (run rmrebuildresolution after turning it on)
+# Rows past a release or deprecation date fall back to the live query until rmscheduler rebuilds them
+RM_RESOLUTION_TABLE = getattr(settings, 'RM_RESOLUTION_TABLE', False)
+
+# Releases API
+RM_API_PAGE_SIZE = getattr(settings, 'RM_API_PAGE_SIZE', 50)
+RM_API_MAX_PAGE_SIZE = getattr(settings, 'RM_API_MAX_PAGE_SIZE', 500)
+RM_LATEST_MAX_AGE = getattr(settings, 'RM_LATEST_MAX_AGE', 60)  # seconds clients may reuse a "latest release" answer
+RM_ASYNC_API = getattr(settings, 'RM_ASYNC_API', False)  # serve the list and latest release endpoints with async views
+
+# Static manifest export (rmexport, see releasemanager.export)
+# dotted path of a storage class, None for the default storage
+RM_EXPORT_STORAGE = getattr(settings, 'RM_EXPORT_STORAGE', None)
+RM_EXPORT_STORAGE_OPTIONS = getattr(settings, 'RM_EXPORT_STORAGE_OPTIONS', {})  # keyword arguments for the class
+RM_EXPORT_PREFIX = getattr(settings, 'RM_EXPORT_PREFIX', 'releases')  # directory of the export in the storage
+
+# Signing release files (rmsign / rmverify)
+# where the files under RM_URL are on disk
+RM_FILE_ROOT = getattr(settings, 'RM_FILE_ROOT', getattr(settings, 'STATIC_ROOT', None))
+RM_SIGNING_KEY = getattr(settings, 'RM_SIGNING_KEY', None)  # None to derive the key from SECRET_KEY
+
+# Metrics (see releasemanager.metrics)
+RM_METRICS = getattr(settings, 'RM_METRICS', True)
+RM_METRICS_HOOK = getattr(settings, 'RM_METRICS_HOOK', None)  # a callable, or its dotted path
+RM_METRICS_ENDPOINT = getattr(settings, 'RM_METRICS_ENDPOINT', False)  # serve the Prometheus text format
+RM_SLOW_RESOLUTION_MS = getattr(settings, 'RM_SLOW_RESOLUTION_MS', None)  # log resolutions slower than this
@@ -0,0 +1,125 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.contrib.sites.models import Site
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from releasemanager import settings as rm_settings
+from releasemanager.audience import forget_audiences
+from releasemanager.cache import PACKAGE_GENERATION, bump_generation
+from releasemanager.models import PackageDefinition, Release, ReleaseResolution
+
+
+def releases_changed(packages=None):
+    """Bring everything derived from releases up to date after the given packages (or all of them) changed.
+
+    Anything that writes releases without sending the model signals (bulk_create, update(), ...) should call this.
+    Runs once the writer's transaction commits (straight away outside of one): before that, a reader could cache the
+    old releases under the new generation and keep serving them until the next change.
+    """
+
+    def refresh():
+        if rm_settings.RM_RESOLUTION_TABLE:
+            ReleaseResolution.objects.rebuild(packages)
+
+        # after the rebuild, so that nothing can re-cache the old resolution under the new generation
+        bump_generation()
+
+    transaction.on_commit(refresh)
+
+
+@receiver(post_save, sender=Release)
+def release_saved(sender, instance, **kwargs):
+    # a save writes back whatever flags the instance had in memory, which may predate a change to its sites or groups
+    Release.objects.sync_relation_flags([instance.pk])
+    releases_changed([instance.package])
+
+
+@receiver(post_delete, sender=Release)
+def release_deleted(sender, instance, **kwargs):
+    releases_changed([instance.package])
+
+
+@receiver(m2m_changed, sender=Release.groups.through)
+@receiver(m2m_changed, sender=Release.sites.through)
+def release_relations_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if not reverse:
+        Release.objects.sync_relation_flags([instance.pk])
+        releases_changed([instance.package])
+    elif pk_set:  # e.g. group.release_set.add(...)
+        Release.objects.sync_relation_flags(pk_set)
+        releases_changed(
+            set(Release.objects.filter(pk__in=pk_set).values_list("package", flat=True))
+        )
+    else:  # a reverse clear() doesn't say which releases it touched
+        Release.objects.sync_relation_flags()
+        releases_changed()
+
+
+# Deleting a group or site cascades to the through tables without m2m_changed, so its releases are looked up before
+# and their flags synced after, e.g. a release left with no sites is global again.
+
+
+@receiver(pre_delete, sender=Group)
+@receiver(pre_delete, sender=Site)
+def relation_deleting(sender, instance, **kwargs):
+    instance._release_pks = list(instance.release_set.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Site)
+def relation_deleted(sender, instance, **kwargs):
+    pks = getattr(instance, "_release_pks", None)
+    if pks:
+        Release.objects.sync_relation_flags(pks)
+        releases_changed(
+            set(Release.objects.filter(pk__in=pks).values_list("package", flat=True))
+        )
+
+
+# Audience invalidation
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    forget_audiences([instance.pk])
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if not reverse:
+        forget_audiences([instance.pk])
+    elif pk_set:  # e.g. group.user_set.add(...)
+        forget_audiences(pk_set)
+    else:  # a reverse clear() doesn't say which users it touched
+        forget_audiences()
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_permissions_changed(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        forget_audiences()
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, **kwargs):
+    forget_audiences()
+
+
+# Package invalidation
+
+
+@receiver(post_save, sender=PackageDefinition)
+@receiver(post_delete, sender=PackageDefinition)
+def package_changed(sender, instance, **kwargs):
+    bump_generation(PACKAGE_GENERATION)
@@ -0,0 +1,173 @@
+"""
+Hashing and signing of release files.
+
+Every file of a release that is on local disk is hashed (sha256), and its digest, size and modification time are
+stored on its ReleaseFile.  The release's signature is an HMAC, keyed with RM_SIGNING_KEY, over the sorted
+(path, digest) pairs of its files, so changing, adding, removing or renaming a file changes it.  The key is salted for
+this purpose only (see salted_hmac), so the published signatures say nothing about SECRET_KEY's use elsewhere.  It is
+a shared secret: only holders of the key can verify a signature, not the clients it is published to.
+
+Files are read in large chunks across a thread pool.  hashlib releases the GIL while it digests each chunk, so
+several large files hash in parallel.  Verification is incremental: a file whose size and modification time still
+match what was stored keeps its stored digest without being read again.
+"""
+
+import hashlib
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.utils.crypto import salted_hmac
+
+from releasemanager import settings as rm_settings
+from releasemanager.cache import bump_generation
+from releasemanager.models import ReleaseFile
+
+CHUNK_SIZE = 1024 * 1024
+SIGNING_SALT = "releasemanager.signing.release"
+
+
+class FileDigest(
+    namedtuple(
+        "FileDigest",
+        ["release_file", "location", "hash", "size", "mtime", "read", "error"],
+    )
+):
+    __slots__ = ()
+
+    @property
+    def changed(self):
+        """Whether the file on disk no longer matches what is stored for it."""
+        release_file = self.release_file
+        return (self.hash, self.size, self.mtime) != (
+            release_file.hash,
+            release_file.size,
+            release_file.mtime,
+        )
+
+
+def get_file_location(path, root=None):
+    """Return where a release file is on disk, or None for files served from elsewhere.
+
+    Paths are resolved the way the template tags render them: relative paths and absolute ones under RM_URL are
+    looked up under the root (RM_FILE_ROOT by default).
+    """
+    root = root or rm_settings.RM_FILE_ROOT
+    if not root or path.startswith(("http://", "https://", "//")):
+        return None
+
+    url = rm_settings.RM_URL
+    if path.startswith("/") and url.startswith("/"):
+        if not path.startswith(url):
+            return None
+        prefix = len(url)
+        path = path[prefix:]
+
+    root = os.path.abspath(root)
+    location = os.path.normpath(os.path.join(root, path.lstrip("/")))
+    if os.path.commonpath([root, location]) != root:  # e.g. "../../etc/passwd"
+        return None
+    return location
+
+
+def hash_file(location, chunk_size=CHUNK_SIZE):
+    """Return the (sha256 hex digest, size, mtime) of a file, read in chunks into a reused buffer."""
+    digest = hashlib.sha256()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+
+    with open(location, "rb", buffering=0) as stream:
+        stat = os.fstat(stream.fileno())
+        while True:
+            read = stream.readinto(buffer)
+            if not read:
+                break
+            digest.update(view[:read])
+
+    return digest.hexdigest(), stat.st_size, stat.st_mtime
+
+
+def digest_files(release_files, root=None, workers=None, incremental=True):
+    """Hash release files across a thread pool and return a FileDigest for each, in order.
+
+    With incremental, files whose size and mtime match what is stored keep their stored digest without being read.
+    Files that are not on local disk keep whatever digest they were registered with.
+    """
+
+    def digest(release_file):
+        location = get_file_location(release_file.path, root)
+        if location is None:
+            return FileDigest(
+                release_file,
+                None,
+                release_file.hash,
+                release_file.size,
+                release_file.mtime,
+                False,
+                None,
+            )
+
+        try:
+            if incremental and release_file.hash and release_file.mtime is not None:
+                stat = os.stat(location)
+                if (stat.st_size, stat.st_mtime) == (
+                    release_file.size,
+                    release_file.mtime,
+                ):
+                    return FileDigest(
+                        release_file,
+                        location,
+                        release_file.hash,
+                        release_file.size,
+                        release_file.mtime,
+                        False,
+                        None,
+                    )
+
+            file_hash, size, mtime = hash_file(location)
+        except OSError as e:
+            return FileDigest(release_file, location, None, None, None, False, str(e))
+
+        return FileDigest(release_file, location, file_hash, size, mtime, True, None)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(digest, release_files))
+
+
+def compute_signature(digests):
+    """Sign (path, hex digest) pairs with RM_SIGNING_KEY; the order they are given in doesn't matter."""
+    message = "\n".join(f"{path}:{digest}" for path, digest in sorted(digests))
+    return salted_hmac(
+        SIGNING_SALT,
+        message,
+        secret=rm_settings.RM_SIGNING_KEY,  # SECRET_KEY when None
+        algorithm="sha256",
+    ).hexdigest()
+
+
+def release_signature(file_digests):
+    """The signature of a release from the FileDigests of its files, skipping files without a digest."""
+    return compute_signature(
+        (digest.release_file.path, digest.hash)
+        for digest in file_digests
+        if digest.hash
+    )
+
+
+def store_digests(file_digests):
+    """Save the digest, size and mtime of the files that changed on disk.  Returns how many were saved."""
+    changed = []
+    for digest in file_digests:
+        if digest.hash and digest.changed:
+            release_file = digest.release_file
+            release_file.hash, release_file.size, release_file.mtime = (
+                digest.hash,
+                digest.size,
+                digest.mtime,
+            )
+            changed.append(release_file)
+
+    if changed:
+        ReleaseFile.objects.bulk_update(changed, ["hash", "size", "mtime"])
+        bump_generation()  # the files manifest includes the digests and sizes
+    return len(changed)
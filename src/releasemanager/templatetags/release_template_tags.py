@@ -1,26 +1,86 @@
 from django import template
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from releasemanager.cache import ResolutionCache
+from releasemanager.metrics import template_render_seconds
 from releasemanager.settings import RM_URL
 
 register = template.Library()
 
-@register.inclusion_tag("releasemanager/release_template.html")
-def release_package(package, file_group):
+# Rendered tags, keyed by the release generation so they're dropped whenever a release changes
+fragment_cache = ResolutionCache("fragment")
+
+
+def get_file_index(release):
     """
-    Given a package object, extract the various file types.
+    Return the release's files as a {file_group: [file, ...]} index, ready for the template.
+
+    It's built once per loaded release and kept on the instance, so a page rendering several groups only walks the
+    manifest once.  The release's own files are never modified.
     """
+    index = getattr(release, "_file_index", None)
+
+    if index is None:
+        index = {
+            file_group: [_prepare_file(entry) for entry in entries]
+            for file_group, entries in (release.files or {}).items()
+        }
+        release._file_index = index
+
+    return index
+
+
+def _prepare_file(entry):
+    if isinstance(entry, str):  # a bare path, as the files API accepts
+        entry = {"path": entry}
+
+    path = entry["path"]
 
-    files = []
+    # if the file does not start with "http" or "/", assume it needs to have the RM_URL prepended
+    if not path.startswith("http") and not path.startswith("/"):
+        path = f"{RM_URL}{path}"
 
-    for file in package.files:
-        if file["file_group"] == file_group:
+    return {
+        "path": path,
+        "options": entry.get("options") or {},
+        "file_ext": path.split("?")[0].split(".")[-1],
+    }
 
-            # if the file does not start with "http" or "/", assume it needs to have the STATIC_URL prepended
-            if not file["file_path"].startswith("http") and not file["file_path"].startswith("/"):
-                    file["file_path"] = f"{RM_URL}{file['file_path']}"
 
-            files.append(file)
+def render_release_files(release, file_groups):
+    if release is None:  # nothing has been released for the package yet
+        return ""
 
-    for file in files:
-        file["file_ext"] = file["file_name"].split(".")[-1]
+    def render():
+        index = get_file_index(release)
+        files = [
+            file for file_group in file_groups for file in index.get(file_group, [])
+        ]
+        return render_to_string(
+            "releasemanager/release_template.html", {"files": files}
+        )
 
-    return {"files": files}
+    if release.pk is None:
+        return mark_safe(render())
+
+    key = fragment_cache.make_key(release.pk, RM_URL, *file_groups)
+    return mark_safe(fragment_cache.get_or_set(key, render))
+
+
+@register.simple_tag
+def release_package(package, file_group):
+    """
+    Given a package object, extract the various file types.
+    """
+    with template_render_seconds.time(tag="release_package"):
+        return render_release_files(package, [file_group])
+
+
+@register.simple_tag
+def release_assets(release, *file_groups):
+    """
+    Render the files of several groups in one pass, e.g. {% release_assets release "css" "js" %}
+    """
+    with template_render_seconds.time(tag="release_assets"):
+        return render_release_files(release, file_groups)
@@ -1,24 +1,101 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import math
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# from django.urls import reverse
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import close_old_connections, connection
+from django.db.models import F, Q
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import (
+    AsyncRequestFactory,
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date, parse_http_date
+from django.views.generic import TemplateView
+
+from django.urls import reverse
 from django.contrib.auth import get_user_model
 
-from django.contrib.auth.models import Group
+from django.contrib.auth.models import AnonymousUser, Group
 
-# from django.conf import settings
+from django.conf import settings
 
 from django.contrib.sites.models import Site
 
-from .models import Release, Status
-
-# from django.utils import timezone
+from . import cache as cache_module
+from . import conditional
+from . import metrics
+from .cache import (
+    LRUCache,
+    MISSING,
+    PACKAGE_GENERATION,
+    get_generation,
+    get_next_transition,
+    get_timeout,
+    invalidate_all,
+    release_cache,
+    set_next_transition,
+)
+from . import settings as rm_settings
+from .audience import (
+    PUBLIC_AUDIENCE,
+    SUPERUSER_AUDIENCE,
+    ReleaseAudience,
+    get_audience,
+)
+from .context_processors import RequestReleases, releases as releases_processor
+from .export import export_manifests
+from .middleware import ReleaseMiddleware
+from .models import (
+    PackageDefinition,
+    Release,
+    ReleaseFile,
+    ReleaseResolution,
+    Status,
+)
+from .packages import registry
+from .rollout import rollout_bucket
+from .scheduler import run_scheduler
+from .settings import RM_URL
+from .signing import compute_signature, get_file_location
+from .views import ReleaseManagerMixin
+from .api.views import (
+    AsyncLatestReleaseView,
+    AsyncReleaseListView,
+    LatestReleaseView,
+    ReleaseListView,
+)
 
 # from rest_framework.test import APIClient
 from rest_framework import status
+from rest_framework.permissions import BasePermission, IsAuthenticated
+from rest_framework.throttling import BaseThrottle
 from rest_framework.test import APITestCase
 
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 """
 # Data Dump
@@ -26,10 +103,30 @@ User = get_user_model()
 """
 
 
-class ReleaseGroupTestCase(TestCase):
+class ColdCacheMixin:
+    """Writes rolled back at the end of a test don't send signals, so start every test with cold release caches."""
+
+    def setUp(self):
+        super().setUp()
+        invalidate_all()
+
+
+class SharedCacheMixin:
+    """Use the default cache as the shared RM_CACHE_BACKEND, e.g. for conditional responses."""
+
+    def setUp(self):
+        patcher = mock.patch.object(rm_settings, "RM_CACHE_BACKEND", "default")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        caches["default"].clear()
+        super().setUp()
+
+
+class ReleaseGroupTestCase(ColdCacheMixin, TestCase):
     fixtures = ["sample_user.json", "release_data.json"]
 
     def setUp(self):  # Set up data for the whole TestCase
+        super().setUp()
         self.package_key = "basic"  # the name of the test package
         self.site = Site.objects.get_current()
 
@@ -98,59 +195,2210 @@ class ReleaseGroupTestCase(TestCase):
         self.assertEqual(accessible_release, release)
 
 
-class ReleaseAPITests(APITestCase):
+class ReleaseCacheTestCase(ColdCacheMixin, TestCase):
     fixtures = ["sample_user.json", "release_data.json"]
 
-    def setUp(self):  # Set up data for the whole TestCase
-        self.package_key = "basic"  # the name of the test package
-        self.site = Site.objects.get_current()
-
-        # an average user for testing permissions
+    def setUp(self):
+        super().setUp()
+        self.package_key = "basic"
+        self.site = Site.objects.get(pk=1)
         self.sampleuser = User.objects.get(username="sampleuser")
 
-        # a developer user for testing permissions
-        self.devuser = User.objects.get(username="devuser")
+    def test_repeat_resolution_is_cached(self):
+        """The second resolution doesn't need the database at all."""
+        release = Release.objects.get_latest_release_for_package_site_and_user(
+            self.sampleuser, self.site, self.package_key
+        )
 
-        # a release user for testing API permissions
-        self.releaseuser = User.objects.get(username="releaseuser")
+        with self.assertNumQueries(0):
+            cached = Release.objects.get_latest_release_for_package_site_and_user(
+                self.sampleuser, self.site, self.package_key
+            )
+        self.assertEqual(cached, release)
 
-        # On site ID 1, the current release is v0.1.1
-        self.current_release = Release.objects.get(pk=3)
+    def test_release_save_invalidates(self):
+        generation = get_generation()
+        Release.objects.get_latest_release_for_package_site_and_user(
+            self.sampleuser, self.site, self.package_key
+        )
 
-        # On site ID 1, the most current test release is v3.0.0
-        self.beta_release = Release.objects.get(pk=2)
+        release = Release.objects.get(pk=3)  # v0.1.1
+        release.active = False
+        with self.captureOnCommitCallbacks() as callbacks:
+            release.save()
 
-        # add the devuser to the test_group
+        # nothing is invalidated before the change is committed, or readers could cache the old releases again
+        self.assertEqual(get_generation(), generation)
+        for callback in callbacks:
+            callback()
+
+        self.assertGreater(get_generation(), generation)
+        self.assertEqual(
+            Release.objects.get_latest_release_for_package_site_and_user(
+                self.sampleuser, self.site, self.package_key
+            ),
+            Release.objects.get(pk=1),  # v0.1.0
+        )
+
+    def test_release_sites_change_invalidates(self):
+        Release.objects.get_latest_release_for_package_site_and_user(
+            self.sampleuser, self.site, self.package_key
+        )
+
+        release = Release.objects.get(pk=5)  # v0.1.2, only on site 2
+        with self.captureOnCommitCallbacks(execute=True):
+            release.sites.clear()  # now global
+
+        self.assertEqual(
+            Release.objects.get_latest_release_for_package_site_and_user(
+                self.sampleuser, self.site, self.package_key
+            ),
+            release,
+        )
+
+    def test_group_and_site_deletion_syncs_flags(self):
+        release = Release.objects.get(pk=4)  # v2.0, for group 1 on site 2
+        devuser = User.objects.get(username="devuser")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Group.objects.get(pk=1).delete()
+        release.refresh_from_db()
+        self.assertFalse(release.is_group_restricted)
+        self.assertFalse(release.is_global)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Site.objects.get(pk=2).delete()
+        release.refresh_from_db()
+        self.assertTrue(release.is_global)
+
+        # without groups or sites it is everyone's again, the same as in the resolution table
+        self.assertIn(
+            release,
+            Release.objects.get_accessible_releases(devuser, self.site, "basic"),
+        )
+        latest = Release.objects.get_latest_releases(devuser, self.site, ["basic"])
+        with mock.patch.object(rm_settings, "RM_RESOLUTION_TABLE", True):
+            ReleaseResolution.objects.rebuild()
+            invalidate_all()
+            self.assertEqual(
+                Release.objects.get_latest_releases(devuser, self.site, ["basic"]),
+                latest,
+            )
+
+    @mock.patch.object(rm_settings, "RM_CACHE_BACKEND", "default")
+    def test_shared_cache_round_trips(self):
+        backend = caches["default"]
+        backend.clear()
+        packages = ["basic", "advanced", "other"]
+        Release.objects.get_latest_releases_for_audience(
+            PUBLIC_AUDIENCE, self.site, packages
+        )
+        release_cache.local.clear()  # as on another node, with only the shared cache warm
+
+        # the generation once and all the packages together, however many there are
+        get = backend.get
+        with mock.patch.object(
+            backend,
+            "get_many",
+            side_effect=lambda keys: {key: get(key) for key in keys if key in backend},
+        ) as get_many, mock.patch.object(backend, "get", wraps=get) as get_one:
+            with self.assertNumQueries(0):
+                Release.objects.get_latest_releases_for_audience(
+                    PUBLIC_AUDIENCE, self.site, packages
+                )
+        get_one.assert_called_once()
+        get_many.assert_called_once()
+
+    def test_lru_eviction(self):
+        lru = LRUCache(maxsize=2)
+        lru.set("a", 1)
+        lru.set("b", None)
+        lru.get("a")  # "b" is now the least recently used
+        lru.set("c", 3)
+
+        self.assertEqual(lru.get("a"), 1)
+        self.assertIs(lru.get("b"), MISSING)
+        self.assertEqual(lru.get("c"), 3)
+        self.assertEqual(len(lru), 2)
+
+
+class AudienceTestCase(ColdCacheMixin, TestCase):
+    fixtures = ["sample_user.json", "release_data.json"]
+
+    def setUp(self):
+        super().setUp()
+        self.sampleuser = User.objects.get(username="sampleuser")
         self.test_group = Group.objects.get(name="test_group")
-        self.test_group.user_set.add(self.devuser)
 
-        self.create_release_url = "/api/v1/releases/create/"
+    def test_audience_is_cached(self):
+        self.assertEqual(get_audience(self.sampleuser), PUBLIC_AUDIENCE)
 
-    # def test_releaseuser_can_not_delete_release(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(get_audience(self.sampleuser), PUBLIC_AUDIENCE)
 
-    def test_releaseuser_create_release(self):
-        """
-        Ensure we can create a new release object.
-        """
-        # TODO: Should fail if the package key is not in the list of defined packages (aka, not a valid choice)
-        data = {
-            "package": "test_package",
-            "name": "v1.1",
-            "release_date": "2024-05-22T12:00:00Z",
-            "status": Status.DEVELOPMENT,
-            "release_notes": "Added new features.",
-            "files": {"css": ["css/styles.css"]},
-            "signature": "signature123",
+    def test_group_membership_invalidates(self):
+        self.assertEqual(get_audience(self.sampleuser), PUBLIC_AUDIENCE)
+
+        self.test_group.user_set.add(self.sampleuser)
+        self.assertEqual(
+            get_audience(self.sampleuser), ReleaseAudience(False, (self.test_group.pk,))
+        )
+
+        self.sampleuser.groups.clear()
+        self.assertEqual(get_audience(self.sampleuser), PUBLIC_AUDIENCE)
+
+    def test_group_permissions_invalidate(self):
+        self.test_group.user_set.add(self.sampleuser)
+        self.assertTrue(get_audience(self.sampleuser).is_tester)
+
+        self.test_group.permissions.clear()
+        self.assertEqual(get_audience(self.sampleuser), PUBLIC_AUDIENCE)
+
+    def test_anonymous_user(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(get_audience(AnonymousUser()), PUBLIC_AUDIENCE)
+
+
+class BatchedResolutionTestCase(ColdCacheMixin, TestCase):
+    fixtures = ["sample_user.json", "release_data.json"]
+
+    def setUp(self):
+        super().setUp()
+        self.packages = ["basic", "advanced"]
+        self.sampleuser = User.objects.get(username="sampleuser")
+        self.devuser = User.objects.get(username="devuser")  # a superuser
+        self.testuser = User.objects.get(username="releaseuser")
+        Group.objects.get(name="test_group").user_set.add(self.testuser)
+
+    def test_batched_matches_single_lookups(self):
+        for user in (self.sampleuser, self.devuser, self.testuser):
+            for site in Site.objects.all():
+                releases = Release.objects.get_latest_releases(
+                    user, site, self.packages
+                )
+                release_cache.local.clear()
+                for package in self.packages:
+                    self.assertEqual(
+                        releases[package],
+                        Release.objects.get_latest_release_for_package_site_and_user(
+                            user, site, package
+                        ),
+                    )
+                release_cache.local.clear()
+
+    def test_batched_query_count(self):
+        """One query for the audience and one for every package together."""
+        site = Site.objects.get(pk=2)
+
+        with self.assertNumQueries(2):
+            releases = Release.objects.get_latest_releases(
+                self.sampleuser, site, self.packages
+            )
+
+        self.assertEqual(releases["basic"], Release.objects.get(pk=5))  # v0.1.2
+        self.assertIsNone(releases["advanced"])
+
+    def test_mixin_context(self):
+        class PackageView(ReleaseManagerMixin, TemplateView):
+            template_name = "releasemanager/index.html"
+            packages = self.packages
+
+        request = RequestFactory().get("/")
+        request.user = self.sampleuser
+        view = PackageView()
+        view.setup(request)
+
+        context = view.get_context_data()
+        self.assertEqual(context["package_basic"], Release.objects.get(pk=3))  # v0.1.1
+        self.assertIsNone(context["package_advanced"])
+
+
+class RequestReleasesTestCase(ColdCacheMixin, TestCase):
+    fixtures = ["sample_user.json", "release_data.json"]
+
+    def setUp(self):
+        super().setUp()
+        self.sampleuser = User.objects.get(username="sampleuser")
+        self.request = RequestFactory().get("/")
+        self.request.user = self.sampleuser
+
+    def test_middleware_is_lazy(self):
+        with self.assertNumQueries(0):
+            response = ReleaseMiddleware(lambda request: HttpResponse())(self.request)
+        self.assertEqual(response.status_code, 200)
+
+        releases = self.request.releases
+        self.assertIsInstance(releases, RequestReleases)
+        self.assertEqual(list(releases), list(registry))
+
+        self.assertEqual(releases["basic"], Release.objects.get(pk=3))  # v0.1.1
+        with self.assertNumQueries(0):  # memoized for the rest of the request
+            self.assertEqual(releases["basic"].name, "v0.1.1")
+        self.assertIsNone(releases["advanced"])
+        with self.assertRaises(KeyError):
+            releases["nope"]
+
+    def test_middleware_is_async_capable(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        middleware = ReleaseMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        with self.assertNumQueries(0):
+            response = async_to_sync(middleware)(self.request)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(self.request.releases, RequestReleases)
+
+        self.assertFalse(
+            asyncio.iscoroutinefunction(ReleaseMiddleware(lambda request: None))
+        )
+
+    def test_resolve_nothing(self):
+        releases = RequestReleases(self.request)
+        with self.assertNumQueries(0):
+            self.assertEqual(releases.resolve([]), {})
+
+    def test_aresolve(self):
+        releases = RequestReleases(self.request)
+        resolved = async_to_sync(releases.aresolve)(["basic"])
+        self.assertEqual(resolved["basic"].name, "v0.1.1")
+
+    def test_items_resolve_together(self):
+        releases = RequestReleases(self.request)
+        with mock.patch.object(
+            Release.objects,
+            "get_latest_releases",
+            wraps=Release.objects.get_latest_releases,
+        ) as resolve:
+            self.assertEqual(dict(releases.items())["basic"].name, "v0.1.1")
+            self.assertEqual(len(list(releases.values())), len(registry))
+        resolve.assert_called_once()
+
+    def test_context_processor(self):
+        context = releases_processor(self.request)
+        self.assertIs(context["current_releases"], self.request.releases)
+
+        template = Template("{{ current_releases.basic.name }}")
+        self.assertEqual(template.render(Context(context)), "v0.1.1")
+
+    def test_mixin_defaults_to_registered_packages(self):
+        class PackageView(ReleaseManagerMixin, TemplateView):
+            template_name = "releasemanager/index.html"
+
+        view = PackageView()
+        view.setup(self.request)
+
+        context = view.get_context_data()
+        self.assertEqual(
+            sorted(key for key in context if key.startswith("package_")),
+            sorted(f"package_{package}" for package in registry),
+        )
+        with self.assertNumQueries(0):  # shared with request.releases
+            self.assertEqual(self.request.releases["basic"], context["package_basic"])
+
+
+@mock.patch.object(rm_settings, "RM_RESOLUTION_TABLE", True)
+class ResolutionTableTestCase(ColdCacheMixin, TestCase):
+    fixtures = ["sample_user.json", "release_data.json"]
+
+    def setUp(self):
+        super().setUp()
+        self.packages = ["basic", "advanced"]
+        self.sampleuser = User.objects.get(username="sampleuser")
+        self.devuser = User.objects.get(username="devuser")  # a superuser
+        self.testuser = User.objects.get(username="releaseuser")
+        Group.objects.get(name="test_group").user_set.add(self.testuser)
+        call_command("rmrebuildresolution", stdout=StringIO())
+
+    def test_table_matches_live_query(self):
+        for user in (self.sampleuser, self.devuser, self.testuser):
+            audience = get_audience(user)
+            for site in Site.objects.all():
+                table = ReleaseResolution.objects.resolve(audience, site, self.packages)
+                live = Release.objects._get_latest_releases(
+                    audience, site, self.packages
+                )
+                for package in self.packages:
+                    self.assertEqual(table[package], live.get(package))
+
+    def test_rebuilt_on_release_change(self):
+        site = Site.objects.get(pk=1)
+        release = Release.objects.get(pk=5)  # v0.1.2, only on site 2
+        with self.captureOnCommitCallbacks(execute=True):
+            release.sites.clear()  # now global
+
+        self.assertEqual(
+            ReleaseResolution.objects.resolve(
+                get_audience(self.sampleuser), site, ["basic"]
+            ),
+            {"basic": release},
+        )
+
+    def test_future_release_expires_rows(self):
+        release = Release.objects.create(
+            package="basic",
+            name="v9.0.0",
+            active=True,
+            status=Status.RELEASED,
+            release_date=timezone.now() + timedelta(days=1),
+        )
+        audience = get_audience(self.sampleuser)
+        site = Site.objects.get(pk=1)
+
+        self.assertEqual(
+            ReleaseResolution.objects.resolve(audience, site, ["basic"]),
+            {"basic": Release.objects.get(pk=3)},  # not released yet
+        )
+
+        Release.objects.filter(pk=release.pk).update(
+            release_date=timezone.now() - timedelta(days=1)
+        )
+        ReleaseResolution.objects.update(
+            expires_at=timezone.now()
+        )  # as if the day had passed
+        self.assertIsNone(ReleaseResolution.objects.resolve(audience, site, ["basic"]))
+
+        # the manager notices and answers from the live query, without writing on the read path
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(
+                Release.objects.get_latest_release_for_package_site_and_user(
+                    self.sampleuser, site, "basic"
+                ),
+                release,
+            )
+        self.assertFalse(
+            [query for query in queries if not query["sql"].startswith("SELECT")]
+        )
+        self.assertEqual(ReleaseResolution.objects.stale_packages(), {"basic"})
+
+        # until the rows are rebuilt out of band
+        call_command("rmrebuildresolution", "--stale", stdout=StringIO())
+        self.assertEqual(ReleaseResolution.objects.stale_packages(), set())
+        self.assertEqual(
+            ReleaseResolution.objects.resolve(audience, site, ["basic"]),
+            {"basic": release},
+        )
+
+
+def legacy_accessible_releases(audience, site, package):
+    """The original LEFT JOIN + DISTINCT implementation of get_accessible_releases, kept to compare against."""
+    if audience.is_superuser:
+        return Release.objects.filter(
+            (Q(sites=site) | Q(sites__isnull=True)), package=package, active=True
+        )
+
+    now = timezone.now()
+    releases = Release.objects.filter(
+        (Q(sites=site) | Q(sites__isnull=True))
+        & (Q(deprecation_date__gt=now) | Q(deprecation_date__isnull=True)),
+        package=package,
+        active=True,
+        release_date__lte=now,
+    )
+    if audience.is_tester:
+        return releases.filter(
+            Q(groups__in=audience.group_ids) | Q(groups__isnull=True)
+        ).distinct()
+    return releases.filter(Q(groups__isnull=True), status=Status.RELEASED).distinct()
+
+
+class AccessibleReleasesTestCase(ColdCacheMixin, TestCase):
+    fixtures = ["sample_user.json", "release_data.json"]
+
+    def assertMatchesLegacy(self):
+        audiences = [PUBLIC_AUDIENCE, ReleaseAudience(False, (1,)), SUPERUSER_AUDIENCE]
+        for audience in audiences:
+            for site in Site.objects.all():
+                for package in ("basic", "advanced"):
+                    self.assertEqual(
+                        list(
+                            Release.objects.get_accessible_releases_for_audience(
+                                audience, site, package
+                            )
+                        ),
+                        list(legacy_accessible_releases(audience, site, package)),
+                    )
+
+    def test_fixture_flags(self):
+        self.assertFalse(Release.objects.filter(is_global=True).exists())
+        self.assertEqual(
+            list(Release.objects.filter(is_group_restricted=True)),
+            [Release.objects.get(pk=4)],
+        )
+
+    def test_identical_to_legacy_query(self):
+        self.assertMatchesLegacy()
+
+    def test_identical_after_relations_change(self):
+        group = Group.objects.get(name="test_group")
+        Release.objects.get(pk=5).sites.clear()  # global
+        Release.objects.get(pk=3).sites.add(2)  # on both sites
+        group.release_set.add(Release.objects.get(pk=3))  # locked from the reverse side
+
+        release = Release.objects.get(pk=3)
+        self.assertFalse(release.is_global)
+        self.assertTrue(release.is_group_restricted)
+        self.assertTrue(Release.objects.get(pk=5).is_global)
+
+        self.assertMatchesLegacy()
+
+
+class QueryPlanTestCase(ColdCacheMixin, TestCase):
+    """Guard the indexes on Release: the resolution queries must never fall back to a full table scan."""
+
+    fixtures = ["sample_user.json", "release_data.json"]
+
+    audiences = [
+        PUBLIC_AUDIENCE,
+        ReleaseAudience(False, (1,)),
+        SUPERUSER_AUDIENCE,
+    ]
+
+    def get_plan(self, queryset):
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                # the fixture is far too small for the planner to bother with an index otherwise
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        return queryset.explain()
+
+    def assertNoTableScan(self, queryset):
+        plan = self.get_plan(queryset)
+
+        if connection.vendor == "sqlite":
+            self.assertNotRegex(plan, r"\bSCAN\b", plan)
+        elif connection.vendor == "postgresql":
+            self.assertNotIn("Seq Scan on releasemanager_release", plan, plan)
+        else:
+            self.skipTest(f"No query plan checks for {connection.vendor}")
+
+        return plan
+
+    def test_accessible_releases_plan(self):
+        for audience in self.audiences:
+            self.assertNoTableScan(
+                Release.objects.get_accessible_releases_for_audience(
+                    audience, 1, "basic"
+                )
+            )
+
+    def test_batched_resolution_plan(self):
+        for audience in self.audiences:
+            self.assertNoTableScan(
+                Release.objects._latest_releases(audience, 1, ["basic", "advanced"])
+            )
+
+    def test_public_resolution_uses_partial_index(self):
+        plan = self.assertNoTableScan(
+            Release.objects.get_accessible_releases_for_audience(
+                PUBLIC_AUDIENCE, 1, "basic"
+            )
+        )
+        self.assertIn("rm_release_published", plan)
+
+
+class RolloutTestCase(ColdCacheMixin, TestCase):
+    fixtures = ["sample_user.json", "release_data.json"]
+
+    def setUp(self):
+        super().setUp()
+        self.site = Site.objects.get(pk=1)
+        self.current = Release.objects.get(
+            pk=3
+        )  # v0.1.1, the current public release on site 1
+        self.rollout = Release.objects.create(
+            package="basic",
+            name="v9.0.0",
+            active=True,
+            status=Status.RELEASED,
+            release_date=timezone.now() - timedelta(minutes=1),
+            rollout_percentage=10,
+        )
+
+    def test_buckets(self):
+        salt = self.rollout.get_rollout_salt()
+        self.assertEqual(rollout_bucket(salt, 42), rollout_bucket(salt, 42))
+
+        at_10 = {pk for pk in range(2000) if rollout_bucket(salt, pk) < 10}
+        at_50 = {pk for pk in range(2000) if rollout_bucket(salt, pk) < 50}
+        self.assertTrue(140 < len(at_10) < 260, len(at_10))
+        self.assertTrue(at_10 < at_50)  # users stay in as the rollout is ramped up
+
+    def test_resolution(self):
+        salt = self.rollout.get_rollout_salt()
+
+        # the candidates are resolved once for the audience, every user is picked in memory
+        with self.assertNumQueries(1):
+            for user_id in range(200):
+                expected = (
+                    self.rollout if rollout_bucket(salt, user_id) < 10 else self.current
+                )
+                self.assertEqual(
+                    Release.objects.get_latest_release_for_audience(
+                        PUBLIC_AUDIENCE, self.site, "basic", user_id
+                    ),
+                    expected,
+                )
+
+        # anonymous users only get fully rolled out releases, superusers aren't subject to rollouts
+        self.assertEqual(
+            Release.objects.get_latest_release_for_audience(
+                PUBLIC_AUDIENCE, self.site, "basic"
+            ),
+            self.current,
+        )
+        self.assertEqual(
+            Release.objects.get_latest_release_for_package_site_and_user(
+                User.objects.get(username="devuser"), self.site, "basic"
+            ),
+            self.rollout,
+        )
+
+        self.rollout.rollout_percentage = 100
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rollout.save()
+        self.assertEqual(
+            Release.objects.get_latest_release_for_audience(
+                PUBLIC_AUDIENCE, self.site, "basic"
+            ),
+            self.rollout,
+        )
+
+    @mock.patch.object(rm_settings, "RM_RESOLUTION_TABLE", True)
+    def test_resolution_table(self):
+        call_command("rmrebuildresolution", stdout=StringIO())
+        for user_id in [None, *range(50)]:
+            self.assertEqual(
+                ReleaseResolution.objects.resolve(
+                    PUBLIC_AUDIENCE, self.site, ["basic"], user_id
+                ),
+                Release.objects._get_latest_releases(
+                    PUBLIC_AUDIENCE, self.site, ["basic"], user_id
+                ),
+            )
+
+    def test_validation(self):
+        self.rollout.rollout_percentage = 101
+        with self.assertRaises(ValidationError):
+            self.rollout.full_clean()
+
+
+class ReleaseTemplateTagTestCase(ColdCacheMixin, TestCase):
+    fixtures = ["sample_user.json", "release_data.json"]
+
+    def setUp(self):
+        super().setUp()
+        self.release = Release.objects.get(pk=1)  # v0.1.0
+
+    def render(self, source, release):
+        return Template("{% load release_template_tags %}" + source).render(
+            Context({"release": release})
+        )
+
+    def test_release_package(self):
+        html = self.render('{% release_package release "js" %}', self.release)
+
+        self.assertIn('<script src="/static/js/v0.1.0/main.js"', html)
+        self.assertIn('integrity="yes,lots"', html)
+        self.assertNotIn("main.css", html)
+
+    def test_release_assets(self):
+        html = self.render('{% release_assets release "css" "js" %}', self.release)
+
+        self.assertIn('<link rel="stylesheet" href="/static/css/v0.1.0/main.css"', html)
+        self.assertIn('<script src="/static/js/v0.1.0/main.js"', html)
+        self.assertLess(html.index("main.css"), html.index("main.js"))
+
+    def test_relative_paths_leave_release_untouched(self):
+        self.release.files = {"js": ["js/app.js"]}
+        html = self.render('{% release_package release "js" %}', self.release)
+
+        self.assertIn(f'<script src="{RM_URL}js/app.js"', html)
+        self.assertEqual(self.release.files, {"js": ["js/app.js"]})
+
+    def test_fragment_cache(self):
+        source = '{% release_assets release "css" "js" %}'
+        html = self.render(source, self.release)
+
+        release = Release.objects.get(pk=1)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.render(source, release), html)
+
+        # saving the release bumps the generation, so the new files are rendered
+        release.files = {"js": [{"path": "/static/js/v0.1.0/other.js"}]}
+        with self.captureOnCommitCallbacks(execute=True):
+            release.save()
+        self.assertIn("other.js", self.render(source, release))
+
+    def test_no_release(self):
+        self.assertEqual(self.render('{% release_package release "js" %}', None), "")
+
+
+class ReleaseFileTestCase(ColdCacheMixin, TestCase):
+    fixtures = ["sample_user.json", "release_data.json"]
+
+    def setUp(self):
+        super().setUp()
+        self.release = Release.objects.get(pk=1)  # v0.1.0
+
+    def test_files_manifest(self):
+        self.assertEqual(
+            self.release.files,
+            {
+                "css": [{"path": "/static/css/v0.1.0/main.css", "options": {}}],
+                "js": [
+                    {
+                        "path": "/static/js/v0.1.0/main.js",
+                        "options": {"integrity": "yes,lots"},
+                    }
+                ],
+            },
+        )
+
+    def test_add_files(self):
+        with self.assertNumQueries(
+            6
+        ):  # row lock, existing paths, max order, insert, plus the savepoint
+            created, updated = self.release.add_files(
+                {"js": ["js/a.js", {"path": "js/b.js", "options": {"defer": ""}}]}
+            )
+        self.assertEqual((created, updated), (2, 0))
+
+        # re-adding a path updates it in place
+        created, updated = self.release.add_files(
+            {"js": [{"path": "js/a.js", "options": {"async": ""}}]}
+        )
+        self.assertEqual((created, updated), (0, 1))
+
+        self.assertEqual(
+            list(
+                self.release.release_files.filter(file_group="js").values_list(
+                    "path", "options"
+                )
+            ),
+            [
+                ("/static/js/v0.1.0/main.js", {"integrity": "yes,lots"}),
+                ("js/a.js", {"async": ""}),
+                ("js/b.js", {"defer": ""}),
+            ],
+        )
+
+    def test_diff_files(self):
+        old = Release(package="basic", name="old")
+        old.files = {
+            "js": [
+                {"path": "js/same.js", "options": {}, "hash": "sha256-a"},
+                {"path": "js/edited.js", "options": {}, "hash": "sha256-b"},
+                {"path": "js/unhashed.js", "options": {}},
+                {"path": "js/gone.js", "options": {}, "hash": "sha256-c"},
+            ],
+            "css": [{"path": "css/moved.css", "options": {}, "hash": "sha256-d"}],
         }
-        # Set the user to the release user
-        self.client.force_authenticate(user=self.releaseuser)
-        response = self.client.post(self.create_release_url, data, format="json")
-        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
-        self.assertEqual(Release.objects.count(), 6)
+        new = Release(package="basic", name="new")
+        new.files = {
+            "js": [
+                {"path": "js/same.js", "options": {}, "hash": "sha256-a"},
+                {"path": "js/edited.js", "options": {}, "hash": "sha256-e"},
+                {"path": "js/unhashed.js", "options": {}},
+                {"path": "js/new.js", "options": {"defer": ""}},
+            ],
+            "preload": [{"path": "css/moved.css", "options": {}, "hash": "sha256-d"}],
+        }
+
+        delta = old.diff_files(new)
         self.assertEqual(
-            Release.objects.get(name="v1.1").release_notes, "Added new features."
+            delta["added"],
+            [{"path": "js/new.js", "options": {"defer": ""}, "file_group": "js"}],
+        )
+        self.assertEqual(delta["removed"], [{"path": "js/gone.js", "file_group": "js"}])
+        # files without a hash may have changed under the same path
+        self.assertEqual(
+            [entry["path"] for entry in delta["changed"]],
+            ["js/edited.js", "js/unhashed.js", "css/moved.css"],
+        )
+        self.assertEqual(delta["changed"][0]["hash"], "sha256-e")
+        self.assertEqual(delta["changed"][2]["file_group"], "preload")
+
+        self.assertEqual(new.diff_files(new)["changed"][0]["path"], "js/unhashed.js")
+
+    def test_rmaddfile(self):
+        call_command(
+            "rmaddfile",
+            "basic",
+            "v0.1.0",
+            "js/app.js",
+            "--option=defer=",
+            stdout=StringIO(),
+        )
+        call_command(
+            "rmaddfile",
+            "basic",
+            "v0.1.0",
+            "js/app.js",
+            "--option=async=",
+            stdout=StringIO(),
+        )
+
+        release_file = self.release.release_files.get(path="js/app.js")
+        self.assertEqual(release_file.file_group, "js")
+        self.assertEqual(release_file.options, {"async": ""})
+
+
+class ConcurrentAppendTestCase(ColdCacheMixin, TransactionTestCase):
+    """Parallel build shards append files to the same release at once, none of them may be lost.
+
+    The shards are threads of this process.  On backends with SELECT ... FOR UPDATE this exercises the row lock; on
+    SQLite only the process-local lock add_files falls back to, which does nothing for other processes.
+    """
+
+    fixtures = ["sample_user.json", "release_data.json"]
+
+    shards = 8
+    batches = 40  # per shard
+    batch_size = 5
+
+    def append(self, release_pk, shard):
+        try:
+            release = Release.objects.get(pk=release_pk)
+            for batch in range(self.batches):
+                release.add_files(
+                    {
+                        "js": [
+                            f"js/shard-{shard}/batch-{batch}/{n}.js"
+                            for n in range(self.batch_size)
+                        ]
+                    }
+                )
+        finally:
+            close_old_connections()
+
+    def test_concurrent_appends(self):
+        release = Release.objects.create(package="basic", name="v9.9.9")
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.shards) as executor:
+            for future in [
+                executor.submit(self.append, release.pk, shard)
+                for shard in range(self.shards)
+            ]:
+                future.result()
+        elapsed = time.perf_counter() - start
+        appends = self.shards * self.batches
+        logger.info(
+            "%d concurrent appends of %d files in %.2fs (%.0f appends/s, %s)",
+            appends,
+            self.batch_size,
+            elapsed,
+            appends / elapsed,
+            connection.vendor,
+        )
+
+        expected = self.shards * self.batches * self.batch_size
+        release_files = release.release_files.all()
+        self.assertEqual(release_files.count(), expected)
+        # every file got its own place in the manifest
+        self.assertEqual(
+            len(set(release_files.values_list("order", flat=True))), expected
         )
 
+
+class ImportManifestTestCase(ColdCacheMixin, TestCase):
+    fixtures = ["sample_user.json", "release_data.json"]
+
+    def setUp(self):
+        super().setUp()
+        self.release = Release.objects.get(pk=1)  # v0.1.0
+
+    def import_manifest(self, content, *args):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, args[0])
+            with open(path, "w") as manifest:
+                manifest.write(content)
+
+            out = StringIO()
+            call_command(
+                "rmimportmanifest", "basic", "v0.1.0", path, *args[1:], stdout=out
+            )
+            return out.getvalue()
+
+    def test_ndjson(self):
+        lines = [
+            {"path": f"js/chunk{index}.js", "options": {"defer": ""}}
+            for index in range(50)
+        ]
+        lines.append({"path": "js/chunk0.js", "file_group": "lazy"})  # duplicate, wins
+        lines.append(
+            {"path": "/static/css/v0.1.0/main.css", "size": 10}
+        )  # already registered
+        output = self.import_manifest(
+            "\n".join(json.dumps(line) for line in lines), "files.ndjson"
+        )
+
+        self.assertIn(
+            "50 added, 1 updated, 0 removed, 1 duplicate entries skipped", output
+        )
+        self.assertEqual(self.release.release_files.count(), 52)
+        self.assertEqual(
+            self.release.release_files.get(path="js/chunk0.js").file_group, "lazy"
+        )
+        self.assertEqual(
+            self.release.release_files.get(path="/static/css/v0.1.0/main.css").size, 10
+        )
+
+    def test_csv_replace(self):
+        content = (
+            "path,file_group,size,integrity\napp.js,js,120,sha384-abc\nstyles.css,,,\n"
+        )
+        output = self.import_manifest(content, "files.csv", "--replace")
+
+        self.assertIn("2 added, 0 updated, 2 removed", output)
+        self.assertEqual(
+            self.release.files,
+            {
+                "js": [
+                    {
+                        "path": "app.js",
+                        "options": {"integrity": "sha384-abc"},
+                        "size": 120,
+                    }
+                ],
+                "css": [{"path": "styles.css", "options": {}}],
+            },
+        )
+
+    def test_stdin_json(self):
+        manifest = {"js": ["js/a.js", {"path": "js/b.js"}]}
+        with mock.patch("sys.stdin", StringIO(json.dumps(manifest))):
+            call_command(
+                "rmimportmanifest",
+                "basic",
+                "v0.1.0",
+                "-",
+                "--format=json",
+                stdout=StringIO(),
+            )
+
+        self.assertEqual(self.release.release_files.filter(file_group="js").count(), 3)
+
+    def test_invalidates_on_commit(self):
+        for content, args in (('{"path": "js/a.js"}', []), ("", ["--replace"])):
+            generation = get_generation()
+            with self.captureOnCommitCallbacks() as callbacks:
+                self.import_manifest(content, "files.ndjson", *args)
+
+            # readers would cache the old files under the new generation if it was bumped before the commit
+            self.assertEqual(get_generation(), generation)
+            for callback in callbacks:
+                callback()
+            self.assertGreater(get_generation(), generation)
+
+        self.assertFalse(self.release.release_files.exists())
+
+
+class AddReleaseCommandTestCase(ColdCacheMixin, TestCase):
+    fixtures = ["sample_user.json", "release_data.json"]
+
+    def test_from_file(self):
+        releases = [
+            {"package": "basic", "name": "v0.1.0"},  # already exists
+            {
+                "package": "basic",
+                "name": "v4.0.0",
+                "status": Status.RELEASED,
+                "release_date": "2024-05-22T12:00:00Z",
+            },
+            {"package": "advanced", "name": "v1.0.0", "groups": [1]},
+        ]
+        with tempfile.NamedTemporaryFile("w", suffix=".ndjson") as stream:
+            stream.write("\n".join(json.dumps(release) for release in releases))
+            stream.flush()
+
+            out = StringIO()
+            call_command("rmaddrelease", "--from-file", stream.name, stdout=out)
+
+        self.assertIn("Successfully registered 2 releases.", out.getvalue())
+        self.assertIn(
+            "Release v0.1.0 for package basic already exists.", out.getvalue()
+        )
+
+        release = Release.objects.get(package="basic", name="v4.0.0")
+        self.assertEqual(release.status, Status.RELEASED)
+        self.assertEqual(release.release_date.year, 2024)
+        self.assertTrue(
+            Release.objects.get(package="advanced", name="v1.0.0").is_group_restricted
+        )
+
+    def test_from_file_unknown_package(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as stream:
+            json.dump([{"package": "nope", "name": "v1.0.0"}], stream)
+            stream.flush()
+
+            with self.assertRaises(CommandError):
+                call_command("rmaddrelease", "--from-file", stream.name)
+
+    def test_from_file_invalid(self):
+        for release, error in (
+            ({"package": "basic", "name": "v9.0", "sites": [99]}, "Unknown sites: 99"),
+            (
+                {"package": "basic", "name": "v9.0", "groups": [99]},
+                "Unknown groups: 99",
+            ),
+            (
+                {"package": "basic", "name": "v9.0", "release_date": "tomorrow"},
+                "release 1 release_date",
+            ),
+            ({"package": "basic"}, "release 1 name"),
+        ):
+            with tempfile.NamedTemporaryFile("w", suffix=".json") as stream:
+                json.dump([release], stream)
+                stream.flush()
+
+                with self.assertRaisesMessage(CommandError, error):
+                    call_command("rmaddrelease", "--from-file", stream.name)
+        self.assertFalse(Release.objects.filter(name="v9.0").exists())
+
+
+class PackagesCommandTestCase(ColdCacheMixin, TestCase):
+    fixtures = ["sample_user.json", "release_data.json"]
+
+    def rmpackages(self, output_format):
+        out = StringIO()
+        with self.assertNumQueries(1):
+            call_command("rmpackages", "--format", output_format, stdout=out)
+        return out.getvalue()
+
+    def test_report(self):
+        upcoming = timezone.now() + timedelta(days=2)
+        Release.objects.create(
+            package="advanced",
+            name="v2.0.0",
+            active=True,
+            status=Status.RELEASED,
+            release_date=upcoming,
+        )
+
+        report = json.loads(self.rmpackages("json"))
+        self.assertEqual([row["package"] for row in report], ["basic", "advanced"])
+
+        basic, advanced = report
+        self.assertEqual(
+            basic["releases"], Release.objects.filter(package="basic").count()
+        )
+        self.assertEqual(
+            basic["statuses"]["released"],
+            Release.objects.filter(package="basic", status=Status.RELEASED).count(),
+        )
+        self.assertEqual(basic["latest_release"], "v0.1.2")
+
+        # scheduled, but not released yet
+        self.assertIsNone(advanced["latest_release"])
+        self.assertEqual(advanced["next_release"], upcoming.isoformat())
+
+        lines = self.rmpackages("ndjson").splitlines()
+        self.assertEqual([json.loads(line) for line in lines], report)
+
+        table = self.rmpackages("table").splitlines()
+        self.assertEqual(len(table), 3)
+        self.assertTrue(table[1].startswith("basic\t"))
+
+
+class PackageRegistryTestCase(ColdCacheMixin, TestCase):
+    fixtures = ["sample_user.json", "release_data.json"]
+
+    def test_settings_packages(self):
+        self.assertEqual(list(registry), ["basic", "advanced"])
+        package = registry["basic"]
+        self.assertEqual((package.key, package.name), ("basic", "Basic"))
+        self.assertIsNone(registry.get("missing"))
+        with self.assertRaises(AttributeError):
+            package.name = "Changed"
+        with self.assertRaises(TypeError):
+            package.options["extra"] = True
+
+        # once loaded, lookups are in memory
+        with self.assertNumQueries(0):
+            self.assertIn("advanced", registry)
+            self.assertEqual(str(Release(package="basic", name="v9")), "Basic - v9")
+
+    def test_validation(self):
+        with self.assertRaises(ValidationError):
+            Release(package="missing", name="v1").full_clean()
+        with self.assertRaises(CommandError):
+            call_command("rmaddrelease", "missing", "v1", stdout=StringIO())
+
+    @mock.patch.object(rm_settings, "RM_PACKAGE_TABLE", True)
+    def test_package_table(self):
+        self.assertNotIn("extra", registry)
+
+        definition = PackageDefinition.objects.create(key="extra", name="Extra")
+        PackageDefinition.objects.create(key="basic", name="Overridden")
+        self.assertEqual(registry["extra"].name, "Extra")
+        self.assertEqual(registry["basic"].name, "Basic")  # the settings win
+        Release(package="extra", name="v1").full_clean()
+
+        definition.active = False
+        definition.save()
+        self.assertNotIn("extra", registry)
+
+    @mock.patch.object(rm_settings, "RM_PACKAGE_TABLE", True)
+    @mock.patch.object(rm_settings, "RM_CACHE_BACKEND", "default")
+    def test_shared_version(self):
+        self.assertNotIn("extra", registry)
+
+        # another process adds a package and bumps the shared version
+        PackageDefinition.objects.bulk_create(
+            [PackageDefinition(key="extra", name="Extra")]
+        )
+        caches["default"].incr(cache_module._generation_key(PACKAGE_GENERATION))
+
+        # seen once the refresh interval has passed
+        self.assertNotIn("extra", registry)
+        with mock.patch.object(rm_settings, "RM_PACKAGE_REFRESH", 0):
+            self.assertIn("extra", registry)
+
+
+class SigningTestCase(ColdCacheMixin, TestCase):
+    fixtures = ["sample_user.json", "release_data.json"]
+
+    def setUp(self):
+        super().setUp()
+        self.release = Release.objects.get(
+            pk=1
+        )  # v0.1.0, with a css and a js file under /static/
+        self.release.add_files({"js": ["https://cdn.example.com/vendor.js"]})
+
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        for path, content in (
+            ("css/v0.1.0/main.css", b"body {}" * 1000),
+            ("js/v0.1.0/main.js", b"main();"),
+        ):
+            self.write(path, content)
+
+    def write(self, path, content):
+        location = os.path.join(self.root.name, path)
+        os.makedirs(os.path.dirname(location), exist_ok=True)
+        with open(location, "wb") as stream:
+            stream.write(content)
+        return location
+
+    def call(self, name, *args):
+        out, err = StringIO(), StringIO()
+        call_command(
+            name,
+            "basic",
+            "v0.1.0",
+            "--root",
+            self.root.name,
+            *args,
+            stdout=out,
+            stderr=err,
+        )
+        return out.getvalue()
+
+    def test_sign_and_verify(self):
+        output = self.call("rmsign")
+        self.assertIn("3 files, 2 hashed", output)
+        self.assertIn("vendor.js is not a local file", output)
+
+        release_file = self.release.release_files.get(path="/static/js/v0.1.0/main.js")
+        self.assertEqual(release_file.hash, hashlib.sha256(b"main();").hexdigest())
+        self.assertEqual(release_file.size, 7)
+        self.assertIsNotNone(release_file.mtime)
+
+        self.release.refresh_from_db()
+        self.assertEqual(
+            self.release.signature,
+            compute_signature(
+                [
+                    (release_file.path, release_file.hash)
+                    for release_file in self.release.release_files.exclude(hash="")
+                ]
+            ),
+        )
+
+        # nothing changed, so nothing is read again
+        self.assertIn("3 files, 0 hashed", self.call("rmverify"))
+        self.assertIn("3 files, 2 hashed", self.call("rmverify", "--full"))
+
+        # touched but unchanged: hashed once, then trusted again
+        location = os.path.join(self.root.name, "js/v0.1.0/main.js")
+        os.utime(location, (1, 1))
+        self.assertIn("1 hashed", self.call("rmverify"))
+        self.assertIn("0 hashed", self.call("rmverify"))
+
+        # same size, different content
+        self.write("js/v0.1.0/main.js", b"evil();")
+        with self.assertRaisesMessage(CommandError, "failed verification"):
+            self.call("rmverify")
+
+    def test_sign_missing_file(self):
+        os.remove(os.path.join(self.root.name, "css/v0.1.0/main.css"))
+
+        with self.assertRaisesMessage(CommandError, "was not signed"):
+            self.call("rmsign")
+        self.release.refresh_from_db()
+        self.assertIsNone(self.release.signature)
+
+    def test_signature(self):
+        digests = [("js/a.js", "aa"), ("js/b.js", "bb")]
+        self.assertEqual(compute_signature(digests), compute_signature(digests[::-1]))
+        self.assertNotEqual(
+            compute_signature(digests),
+            compute_signature([("js/c.js", "aa")] + digests[1:]),
+        )
+
+        # the key is salted, never the bare SECRET_KEY, and RM_SIGNING_KEY replaces it
+        signature = compute_signature(digests)
+        message = "js/a.js:aa\njs/b.js:bb".encode()
+        self.assertNotEqual(
+            signature,
+            hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest(),
+        )
+        with mock.patch.object(rm_settings, "RM_SIGNING_KEY", "release-key"):
+            self.assertNotEqual(compute_signature(digests), signature)
+
+        # files outside the root, or served from elsewhere, are never read
+        self.assertIsNone(get_file_location("../../etc/passwd", self.root.name))
+        self.assertIsNone(
+            get_file_location("https://cdn.example.com/a.js", self.root.name)
+        )
+        self.assertEqual(
+            get_file_location(f"{RM_URL}js/a.js", self.root.name),
+            os.path.join(self.root.name, "js", "a.js"),
+        )
+
+
+@mock.patch.dict(cache_module._local_transition)
+class SchedulerTestCase(ColdCacheMixin, TestCase):
+    fixtures = ["sample_user.json", "release_data.json"]
+
+    def setUp(self):
+        super().setUp()
+        cache_module._local_transition.clear()
+        self.now = timezone.now()
+
+    def test_deprecates_due_releases(self):
+        release = Release.objects.get(pk=3)  # v0.1.1, the current public release
+        Release.objects.filter(pk=release.pk).update(
+            deprecation_date=self.now - timedelta(minutes=1)
+        )
+
+        run = run_scheduler(self.now)
+        self.assertEqual(run.deprecated, 1)
+        self.assertIsNone(run.packages)  # the first run refreshes everything
+        release.refresh_from_db()
+        self.assertEqual(release.status, Status.DEPRECATED)
+
+        # nothing else is due
+        self.assertEqual(run_scheduler(self.now).deprecated, 0)
+
+    def test_next_transition(self):
+        upcoming = self.now + timedelta(seconds=30)
+        Release.objects.create(
+            package="advanced",
+            name="v2.0.0",
+            active=True,
+            status=Status.RELEASED,
+            release_date=upcoming,
+        )
+
+        self.assertEqual(run_scheduler(self.now).next_transition, upcoming)
+        self.assertEqual(get_next_transition(), upcoming.timestamp())
+
+        # release caches and responses don't outlive the transition
+        self.assertLessEqual(get_timeout(rm_settings.RM_CACHE_TIMEOUT), 30)
+        self.assertLessEqual(get_timeout(None), 30)
+
+        # once it comes due only its package is refreshed
+        generation = get_generation()
+        with self.captureOnCommitCallbacks(execute=True):
+            run = run_scheduler(upcoming + timedelta(seconds=1))
+        self.assertEqual(run.packages, {"advanced"})
+        self.assertGreater(get_generation(), generation)
+
+        # and with nothing scheduled, nothing is refreshed and caches keep their timeout
+        generation = get_generation()
+        run = run_scheduler(upcoming + timedelta(seconds=2))
+        self.assertEqual(run.packages, set())
+        self.assertEqual(get_generation(), generation)
+        self.assertEqual(get_timeout(60), 60)
+
+    def test_command(self):
+        out = StringIO()
+        call_command("rmscheduler", stdout=out)
+        self.assertIn("all packages refreshed", out.getvalue())
+
+
+class BenchmarkTestCase(ColdCacheMixin, TestCase):
+    fixtures = ["sample_user.json", "release_data.json"]
+
+    def gendata(self, *args):
+        call_command(
+            "rmgendata",
+            "--releases=30",
+            "--groups=3",
+            "--sites=2",
+            "--users=4",
+            "--files=2",
+            *args,
+            stdout=StringIO(),
+        )
+
+    def test_gendata(self):
+        releases = Release.objects.count()
+        self.gendata()
+
+        synthetic = Release.objects.filter(name__startswith="syn-")
+        self.assertEqual(synthetic.count(), 30)
+        self.assertEqual(Release.objects.count(), releases + 30)
+        self.assertEqual(ReleaseFile.objects.filter(release__in=synthetic).count(), 60)
+        self.assertEqual(Group.objects.filter(name__startswith="synthetic-").count(), 3)
+        # the relation flags were set without going through save()
+        self.assertFalse(synthetic.filter(is_global=True, sites__isnull=False).exists())
+
+        # the same seed gives the same data, and clearing it only removes synthetic rows
+        packages = list(synthetic.order_by("name").values_list("package", flat=True))
+        self.gendata("--clear")
+        self.assertEqual(Release.objects.count(), releases + 30)
+        self.assertEqual(
+            list(synthetic.order_by("name").values_list("package", flat=True)),
+            packages,
+        )
+
+    def test_benchmark(self):
+        self.gendata()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "baseline.json")
+            out = StringIO()
+            call_command(
+                "rmbenchmark",
+                "--iterations=3",
+                "--format=json",
+                f"--output={path}",
+                stdout=out,
+            )
+            report = json.loads(out.getvalue())
+            self.assertEqual(report["meta"]["releases"], Release.objects.count())
+            self.assertEqual(
+                set(report["results"]),
+                {
+                    "accessible_releases",
+                    "latest_releases_cold",
+                    "latest_releases_warm",
+                    "api_list",
+                    "template_tag_cold",
+                    "template_tag_warm",
+                    "rmpackages",
+                },
+            )
+            self.assertEqual(
+                report["results"]["latest_releases_warm"]["queries_max"], 0
+            )
+
+            out = StringIO()
+            call_command(
+                "rmbenchmark",
+                "api_list",
+                "--iterations=3",
+                f"--compare={path}",
+                stdout=out,
+            )
+            self.assertIn("p50 change", out.getvalue())
+
+
+class ExportTestCase(ColdCacheMixin, TestCase):
+    fixtures = ["sample_user.json", "release_data.json"]
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = os.path.join(directory.name, "releases")
+
+        for name, value in (
+            ("RM_EXPORT_STORAGE", "django.core.files.storage.FileSystemStorage"),
+            ("RM_EXPORT_STORAGE_OPTIONS", {"location": directory.name}),
+        ):
+            patcher = mock.patch.object(rm_settings, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.test_group = Group.objects.get(name="test_group")
+
+    def read(self, path):
+        with open(os.path.join(self.root, path), "rb") as stream:
+            return stream.read()
+
+    def test_export(self):
+        out = StringIO()
+        call_command("rmexport", stdout=out)
+        self.assertIn("manifests written", out.getvalue())
+
+        manifests = json.loads(self.read("index.json"))["manifests"]
+        self.assertEqual(manifests["1/public/basic"]["release"], "v0.1.1")
+        self.assertEqual(manifests["2/public/basic"]["release"], "v0.1.2")
+        self.assertEqual(
+            manifests[f"1/groups-{self.test_group.pk}/basic"]["release"], "v3.0.0"
+        )
+        self.assertIsNone(manifests["1/public/advanced"])
+
+        # the manifest is the API's latest release payload, with a gzipped copy
+        path = manifests["1/public/basic"]["path"]
+        content = self.read(path)
+        self.assertEqual(json.loads(content)["name"], "v0.1.1")
+        self.assertEqual(
+            hashlib.sha256(content).hexdigest(), manifests["1/public/basic"]["digest"]
+        )
+        self.assertEqual(gzip.decompress(self.read(path + ".gz")), content)
+        self.assertEqual(
+            gzip.decompress(self.read("index.json.gz")), self.read("index.json")
+        )
+
+        # nothing is left half written
+        for _, _, files in os.walk(self.root):
+            self.assertFalse([name for name in files if name.endswith(".tmp")])
+
+    def test_export_incremental(self):
+        first = export_manifests()
+        self.assertTrue(first.written)
+        self.assertTrue(first.index_written)
+
+        # nothing changed, nothing is written
+        second = export_manifests()
+        self.assertEqual((second.written, second.index_written), ([], False))
+        self.assertEqual(second.unchanged, len(first.written))
+
+        # only the manifests that resolve to the changed release are rewritten
+        with self.captureOnCommitCallbacks(execute=True):
+            Release.objects.get(pk=3).add_files({"js": ["/static/js/v0.1.1/extra.js"]})
+        third = export_manifests()
+        self.assertEqual(len(third.written), 1)
+        self.assertTrue(third.written[0].startswith("1/public/basic/v0.1.1."))
+        self.assertTrue(third.index_written)
+        self.assertTrue(os.path.exists(os.path.join(self.root, first.written[0])))
+
+        self.assertEqual(len(export_manifests(full=True).written), len(first.written))
+        self.assertEqual(
+            len(export_manifests(public_only=True, full=True).written),
+            len([path for path in first.written if "/public/" in path]),
+        )
+
+
+class MemoryStorage(Storage):
+    """A storage without local paths, like an object store."""
+
+    def __init__(self, overwrite):
+        self.overwrite = overwrite
+        self.files = {}
+
+    def _open(self, name, mode="rb"):
+        return ContentFile(self.files[name], name=name)
+
+    def _save(self, name, content):
+        self.files[name] = content.read()
+        return name
+
+    def get_available_name(self, name, max_length=None):
+        if self.overwrite:
+            return name
+        return super().get_available_name(name, max_length)
+
+    def exists(self, name):
+        return name in self.files
+
+    def delete(self, name):
+        self.files.pop(name, None)
+
+
+class RemoteExportTestCase(ColdCacheMixin, TestCase):
+    fixtures = ["sample_user.json", "release_data.json"]
+
+    def export(self, storage):
+        export_manifests(storage, full=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            Release.objects.get(pk=3).add_files({"js": ["/static/js/v0.1.1/extra.js"]})
+        with mock.patch.object(storage, "delete", wraps=storage.delete) as delete:
+            export_manifests(storage, full=True)
+
+        index = json.loads(storage.files["releases/index.json"])
+        path = "releases/" + index["manifests"]["1/public/basic"]["path"]
+        self.assertIn("extra.js", storage.files[path].decode())
+        self.assertEqual(
+            gzip.decompress(storage.files["releases/index.json.gz"]),
+            storage.files["releases/index.json"],
+        )
+        # no copies saved under other names are left behind
+        self.assertFalse([name for name in storage.files if "_" in name])
+        return delete
+
+    def test_overwriting_storage(self):
+        # saved over in one step, nothing is deleted
+        delete = self.export(MemoryStorage(overwrite=True))
+        delete.assert_not_called()
+
+    def test_storage_keeping_files(self):
+        delete = self.export(MemoryStorage(overwrite=False))
+        delete.assert_called()
+
+
+class MetricsTestCase(ColdCacheMixin, TestCase):
+    fixtures = ["sample_user.json", "release_data.json"]
+
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+
+    def test_resolution_metrics(self):
+        Release.objects.get_latest_releases_for_audience(
+            PUBLIC_AUDIENCE, 1, ["basic", "advanced"]
+        )
+        count, _ = metrics.resolution_seconds.get(package="basic")
+        self.assertEqual(count, 1)
+        count, queries = metrics.resolution_queries.get()
+        self.assertEqual(count, 1)
+        self.assertGreater(queries, 0)
+        self.assertEqual(metrics.cache_requests.get(cache="release", result="miss"), 2)
+
+        # served from the local cache the second time, without a query
+        Release.objects.get_latest_releases_for_audience(
+            PUBLIC_AUDIENCE, 1, ["basic", "advanced"]
+        )
+        self.assertEqual(
+            metrics.cache_requests.get(cache="release", result="local_hit"), 2
+        )
+        self.assertEqual(metrics.resolution_queries.get(), (2, queries))
+
+    def test_hook(self):
+        hook = mock.Mock()
+        with mock.patch.object(rm_settings, "RM_METRICS_HOOK", hook):
+            Release.objects.get_latest_releases_for_audience(
+                PUBLIC_AUDIENCE, 1, ["basic"]
+            )
+        hook.assert_any_call(
+            "counter",
+            "releasemanager_cache_requests_total",
+            1,
+            {"cache": "release", "result": "miss"},
+        )
+
+        hook.reset_mock()
+        with mock.patch.object(rm_settings, "RM_METRICS", False):
+            Release.objects.get_latest_releases_for_audience(
+                PUBLIC_AUDIENCE, 1, ["advanced"]
+            )
+        hook.assert_not_called()
+        self.assertEqual(metrics.resolution_seconds.get(package="advanced"), (0, 0))
+
+    def test_template_metrics(self):
+        release = Release.objects.get_latest_releases_for_audience(
+            PUBLIC_AUDIENCE, 1, ["basic"]
+        )["basic"]
+        template = Template(
+            '{% load release_template_tags %}{% release_assets release "css" %}'
+        )
+        template.render(Context({"release": release}))
+        self.assertEqual(
+            metrics.template_render_seconds.get(tag="release_assets")[0], 1
+        )
+
+    def test_prometheus_endpoint(self):
+        url = reverse("releasemanager:releasemanager_metrics")
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        Release.objects.get_latest_releases_for_audience(PUBLIC_AUDIENCE, 1, ["basic"])
+        with mock.patch.object(rm_settings, "RM_METRICS_ENDPOINT", True):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        body = response.content.decode()
+        self.assertIn("# TYPE releasemanager_resolution_seconds histogram", body)
+        self.assertIn(
+            'releasemanager_resolution_seconds_count{package="basic"} 1', body
+        )
+        self.assertIn(
+            'releasemanager_cache_requests_total{cache="release",result="miss"} 1',
+            body,
+        )
+
+    def test_slow_resolution_log(self):
+        with mock.patch.object(rm_settings, "RM_SLOW_RESOLUTION_MS", 0):
+            with self.assertLogs("releasemanager.metrics", "WARNING") as logs:
+                Release.objects.get_latest_releases_for_audience(
+                    PUBLIC_AUDIENCE, 1, ["basic"]
+                )
+        self.assertIn("Slow release resolution", logs.output[0])
+        self.assertIn("packages basic", logs.output[0])
+
+    def test_batch_time_is_split_between_packages(self):
+        packages = ["basic", "advanced", "enterprise", "other"]
+        with mock.patch.object(
+            metrics.time, "perf_counter", side_effect=[0, 0.4]
+        ), mock.patch.object(rm_settings, "RM_SLOW_RESOLUTION_MS", 200):
+            with self.assertNoLogs("releasemanager.metrics", "WARNING"):
+                Release.objects.get_latest_releases_for_audience(
+                    PUBLIC_AUDIENCE, 1, packages
+                )
+
+        for package in packages:
+            count, seconds = metrics.resolution_seconds.get(package=package)
+            self.assertEqual(count, 1)
+            self.assertAlmostEqual(seconds, 0.1)
+
+
+class AsyncReleaseTestCase(ColdCacheMixin, TestCase):
+    """The async manager methods and views answer exactly what the sync ones do."""
+
+    fixtures = ["sample_user.json", "release_data.json"]
+
+    def setUp(self):
+        super().setUp()
+        self.site = Site.objects.get_current()
+        self.tester = User.objects.get(username="releaseuser")
+        Group.objects.get(name="test_group").user_set.add(self.tester)
+        self.users = [
+            AnonymousUser(),
+            User.objects.get(username="sampleuser"),
+            self.tester,
+            User.objects.get(username="devuser"),  # a superuser
+        ]
+
+    async def test_manager_methods(self):
+        packages = ["basic", "advanced"]
+        for user in self.users:
+            expected = await sync_to_async(Release.objects.get_latest_releases)(
+                user, self.site, packages
+            )
+            accessible = await sync_to_async(
+                lambda: list(
+                    Release.objects.get_accessible_releases(
+                        user, self.site, "basic"
+                    ).order_by("pk")
+                )
+            )()
+
+            invalidate_all()
+            self.assertEqual(
+                await Release.objects.aget_latest_releases(user, self.site, packages),
+                expected,
+            )
+            self.assertEqual(
+                await Release.objects.aget_latest_release_for_package_site_and_user(
+                    user, self.site, "basic"
+                ),
+                expected["basic"],
+            )
+            releases = await Release.objects.aget_accessible_releases(
+                user, self.site, "basic"
+            )
+            self.assertEqual(
+                [release async for release in releases.order_by("pk")], accessible
+            )
+
+            # once cached, answered on the event loop without a thread
+            with mock.patch("releasemanager.models.sync_to_async") as hop:
+                await Release.objects.aget_latest_releases(user, self.site, packages)
+            hop.assert_not_called()
+
+    async def get(self, sync_view, async_view, user, path, **kwargs):
+        """The (sync, async) responses of a pair of views to the same request."""
+
+        def sync_get():
+            request = RequestFactory().get(path)
+            request.user = user
+            return sync_view.as_view()(request, **kwargs).render()
+
+        request = AsyncRequestFactory().get(path)
+        request.user = user
+        return (
+            await sync_to_async(sync_get)(),
+            await async_view.as_view()(request, **kwargs),
+        )
+
+    async def test_views(self):
+        for user in self.users[1:]:
+            for sync_view, async_view, path, kwargs in [
+                (
+                    ReleaseListView,
+                    AsyncReleaseListView,
+                    "/api/v1/releases/?page_size=2",
+                    {},
+                ),
+                (
+                    LatestReleaseView,
+                    AsyncLatestReleaseView,
+                    "/api/v1/packages/basic/latest/",
+                    {"package": "basic"},
+                ),
+                (
+                    LatestReleaseView,
+                    AsyncLatestReleaseView,
+                    "/api/v1/packages/nope/latest/",
+                    {"package": "nope"},
+                ),
+            ]:
+                sync, response = await self.get(
+                    sync_view, async_view, user, path, **kwargs
+                )
+                self.assertEqual(response.status_code, sync.status_code)
+                self.assertEqual(json.loads(response.content), json.loads(sync.content))
+                for header in ("ETag", "Cache-Control"):
+                    self.assertEqual(response.get(header), sync.get(header))
+                if response.status_code == status.HTTP_200_OK:
+                    self.assertIn("Authorization", response["Vary"])
+
+        # anonymous users are turned away like DRF does
+        sync, response = await self.get(
+            ReleaseListView, AsyncReleaseListView, AnonymousUser(), "/api/v1/releases/"
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(json.loads(response.content), json.loads(sync.content))
+
+    async def test_permissions_and_throttles(self):
+        class Closed(BasePermission):
+            message = "Closed for maintenance."
+
+            def has_permission(self, request, view):
+                return False
+
+        class Exhausted(BaseThrottle):
+            def allow_request(self, request, view):
+                return False
+
+            def wait(self):
+                return 30
+
+        user = self.users[1]
+        path = "/api/v1/packages/basic/latest/"
+        for attribute, value, code in (
+            ("permission_classes", [IsAuthenticated, Closed], 403),
+            ("throttle_classes", [Exhausted], 429),
+        ):
+            with mock.patch.object(
+                LatestReleaseView, attribute, value
+            ), mock.patch.object(AsyncLatestReleaseView, attribute, value):
+                sync, response = await self.get(
+                    LatestReleaseView,
+                    AsyncLatestReleaseView,
+                    user,
+                    path,
+                    package="basic",
+                )
+            self.assertEqual((response.status_code, sync.status_code), (code, code))
+            self.assertEqual(json.loads(response.content), json.loads(sync.content))
+            self.assertEqual(response.get("Retry-After"), sync.get("Retry-After"))
+
+    @mock.patch.object(rm_settings, "RM_CACHE_BACKEND", "default")
+    async def test_conditional_get(self):
+        request = AsyncRequestFactory().get("/api/v1/packages/basic/latest/")
+        request.user = self.tester
+        view = AsyncLatestReleaseView.as_view()
+        response = await view(request, package="basic")
+
+        request = AsyncRequestFactory().get("/api/v1/packages/basic/latest/")
+        request.META["HTTP_IF_NONE_MATCH"] = response["ETag"]
+        request.user = self.tester
+        with mock.patch("releasemanager.api.views.get_latest_payload") as payload:
+            response = await view(request, package="basic")
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        payload.assert_not_called()
+
+    @mock.patch.object(rm_settings, "RM_PACKAGE_TABLE", True)
+    async def test_registry_is_loaded_from_a_thread(self):
+        await sync_to_async(PackageDefinition.objects.create)(
+            key="runtime", name="Runtime"
+        )
+        registry.refresh()
+
+        request = AsyncRequestFactory().get("/api/v1/packages/runtime/latest/")
+        request.user = self.tester
+        response = await AsyncLatestReleaseView.as_view()(request, package="runtime")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(
+            json.loads(response.content)["detail"],
+            'No release of "runtime" is available.',
+        )
+        self.assertTrue(await registry.acontains("basic"))
+        self.assertFalse(await registry.acontains("nope"))
+
+    async def test_resolution_queries_are_counted(self):
+        metrics.reset()
+        await Release.objects.aget_latest_releases_for_audience(
+            PUBLIC_AUDIENCE, self.site, ["basic"]
+        )
+        count, queries = metrics.resolution_queries.get()
+        self.assertEqual(count, 1)
+        self.assertGreater(queries, 0)
+
+
+class ConditionalGetTestCase(SharedCacheMixin, ColdCacheMixin, APITestCase):
+    fixtures = ["sample_user.json", "release_data.json"]
+
+    def setUp(self):
+        super().setUp()
+        self.sampleuser = User.objects.get(username="sampleuser")
+
+    def assertNotModified(self, url, etag):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        for query in queries:
+            self.assertNotIn("releasemanager_release", query["sql"])
+
+    def test_api_list(self):
+        self.client.force_authenticate(user=self.sampleuser)
+        url = "/api/v1/releases/?package=basic"
+        set_next_transition(None, time.time())  # Last-Modified needs the scheduler
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("Authorization", response["Vary"])
+        etag = response["ETag"]
+
+        self.assertNotModified(url, etag)
+
+        # a different query is a different representation
+        response = self.client.get(url + "&status=30", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # and so is anything after a release changes
+        with self.captureOnCommitCallbacks(execute=True):
+            Release.objects.create(package="basic", name="v4.0.0")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertIn("Last-Modified", response)
+
+    def test_etag_changes_when_a_date_passes(self):
+        self.client.force_authenticate(user=self.sampleuser)
+        url = reverse("releasemanager_api:api_latest_release", args=["basic"])
+        now = time.time()
+
+        # while the scheduler publishes transitions, the ETag changes as the next one comes due
+        set_next_transition(now + 30, now)
+        etag = self.client.get(url)["ETag"]
+        self.assertNotModified(url, etag)
+        with mock.patch.object(conditional.time, "time", return_value=now + 31):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # without the scheduler, ETags don't outlive the release caches
+        caches["default"].delete(cache_module._transition_key())
+        etag = self.client.get(url)["ETag"]
+        later = now + rm_settings.RM_CACHE_TIMEOUT + 1
+        with mock.patch.object(conditional.time, "time", return_value=later):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_last_modified_when_a_date_passes(self):
+        self.client.force_authenticate(user=self.sampleuser)
+        url = reverse("releasemanager_api:api_latest_release", args=["basic"])
+        now = time.time()
+
+        # without the scheduler nothing says when a date passed, so If-Modified-Since can't be answered
+        response = self.client.get(url)
+        self.assertNotIn("Last-Modified", response)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(now + 60))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # with it, a transition that comes due is a modification
+        set_next_transition(now + 30, now)
+        last_modified = self.client.get(url)["Last-Modified"]
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        with mock.patch.object(conditional.time, "time", return_value=now + 31):
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreaterEqual(
+            parse_http_date(response["Last-Modified"]), math.ceil(now + 30)
+        )
+
+    def test_no_validators_without_shared_backend(self):
+        # the generation is only this process's count, which says nothing about writes made elsewhere
+        self.client.force_authenticate(user=self.sampleuser)
+        url = reverse("releasemanager_api:api_latest_release", args=["basic"])
+
+        with mock.patch.object(rm_settings, "RM_CACHE_BACKEND", None):
+            response = self.client.get(url)
+            self.assertNotIn("ETag", response)
+            self.assertNotIn("Last-Modified", response)
+            self.assertIn("Authorization", response["Vary"])
+
+            response = self.client.get(url, HTTP_IF_NONE_MATCH="*")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_release_list_page(self):
+        self.client.force_login(self.sampleuser)
+        url = reverse("releasemanager:list_releases")
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertContains(response, "v0.1.1")
+
+        self.assertNotModified(url, response["ETag"])
+
+
+class ReleaseAPITests(ColdCacheMixin, APITestCase):
+    fixtures = ["sample_user.json", "release_data.json"]
+
+    def setUp(self):  # Set up data for the whole TestCase
+        super().setUp()
+        self.package_key = "basic"  # the name of the test package
+        self.site = Site.objects.get_current()
+
+        # an average user for testing permissions
+        self.sampleuser = User.objects.get(username="sampleuser")
+
+        # a developer user for testing permissions
+        self.devuser = User.objects.get(username="devuser")
+
+        # a release user for testing API permissions
+        self.releaseuser = User.objects.get(username="releaseuser")
+
+        # On site ID 1, the current release is v0.1.1
+        self.current_release = Release.objects.get(pk=3)
+
+        # On site ID 1, the most current test release is v3.0.0
+        self.beta_release = Release.objects.get(pk=2)
+
+        # add the devuser to the test_group
+        self.test_group = Group.objects.get(name="test_group")
+        self.test_group.user_set.add(self.devuser)
+
+        self.create_release_url = "/api/v1/releases/create/"
+
+    # def test_releaseuser_can_not_delete_release(self):
+
+    def test_releaseuser_create_release(self):
+        """
+        Ensure we can create a new release object.
+        """
+        # TODO: Should fail if the package key is not in the list of defined packages (aka, not a valid choice)
+        data = {
+            "package": "test_package",
+            "name": "v1.1",
+            "release_date": "2024-05-22T12:00:00Z",
+            "status": Status.DEVELOPMENT,
+            "release_notes": "Added new features.",
+            "files": {"css": ["css/styles.css"]},
+            "signature": "signature123",
+        }
+        # Set the user to the release user
+        self.client.force_authenticate(user=self.releaseuser)
+        response = self.client.post(self.create_release_url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Release.objects.count(), 6)
+        self.assertEqual(
+            Release.objects.get(name="v1.1").release_notes, "Added new features."
+        )
+
+    def test_releaseuser_bulk_create_releases(self):
+        """
+        Ensure a list of releases is created with a fixed number of queries, skipping the ones that exist.
+        """
+        data = [
+            {"package": "basic", "name": "v0.1.1"},  # already exists
+            {"package": "basic", "name": "v4.0.0", "status": Status.RELEASED},
+            {"package": "advanced", "name": "v1.0.0", "sites": [1], "groups": [1]},
+        ]
+        self.client.force_authenticate(user=self.releaseuser)
+        url = reverse("releasemanager_api:api_bulk_create_releases")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [(r["package"], r["name"]) for r in response.data["created"]],
+            [("basic", "v4.0.0"), ("advanced", "v1.0.0")],
+        )
+        self.assertEqual(
+            response.data["skipped"], [{"package": "basic", "name": "v0.1.1"}]
+        )
+        bulk_queries = len(queries)
+
+        release = Release.objects.get(package="advanced", name="v1.0.0")
+        self.assertEqual(release.released_by, self.releaseuser)
+        self.assertEqual(list(release.sites.values_list("pk", flat=True)), [1])
+        self.assertEqual(list(release.groups.values_list("pk", flat=True)), [1])
+        self.assertFalse(release.is_global)
+        self.assertTrue(release.is_group_restricted)
+        self.assertTrue(Release.objects.get(name="v4.0.0").is_global)
+
+        # twice as many releases doesn't take any more queries
+        data = [
+            {"package": "basic", "name": f"v5.0.{n}", "sites": [1]} for n in range(6)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, data, format="json")
+        self.assertEqual(len(response.data["created"]), 6)
+        self.assertLessEqual(len(queries), bulk_queries)
+
+    def test_bulk_create_releases_race(self):
+        """A release a concurrent writer inserts first is theirs: it isn't reported as created or given these sites."""
+        bulk_create = Release.objects.bulk_create
+
+        def concurrent_writer_first(releases, **kwargs):
+            bulk_create([Release(package="basic", name="v6.0.0")])
+            return bulk_create(releases, **kwargs)
+
+        with mock.patch.object(
+            Release.objects, "bulk_create", side_effect=concurrent_writer_first
+        ):
+            created, skipped = Release.objects.bulk_create_releases(
+                [
+                    {"package": "basic", "name": "v6.0.0", "sites": [2]},
+                    {"package": "basic", "name": "v6.0.1", "sites": [2]},
+                ],
+                released_by=self.releaseuser,
+            )
+
+        self.assertEqual([release.name for release in created], ["v6.0.1"])
+        self.assertEqual([entry["name"] for entry in skipped], ["v6.0.0"])
+        theirs = Release.objects.get(name="v6.0.0")
+        self.assertFalse(theirs.sites.exists())
+        self.assertIsNone(theirs.released_by)
+
+    def test_bulk_create_releases_validation(self):
+        self.client.force_authenticate(user=self.releaseuser)
+        url = reverse("releasemanager_api:api_bulk_create_releases")
+
+        for data in (
+            [{"package": "nope", "name": "v1.0.0"}],
+            [{"package": "basic", "name": "v1.0.0", "sites": [99]}],
+        ):
+            response = self.client.post(url, data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Release.objects.filter(name="v1.0.0").exists())
+
+        self.client.force_authenticate(user=self.sampleuser)
+        response = self.client.post(url, [], format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_releaseuser_update_files(self):
+        """
+        Ensure we can add files to a release, without duplicating the ones it already has.
+        """
+        data = {"files": {"js": ["js/bob.js", "/static/js/v0.1.1/main.js"]}}
+        self.client.force_authenticate(user=self.releaseuser)
+        response = self.client.patch(
+            f"/api/v1/releases/{self.current_release.pk}/update_files/",
+            data,
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [entry["path"] for entry in response.data["files"]["js"]],
+            ["/static/js/v0.1.1/main.js", "js/bob.js"],
+        )
+
+    def test_releaseuser_update_files_batch(self):
+        """
+        Ensure a batch of files can be sent as a list, grouped by their file_group or extension.
+        """
+        data = {
+            "files": [
+                {"path": "js/a.js", "options": {"defer": ""}},
+                {"path": "css/a.css"},
+                {"path": "js/b.min", "file_group": "js"},
+            ]
+        }
+        self.client.force_authenticate(user=self.releaseuser)
+        url = f"/api/v1/releases/{self.current_release.pk}/update_files/"
+        response = self.client.patch(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [entry["path"] for entry in response.data["files"]["js"]],
+            ["/static/js/v0.1.1/main.js", "js/a.js", "js/b.min"],
+        )
+        self.assertIn("css/a.css", [f["path"] for f in response.data["files"]["css"]])
+
+        for files in (
+            [{"options": {}}],
+            {"js": [{"options": {}}]},  # no path
+            {"js": "js/c.js"},  # not a list
+            {"js": [{"path": "js/c.js", "options": "defer"}]},
+            [{"path": "js/c.js", "size": -1}],
+        ):
+            response = self.client.patch(url, {"files": files}, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(self.current_release.release_files.filter(path="js/c.js"))
+
+    def test_list_releases_pages(self):
+        """
+        Ensure the list pages through every release, newest first, including ones without a release date.
+        """
+        Release.objects.create(package="basic", name="v4.0.0")  # not scheduled yet
+        self.client.force_authenticate(user=self.sampleuser)
+        get_audience(
+            self.sampleuser
+        )  # warm the audience the ETag uses, so only the page is queried
+
+        names = []
+        url = "/api/v1/releases/?page_size=2"
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data["results"]), 2)
+            self.assertNotIn("release_notes", response.data["results"][0])
+            names += [release["name"] for release in response.data["results"]]
+            url = response.data["next"]
+
+        # undated releases go wherever the database sorts NULLs
+        nulls = (
+            {"nulls_first": True}
+            if connection.features.nulls_order_largest
+            else {"nulls_last": True}
+        )
+        self.assertEqual(
+            names,
+            list(
+                Release.objects.order_by(
+                    F("release_date").desc(**nulls), "-id"
+                ).values_list("name", flat=True)
+            ),
+        )
+
+    def test_list_releases_filters(self):
+        self.client.force_authenticate(user=self.sampleuser)
+
+        response = self.client.get("/api/v1/releases/?site=2&status=30")
+        self.assertEqual(
+            [release["name"] for release in response.data["results"]], ["v0.1.2"]
+        )
+
+        response = self.client.get("/api/v1/releases/?package=advanced")
+        self.assertEqual(response.data["results"], [])
+
+        response = self.client.get("/api/v1/releases/?cursor=nonsense")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_latest_release(self):
+        self.client.force_authenticate(user=self.sampleuser)
+        url = reverse("releasemanager_api:api_latest_release", args=["basic"])
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data,
+            {
+                "package": "basic",
+                "name": "v0.1.1",
+                "status": Status.RELEASED,
+                "files": self.current_release.files,
+                "signature": None,
+            },
+        )
+        self.assertIn("private", response["Cache-Control"])
+        self.assertIn("max-age", response["Cache-Control"])
+        self.assertIn("Authorization", response["Vary"])
+
+        # the payload is cached for the whole audience
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).data, response.data)
+
+        # testers get the latest testing release
+        self.client.force_authenticate(user=self.devuser)
+        self.assertEqual(self.client.get(url).data["name"], "v3.0.0")
+
+    def test_latest_release_missing(self):
+        self.client.force_authenticate(user=self.sampleuser)
+
+        response = self.client.get("/api/v1/packages/advanced/latest/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.get("/api/v1/packages/nope/latest/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @mock.patch.object(rm_settings, "RM_CACHE_BACKEND", "default")
+    def test_release_delta(self):
+        self.client.force_authenticate(user=self.sampleuser)
+        url = reverse("releasemanager_api:api_release_delta", args=["basic"])
+        get_audience(self.sampleuser)  # warm the audience the ETag uses
+
+        # to the user's latest release by default
+        response = self.client.get(url, {"from": "v0.1.0"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            (response.data["package"], response.data["from"], response.data["to"]),
+            ("basic", "v0.1.0", "v0.1.1"),
+        )
+        self.assertEqual(
+            [entry["path"] for entry in response.data["added"]],
+            ["/static/css/v0.1.1/main.css", "/static/js/v0.1.1/main.js"],
+        )
+        self.assertEqual(
+            response.data["removed"],
+            [
+                {"path": "/static/css/v0.1.0/main.css", "file_group": "css"},
+                {"path": "/static/js/v0.1.0/main.js", "file_group": "js"},
+            ],
+        )
+        self.assertEqual(response.data["changed"], [])
+        self.assertIn("private", response["Cache-Control"])
+        self.assertIn("ETag", response)
+
+        # hot pairs are served from the cache
+        with self.assertNumQueries(0):
+            again = self.client.get(url, {"from": "v0.1.0", "to": "v0.1.1"})
+        self.assertEqual(again.data, response.data)
+
+        # changing the files invalidates the delta, once committed
+        with self.captureOnCommitCallbacks(execute=True):
+            self.current_release.add_files(
+                {"js": [{"path": "/static/js/v0.1.0/main.js", "hash": "sha256-x"}]}
+            )
+        response = self.client.get(url, {"from": "v0.1.0"})
+        self.assertEqual(
+            [entry["path"] for entry in response.data["changed"]],
+            ["/static/js/v0.1.0/main.js"],
+        )
+
+    def test_release_delta_errors(self):
+        self.client.force_authenticate(user=self.sampleuser)
+        url = reverse("releasemanager_api:api_release_delta", args=["basic"])
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        for params in (
+            {"from": "v9.9.9"},  # no such release
+            {"from": "v3.0.0"},  # a test release the user could not have been offered
+            {"from": "v2.0"},  # restricted to a group and another site
+            {"from": "v0.1.0", "to": "v3.0.0"},  # a test release, only for testers
+            {"from": "v0.1.0", "to": "v0.1.2"},  # not on this site
+        ):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.get(
+            reverse("releasemanager_api:api_release_delta", args=["nope"]),
+            {"from": "v0.1.0"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        # testers can go to the test release
+        self.client.force_authenticate(user=self.devuser)
+        response = self.client.get(url, {"from": "v0.1.1", "to": "v3.0.0"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["to"], "v3.0.0")
+        response = self.client.get(url, {"from": "v3.0.0", "to": "v0.1.1"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_release_delta_from_deprecated_release(self):
+        self.client.force_authenticate(user=self.sampleuser)
+        url = reverse("releasemanager_api:api_release_delta", args=["basic"])
+        Release.objects.filter(name="v0.1.0").update(
+            deprecation_date=timezone.now() - timedelta(days=1)
+        )
+        invalidate_all()
+
+        response = self.client.get(url, {"from": "v0.1.0"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["to"], "v0.1.1")
+
     def test_sampleuser_can_not_create_release(self):
         """
         Ensure a user without permission can not create a new release object.
@@ -10,4 +10,5 @@ urlpatterns = [
     #     name="package_releases",
     # ),
     path("releases/", views.ReleaseListView.as_view(), name="list_releases"),
+    path("metrics/", views.MetricsView.as_view(), name="releasemanager_metrics"),
 ]
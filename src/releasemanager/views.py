@@ -1,25 +1,31 @@
+from django.http import Http404, HttpResponse
+from django.views import View
 from django.views.generic import TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin
+from .conditional import ConditionalReleaseMixin
+from .context_processors import get_request_releases
+from . import settings as rm_settings
+from .metrics import render_prometheus
 from .models import Release
 from django.contrib.sites.models import Site
 
 
 class ReleaseManagerMixin:
-    """A mixin to provide the latest release for each package in the packages list to the context of a view."""
+    """A mixin to provide the latest release for each package in the packages list to the context of a view.
 
-    packages = ["basic", "advanced", "enterprise"]
+    For releases only resolved when a template uses them, see releasemanager.context_processors.releases instead.
+    """
+
+    packages = None  # every registered package
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        user = self.request.user
-        site = Site.objects.get_current()
 
-        for item in self.packages:
-            context["package_" + item] = (
-                Release.objects.get_latest_release_for_package_site_and_user(
-                    user, site, item
-                )
-            )
+        # resolve every package together so the cost stays flat as packages are added, and only once per request
+        releases = get_request_releases(self.request).resolve(self.packages)
+
+        for item, release in releases.items():
+            context["package_" + item] = release
 
         return context
 
@@ -28,7 +34,7 @@ class ReleaseManagerIndexView(TemplateView):
     template_name = "releasemanager/index.html"
 
 
-class ReleaseListView(LoginRequiredMixin, TemplateView):
+class ReleaseListView(LoginRequiredMixin, ConditionalReleaseMixin, TemplateView):
     template_name = "releasemanager/list_releases.html"
 
     def get_context_data(self, **kwargs):
@@ -39,8 +45,18 @@ class ReleaseListView(LoginRequiredMixin, TemplateView):
         site = Site.objects.get_current()
 
         # Fetch all accessible releases for the current user
-        releases = Release.objects.get_accessible_releases(
-            user, site, "basic"
-        )
+        releases = Release.objects.get_accessible_releases(user, site, "basic")
         context["releases"] = releases
         return context
+
+
+class MetricsView(View):
+    """The release manager's metrics in the Prometheus text format, when RM_METRICS_ENDPOINT is on."""
+
+    def get(self, request, *args, **kwargs):
+        if not rm_settings.RM_METRICS_ENDPOINT:
+            raise Http404("The metrics endpoint is not enabled.")
+
+        return HttpResponse(
+            render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8"
+        )